@@ -3,6 +3,7 @@ from fastapi import Request, HTTPException, WebSocket, WebSocketException, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from .auth_handler import decode_jwt
+from utils.supabase import SupabaseClient
 
 
 async def decode_token(
@@ -11,10 +12,14 @@ async def decode_token(
 ):
     if token is None:
         raise WebSocketException(code=403, reason="Invalid authentication scheme")
-    if not decode_jwt(token):
+    payload = decode_jwt(token)
+    if not payload:
         raise WebSocketException(code=403, reason="Invalid token or expired token")
-    websocket.app.supabase.auth.set_session(token, "lol")
-    return decode_jwt(token)
+    if getattr(websocket.state, "supabase", None) is None:
+        websocket.state.supabase = SupabaseClient(token)
+    else:
+        websocket.state.supabase.set_token(token)
+    return payload
 
 
 class JWTBearer(HTTPBearer):
@@ -33,11 +38,12 @@ class JWTBearer(HTTPBearer):
                 raise HTTPException(
                     status_code=403, detail="Invalid authentication scheme"
                 )
-            if not decode_jwt(credentials.credentials):
+            payload = decode_jwt(credentials.credentials)
+            if not payload:
                 raise HTTPException(
                     status_code=403, detail="Invalid token or expired token"
                 )
-            request.app.supabase.auth.set_session(credentials.credentials, "lol")
-            return decode_jwt(credentials.credentials)
+            request.state.supabase = SupabaseClient(credentials.credentials)
+            return payload
         else:
             raise HTTPException(status_code=403, detail="Invalid authorization code")
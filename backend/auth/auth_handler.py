@@ -1,24 +1,51 @@
 import os
+import time
+from collections import OrderedDict
 import jwt
-from dotenv import load_dotenv
+from utils.config import load_config
+from utils.timing import span
+from utils.log import warning
 
-load_dotenv(True)
+load_config()
 
 jwt_secret = os.getenv("SUPABASE_JWT_SECRET")
 jwt_algorithm = "HS256"
 jwt_issuer = os.getenv("SUPABASE_JWT_ISSUER")
+jwt_cache_size = int(os.getenv("JWT_CACHE_SIZE", "1024"))
+jwt_cache_ttl = float(os.getenv("JWT_CACHE_TTL", "300"))
 
+verified_tokens: OrderedDict[str, tuple[float, dict]] = OrderedDict()
 
-def decode_jwt(token: str) -> dict:
+
+def verify_jwt(token: str) -> dict:
     try:
-        payload = jwt.decode(
-            token,
-            jwt_secret,
-            algorithms=[jwt_algorithm],
-            issuer=jwt_issuer,
-            audience="authenticated",
-        )
+        with span("jwt.verify"):
+            payload = jwt.decode(
+                token,
+                jwt_secret,
+                algorithms=[jwt_algorithm],
+                issuer=jwt_issuer,
+                audience="authenticated",
+            )
         return payload
     except Exception as e:
-        print(e)
+        warning(f"JWT verification failed: {e}")
         return {}
+
+
+def decode_jwt(token: str) -> dict:
+    now = time.time()
+    cached = verified_tokens.get(token)
+    if cached:
+        expires, payload = cached
+        if expires > now:
+            verified_tokens.move_to_end(token)
+            return payload
+        del verified_tokens[token]
+    payload = verify_jwt(token)
+    if payload and jwt_cache_size:
+        expires = min(payload.get("exp", now), now + jwt_cache_ttl)
+        verified_tokens[token] = (expires, payload)
+        if len(verified_tokens) > jwt_cache_size:
+            verified_tokens.popitem(last=False)
+    return payload
@@ -0,0 +1,134 @@
+import argparse
+import asyncio
+import statistics
+import time
+
+from models.admission import Admission, Overloaded
+
+
+class Provider:
+    def __init__(self, capacity, latency):
+        self.capacity = capacity
+        self.latency = latency
+        self.in_flight = 0
+        self.peak = 0
+
+    async def call(self):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency * max(1, self.in_flight / self.capacity))
+        finally:
+            self.in_flight -= 1
+
+
+class Unbounded:
+    async def run(self, uid, work):
+        await work()
+
+
+class Semaphore:
+    def __init__(self, limit):
+        self.semaphore = asyncio.Semaphore(limit)
+
+    async def run(self, uid, work):
+        async with self.semaphore:
+            await work()
+
+
+class Admitted:
+    def __init__(self, admission):
+        self.admission = admission
+        self.positions = []
+
+    async def run(self, uid, work):
+        async with self.admission.slot(uid, self.positions.append):
+            await work()
+
+
+async def request(gate, provider, uid, results, timeout):
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(gate.run(uid, provider.call), timeout)
+        results.append((uid, "ok", time.perf_counter() - start))
+    except Overloaded:
+        results.append((uid, "rejected", time.perf_counter() - start))
+    except asyncio.TimeoutError:
+        results.append((uid, "timeout", time.perf_counter() - start))
+
+
+def p95(values):
+    values = sorted(values)
+    return values[int(len(values) * 0.95)] if values else 0.0
+
+
+async def replay(label, gate, args):
+    provider = Provider(args.capacity, args.latency)
+    results = []
+    requests = [
+        request(gate, provider, f"heavy-{i}", results, args.timeout)
+        for i in range(args.heavy_users)
+        for _ in range(args.heavy_requests)
+    ] + [
+        request(gate, provider, f"light-{i}", results, args.timeout)
+        for i in range(args.light_users)
+        for _ in range(args.light_requests)
+    ]
+    await asyncio.gather(*requests)
+    light = [t for uid, status, t in results if uid[0] == "l" and status == "ok"]
+    heavy = [t for uid, status, t in results if uid[0] == "h" and status == "ok"]
+    rejected = [t for _, status, t in results if status == "rejected"]
+    timeouts = sum(status == "timeout" for _, status, _ in results)
+    print(
+        f"{label:<12}{provider.peak:>6}{p95(light):>11.2f}{p95(heavy):>11.2f}"
+        f"{len(rejected):>10}{statistics.mean(rejected) * 1000 if rejected else 0:>11.2f}"
+        f"{timeouts:>10}"
+    )
+
+
+async def main(args):
+    total = (
+        args.heavy_users * args.heavy_requests + args.light_users * args.light_requests
+    )
+    print(
+        f"burst:       {total} requests, {args.heavy_users} heavy users x "
+        f"{args.heavy_requests}, {args.light_users} light users x {args.light_requests}"
+    )
+    print(
+        f"provider:    {args.capacity} slots, {args.latency * 1000:.0f} ms, "
+        f"client timeout {args.timeout:.0f} s"
+    )
+    print(
+        f"{'gate':<12}{'peak':>6}{'light p95':>11}{'heavy p95':>11}"
+        f"{'rejected':>10}{'reject ms':>11}{'timeouts':>10}"
+    )
+    await replay("unbounded", Unbounded(), args)
+    await replay("semaphore", Semaphore(args.capacity), args)
+    admitted = Admitted(
+        Admission(
+            args.capacity,
+            args.per_user,
+            args.max_queued,
+            args.max_queued_per_user,
+            args.timeout,
+        )
+    )
+    await replay("admission", admitted, args)
+    print(f"queue position messages: {len(admitted.positions)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare unbounded, semaphore and fair admission gates for a burst of uploads from heavy and light users"
+    )
+    parser.add_argument("--capacity", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--heavy-users", type=int, default=4)
+    parser.add_argument("--heavy-requests", type=int, default=50)
+    parser.add_argument("--light-users", type=int, default=40)
+    parser.add_argument("--light-requests", type=int, default=2)
+    parser.add_argument("--per-user", type=int, default=2)
+    parser.add_argument("--max-queued", type=int, default=256)
+    parser.add_argument("--max-queued-per-user", type=int, default=4)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,167 @@
+import argparse
+import asyncio
+import io
+import statistics
+import time
+from contextlib import redirect_stdout
+from types import SimpleNamespace
+
+import models.agent as agent
+import models.events as events
+import utils.clients as clients
+from models.conversation import Conversation
+from utils.fake_multion import FakeMultiOn
+from utils.fake_redis import FakeRedis
+
+
+class FakeWriter:
+    def __init__(self):
+        self.persisted = 0
+
+    def schedule(self):
+        pass
+
+    def update(self, **kwargs):
+        pass
+
+    async def flush(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+class FakeWebSocket:
+    def __init__(self, emitted):
+        self.state = SimpleNamespace()
+        self.emitted = emitted
+        self.attached = time.perf_counter()
+        self.latencies = []
+        self.frames = 0
+
+    async def send_json(self, frame):
+        self.frames += 1
+        emitted = self.emitted.get(frame["content"])
+        if emitted and emitted >= self.attached:
+            self.latencies.append(time.perf_counter() - emitted)
+
+
+def track_emits(emitted):
+    emit = agent.AgentJob.emit
+
+    def tracked(self, frame):
+        if frame["role"] != "system":
+            emitted[frame["content"]] = time.perf_counter()
+        emit(self, frame)
+
+    agent.AgentJob.emit = tracked
+    return emit
+
+
+async def run_chat(chat_id, args, remote, emitted):
+    session = await clients.get_multion().sessions.create(url="https://google.com")
+    owner_messages = Conversation()
+    owner_socket = FakeWebSocket(emitted)
+    job = agent.start_job(
+        owner_socket,
+        None,
+        chat_id,
+        f"user-{chat_id}",
+        session.session_id,
+        owner_messages,
+        FakeWriter(),
+        f"Book a table for {chat_id}",
+    )
+    sockets = []
+    attach_ms = []
+    remote_job = None
+    # reconnect while the job still has steps left, or there is nothing to join
+    reconnect_after = min(args.reconnect_after, args.steps - 1)
+    await asyncio.sleep(args.step_latency * max(reconnect_after, 0))
+    for _ in range(args.clients):
+        target = job
+        if remote:
+            messages = Conversation(owner_messages[: len(owner_messages) // 2])
+            start = time.perf_counter()
+            target = remote_job = remote_job or await agent.find_remote_job(
+                None, chat_id, session.session_id, messages, FakeWriter()
+            )
+            attach_ms.append((time.perf_counter() - start) * 1000)
+            if target is None:
+                continue
+        socket = FakeWebSocket(emitted)
+        target.attach(socket, None, 0)
+        sockets.append((target, socket))
+    await job.task
+    await asyncio.sleep(0.1)
+    consistent = not remote or (
+        remote_job is not None and list(remote_job.messages) == list(owner_messages)
+    )
+    for target, socket in sockets:
+        await target.detach(socket)
+    await job.detach(owner_socket)
+    return [socket for _, socket in sockets], attach_ms, consistent
+
+
+async def replay(label, broker, remote, args):
+    agent.event_broker = broker
+    clients.clients["multion"] = FakeMultiOn(
+        create_latency=0,
+        step_latency=args.step_latency,
+        screenshot_latency=0,
+        steps=args.steps,
+    )
+    emitted = {}
+    emit = track_emits(emitted)
+    try:
+        with redirect_stdout(io.StringIO()):
+            results = await asyncio.gather(
+                *(
+                    run_chat(f"chat-{i}", args, remote, emitted)
+                    for i in range(args.chats)
+                )
+            )
+    finally:
+        agent.AgentJob.emit = emit
+    sockets = [socket for result in results for socket in result[0]]
+    latencies = sorted(
+        latency * 1000 for socket in sockets for latency in socket.latencies
+    )
+    attach = [ms for result in results for ms in result[1]]
+    consistent = sum(result[2] for result in results)
+    p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0.0
+    print(
+        f"{label:<22}{len(sockets):>9}{sum(s.frames for s in sockets):>8}"
+        f"{statistics.median(latencies) if latencies else 0.0:>9.2f}{p95:>9.2f}"
+        f"{statistics.median(attach) if attach else 0.0:>11.1f}"
+        f"{consistent:>7}/{args.chats}"
+    )
+
+
+async def main(args):
+    fake_redis = FakeRedis()
+    server = await fake_redis.serve("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    print(f"chats:         {args.chats}, {args.clients} extra clients each")
+    print(f"steps:         {args.steps} x {args.step_latency * 1000:.0f} ms")
+    print(
+        f"{'broker':<22}{'clients':>9}{'frames':>8}{'p50 ms':>9}{'p95 ms':>9}"
+        f"{'attach ms':>11}{'synced':>9}"
+    )
+    await replay("memory, same worker", events.MemoryBroker(), False, args)
+    broker = events.RedisBroker(f"redis://127.0.0.1:{port}/0")
+    await replay("redis, other worker", broker, True, args)
+    await broker.close()
+    server.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Deliver agent step events to clients on the owning worker and on another worker through the event broker"
+    )
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=2)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--step-latency", type=float, default=0.05)
+    parser.add_argument("--reconnect-after", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,105 @@
+import argparse
+import asyncio
+import io
+import time
+from contextlib import redirect_stdout
+from types import SimpleNamespace
+
+import models.agent as agent
+import utils.clients as clients
+
+
+class FakeMultiOn:
+    def __init__(self, step_latency, screenshot_latency, steps):
+        self.step_latency = step_latency
+        self.screenshot_latency = screenshot_latency
+        self.steps = steps
+        self.calls = {}
+        self.screenshots = 0
+        self.sessions = SimpleNamespace(step=self.step, screenshot=self.screenshot)
+
+    async def step(self, session_id, **kwargs):
+        await asyncio.sleep(self.step_latency)
+        calls = self.calls.get(session_id, 0) + 1
+        self.calls[session_id] = calls
+        status = "DONE" if calls >= self.steps else "CONTINUE"
+        return SimpleNamespace(message=f"Step {calls}", status=status)
+
+    async def screenshot(self, **kwargs):
+        self.screenshots += 1
+        await asyncio.sleep(self.screenshot_latency)
+        return SimpleNamespace(screenshot="https://screenshots.local/step.png")
+
+
+class FakeWriter:
+    def schedule(self):
+        pass
+
+    def update(self, **kwargs):
+        pass
+
+    async def flush(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+def fake_store_screenshot(latency):
+    async def store_screenshot(supabase, uid, screenshot):
+        await asyncio.sleep(latency)
+        return {"url": screenshot, "thumbnail": None}
+
+    return store_screenshot
+
+
+async def replay(label, overlap, every, args):
+    multion = FakeMultiOn(args.step_latency, args.screenshot_latency, args.steps)
+    clients.clients["multion"] = multion
+    agent.store_screenshot = fake_store_screenshot(args.store_latency)
+    agent.agent_overlap_screenshots = overlap
+    agent.agent_screenshot_every = every
+    agent.step_stats = agent.StageStats()
+    jobs = [
+        agent.AgentJob(None, f"chat-{i}", f"user-{i}", f"session-{i}", [], FakeWriter())
+        for i in range(args.sessions)
+    ]
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        await asyncio.gather(*(job.run("Order this on Doordash", None) for job in jobs))
+    elapsed = time.perf_counter() - start
+    stats = agent.step_stats.summary()
+    gap = stats.get("gap", {"mean_ms": 0.0})["mean_ms"]
+    print(
+        f"{label:<22}{elapsed:>8.2f}{elapsed / args.steps * 1000:>12.0f}"
+        f"{gap:>10.1f}{multion.screenshots / args.sessions:>14.1f}"
+    )
+
+
+async def main(args):
+    print(f"sessions:        {args.sessions}")
+    print(f"steps/session:   {args.steps}")
+    print(
+        f"latency (ms):    step {args.step_latency * 1000:.0f}, "
+        f"screenshot {args.screenshot_latency * 1000:.0f}, "
+        f"store {args.store_latency * 1000:.0f}"
+    )
+    print(
+        f"{'mode':<22}{'wall s':>8}{'ms/step':>12}{'gap ms':>10}{'shots/session':>14}"
+    )
+    await replay("sequential", False, 1, args)
+    await replay("overlapped", True, 1, args)
+    await replay(f"overlapped, every {args.every}", True, args.every, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare sequential and overlapped agent step and screenshot handling with a stubbed MultiOn"
+    )
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--step-latency", type=float, default=0.2)
+    parser.add_argument("--screenshot-latency", type=float, default=0.1)
+    parser.add_argument("--store-latency", type=float, default=0.05)
+    parser.add_argument("--every", type=int, default=3)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,210 @@
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import httpx
+
+from models.chat import decode_cursor, get_chat_summaries, get_chats_by_model
+
+
+def split_terms(filters):
+    terms, depth, quoted, start = [], 0, False, 0
+    for i, char in enumerate(filters):
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and not depth and char == ",":
+            terms.append(filters[start:i])
+            start = i + 1
+    terms.append(filters[start:])
+    return terms
+
+
+def matches(row, term):
+    if term.startswith("and("):
+        return all(matches(row, inner) for inner in split_terms(term[4:-1]))
+    column, rest = term.split(".", 1)
+    negate = rest.startswith("not.")
+    operator, value = rest.removeprefix("not.").split(".", 1)
+    value = value.strip('"')
+    field = row[column]
+    if operator == "is":
+        result = field is None
+    elif field is None:
+        result = False
+    elif operator == "eq":
+        result = field == value
+    else:
+        result = field < value
+    return result != negate
+
+
+class FakeQuery:
+    def __init__(self, supabase, columns):
+        self.supabase = supabase
+        self.columns = columns
+        self.filters = []
+        self.limit_rows = None
+        self.params = httpx.QueryParams()
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row[column] == value)
+        return self
+
+    def or_(self, filters):
+        terms = split_terms(filters)
+        self.filters.append(lambda row: any(matches(row, term) for term in terms))
+        return self
+
+    def order(self, *args, **kwargs):
+        return self
+
+    def limit(self, rows):
+        self.limit_rows = rows
+        return self
+
+    def execute(self):
+        self.supabase.round_trips += 1
+        time.sleep(self.supabase.latency)
+        rows = [
+            row
+            for row in self.supabase.rows
+            if all(check(row) for check in self.filters)
+        ][: self.limit_rows]
+        if "chat_messages" in self.columns:
+            rows = [
+                {**row, "chat_messages": self.supabase.messages[row["id"]]}
+                for row in rows
+            ]
+        else:
+            columns = [column.strip() for column in self.columns.split(",")]
+            rows = [{column: row[column] for column in columns} for row in rows]
+        return SimpleNamespace(data=json.loads(json.dumps(rows)))
+
+
+class FakeTable:
+    def __init__(self, supabase):
+        self.supabase = supabase
+
+    def select(self, columns):
+        return FakeQuery(self.supabase, columns)
+
+
+class FakeSupabase:
+    def __init__(self, latency):
+        self.latency = latency
+        self.round_trips = 0
+        self.rows = []
+        self.messages = {}
+
+    def table(self, name):
+        return FakeTable(self)
+
+    def seed(self, owner, model, chats, messages, undated):
+        now = datetime.now(timezone.utc)
+        for i in range(chats):
+            id = str(uuid.uuid4())
+            conversation = [
+                {
+                    "type": "text",
+                    "role": "user" if j % 2 == 0 else "assistant",
+                    "content": f"Message {j} " * 40,
+                }
+                for j in range(messages)
+            ]
+            last_chatted = None
+            if i >= undated:
+                # a few chats share a timestamp so the id tiebreak is exercised
+                last_chatted = (now - timedelta(seconds=i // 3)).isoformat()
+            self.messages[id] = conversation
+            self.rows.append(
+                {
+                    "id": id,
+                    "owner": owner,
+                    "model": model,
+                    "last_chatted": last_chatted,
+                    "session_id": None,
+                    "context_summary": None,
+                    "context_summary_seq": 0,
+                    "preview": conversation[-1]["content"][:200],
+                    "message_count": messages,
+                }
+            )
+        # last_chatted desc with nulls first, then id desc
+        self.rows.sort(key=lambda row: row["id"], reverse=True)
+        self.rows.sort(key=lambda row: row["last_chatted"] or "~", reverse=True)
+
+
+async def measure(list_chats, runs):
+    latencies = []
+    payload = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        payload = await list_chats()
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies), payload
+
+
+async def main(args):
+    supabase = FakeSupabase(args.latency)
+    owner = str(uuid.uuid4())
+    supabase.seed(owner, args.model, args.chats, args.messages, args.undated)
+    print(f"seeded:        {args.chats} chats x {args.messages} messages")
+    print(f"round trip:    {args.latency * 1000:.0f} ms")
+
+    async def full():
+        chats = await get_chats_by_model(supabase, owner, args.model)
+        return len(json.dumps([chat.model_dump() for chat in chats]))
+
+    async def first_page():
+        page = await get_chat_summaries(supabase, owner, args.model, args.limit)
+        return len(page.model_dump_json())
+
+    listed = []
+
+    async def all_pages():
+        payload = 0
+        after = None
+        listed.clear()
+        while True:
+            page = await get_chat_summaries(
+                supabase, owner, args.model, args.limit, after
+            )
+            payload += len(page.model_dump_json())
+            listed.extend(chat.id for chat in page.chats)
+            if not page.next_cursor:
+                return payload
+            after = decode_cursor(page.next_cursor)
+
+    print(f"{'listing':<22}{'median ms':>12}{'payload KB':>12}")
+    for name, list_chats in [
+        ("get_by_model", full),
+        (f"list, first {args.limit}", first_page),
+        ("list, all pages", all_pages),
+    ]:
+        latency, payload = await measure(list_chats, args.runs)
+        print(f"{name:<22}{latency * 1000:>12.1f}{payload / 1e3:>12.1f}")
+    expected = [row["id"] for row in supabase.rows]
+    print(f"pages complete and ordered: {listed == expected}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare full chat listing against paged chat summaries"
+    )
+    parser.add_argument("--model", default="benchmark")
+    parser.add_argument("--chats", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--undated", type=int, default=10)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--runs", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import random
+from types import SimpleNamespace
+
+import models.context as context
+from models.conversation import Conversation
+import utils.clients as clients
+
+WORDS = (
+    "order pizza calendar meeting outfit amazon doordash weather flight hotel".split()
+)
+
+
+class FakeGroq:
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, max_tokens, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        summary = " ".join(random.choices(WORDS, k=max_tokens // 2))
+        message = SimpleNamespace(content=summary)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class FakeWriter:
+    def __init__(self):
+        self.updates = 0
+
+    def update(self, **kwargs):
+        self.updates += 1
+
+
+def sentence(words):
+    return " ".join(random.choices(WORDS, k=words))
+
+
+def prompt_tokens(prompt):
+    return sum(context.estimate_tokens(message["content"]) for message in prompt)
+
+
+async def main(args):
+    random.seed(0)
+    groq = FakeGroq(args.latency)
+    clients.clients["groq"] = groq
+    writer = FakeWriter()
+    window = context.ContextWindow()
+    messages = Conversation()
+    print(f"turns:           {args.turns}")
+    print(f"words/turn:      {args.user_words} user, {args.reply_words} assistant")
+    print(f"max tokens:      {context.context_max_tokens}")
+    print(f"{'turn':>6}{'full history':>14}{'windowed':>10}{'summarized to':>15}")
+    for turn in range(1, args.turns + 1):
+        content = f"User: {sentence(args.user_words)}\nAssistant: "
+        messages.append({"type": "text", "role": "user", "content": content})
+        if turn % 5 == 0:
+            messages.append({"type": "file", "role": "assistant", "content": "url"})
+        full = prompt_tokens(
+            [message for message in messages if message["type"] == "text"]
+        )
+        windowed = prompt_tokens(window.build(messages))
+        reply = sentence(args.reply_words)
+        messages.append({"type": "text", "role": "assistant", "content": reply})
+        window.compact_later(messages, writer)
+        if window.compacting:
+            await window.compacting
+        if turn in args.report or turn == args.turns:
+            print(f"{turn:>6}{full:>14}{windowed:>10}{window.summary_seq:>15}")
+    print(f"summary calls:   {groq.calls}")
+    print(f"summary saves:   {writer.updates}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Track per-turn prompt size of a growing chat with and without the context window"
+    )
+    parser.add_argument("--turns", type=int, default=400)
+    parser.add_argument("--user-words", type=int, default=30)
+    parser.add_argument("--reply-words", type=int, default=120)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument(
+        "--report", type=int, nargs="+", default=[10, 25, 50, 100, 200, 400]
+    )
+    asyncio.run(main(parser.parse_args()))
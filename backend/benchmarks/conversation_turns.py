@@ -0,0 +1,102 @@
+import argparse
+import asyncio
+import base64
+import gc
+import io
+import os
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+import models.context as context
+import models.conversation as conversation
+
+
+class FakeWriter:
+    chat_id = "chat"
+
+    async def rewrite(self, seqs):
+        pass
+
+
+async def fake_store_screenshot(supabase, uid, screenshot):
+    return {"url": f"https://storage.local/{len(screenshot)}.png", "thumbnail": None}
+
+
+def make_history(size, blob_every, blob_bytes):
+    messages = []
+    for i in range(size):
+        if i % blob_every == blob_every - 1:
+            data = base64.b64encode(os.urandom(blob_bytes)).decode()
+            content = f"data:image/png;base64,{data}"
+            messages.append({"type": "file", "role": "assistant", "content": content})
+        else:
+            role = "user" if i % 2 else "assistant"
+            content = f"Message {i} " + "lorem ipsum " * 20
+            messages.append({"type": "text", "role": role, "content": content})
+    return messages
+
+
+def full_history_prompt(messages):
+    filtered_messages = [m for m in messages if m["type"] == "text"]
+    return [
+        {k: message[k] for k in ("role", "content")} for message in filtered_messages
+    ]
+
+
+def per_turn_us(build, messages, turns):
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        for _ in range(turns):
+            build(messages)
+    return (time.perf_counter() - start) / turns * 1e6
+
+
+def held_mb(make):
+    gc.collect()
+    tracemalloc.start()
+    value = make()
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, held / 1e6
+
+
+async def main(args):
+    conversation.store_screenshot = fake_store_screenshot
+    window = context.ContextWindow()
+    print(f"inline image every {args.blob_every} messages, {args.blob_bytes} bytes")
+    print(
+        f"{'messages':>9}{'full us':>10}{'window us':>11}"
+        f"{'list MB':>10}{'by ref MB':>11}"
+    )
+    for size in args.sizes:
+        messages, list_mb = held_mb(
+            lambda: make_history(size, args.blob_every, args.blob_bytes)
+        )
+        full = per_turn_us(full_history_prompt, messages, args.turns)
+        del messages
+
+        gc.collect()
+        tracemalloc.start()
+        history = conversation.Conversation(
+            make_history(size, args.blob_every, args.blob_bytes)
+        )
+        with redirect_stdout(io.StringIO()):
+            await history.externalize_blobs(None, "user", FakeWriter())
+        gc.collect()
+        ref_mb = tracemalloc.get_traced_memory()[0] / 1e6
+        tracemalloc.stop()
+        windowed = per_turn_us(window.build, history, args.turns)
+        print(f"{size:>9}{full:>10.0f}{windowed:>11.1f}{list_mb:>10.1f}{ref_mb:>11.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Per-turn prompt build time and memory held by chat history, as a plain list vs. a Conversation"
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--blob-every", type=int, default=20)
+    parser.add_argument("--blob-bytes", type=int, default=100_000)
+    asyncio.run(main(parser.parse_args()))
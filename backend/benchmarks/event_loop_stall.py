@@ -0,0 +1,234 @@
+import argparse
+import asyncio
+import base64
+import io
+import os
+import statistics
+import time
+from types import SimpleNamespace
+from PIL import Image
+
+os.environ.setdefault("SUPABASE_JWT_SECRET", "benchmark-secret")
+os.environ.setdefault("SUPABASE_JWT_ISSUER", "benchmark")
+
+import jwt
+from fastapi import WebSocketDisconnect
+
+import models.chat as chat
+from models.agent import get_job
+from models.context import ContextWindow
+from models.conversation import Conversation
+from models.chat_writer import ChatWriter
+import utils.clients as clients
+
+
+def make_image():
+    output = io.BytesIO()
+    Image.new("RGB", (640, 480), "white").save(output, format="JPEG")
+    return "data:image/jpeg;base64," + base64.b64encode(output.getvalue()).decode()
+
+
+IMAGE = make_image()
+
+
+class FakeQuery:
+    def __init__(self, supabase):
+        self.supabase = supabase
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        self.supabase.round_trips += 1
+        time.sleep(self.supabase.latency)
+        return SimpleNamespace(data=[])
+
+
+class FakeBucket:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def upload(self, **kwargs):
+        time.sleep(self.latency)
+
+    def get_public_url(self, path):
+        return f"https://storage.local/{path}"
+
+
+class FakeSupabase:
+    def __init__(self, latency):
+        self.latency = latency
+        self.round_trips = 0
+        self.storage = SimpleNamespace(from_=lambda bucket: FakeBucket(latency))
+
+    def set_token(self, token):
+        pass
+
+    def table(self, name):
+        return FakeQuery(self)
+
+    def rpc(self, name, params):
+        return FakeQuery(self)
+
+
+class FakeGroq:
+    def __init__(self, latency):
+        self.latency = latency
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, stream=False, **kwargs):
+        await asyncio.sleep(self.latency)
+        content = "Order a cheeseburger on Doordash."
+        if stream:
+            return self.chunks(content)
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    async def chunks(self, content):
+        for word in content.split(" "):
+            delta = SimpleNamespace(content=word + " ")
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+class FakeMultiOn:
+    def __init__(self, latency, steps):
+        self.latency = latency
+        self.steps = steps
+        self.calls = {}
+        self.sessions = SimpleNamespace(
+            create=self.create,
+            step=self.step,
+            screenshot=self.screenshot,
+            close=self.close,
+        )
+
+    async def create(self, **kwargs):
+        return await self.step(session_id=f"session-{len(self.calls)}")
+
+    async def step(self, session_id, **kwargs):
+        await asyncio.sleep(self.latency)
+        calls = self.calls.get(session_id, 0) + 1
+        self.calls[session_id] = calls
+        status = "DONE" if calls > self.steps else "CONTINUE"
+        return SimpleNamespace(
+            session_id=session_id, message=f"Step {calls}", status=status
+        )
+
+    async def screenshot(self, **kwargs):
+        await asyncio.sleep(self.latency)
+        return SimpleNamespace(screenshot="https://screenshots.local/step.png")
+
+    async def close(self, session_id, **kwargs):
+        return SimpleNamespace(status="closed", session_id=session_id)
+
+
+class FakeReplicate:
+    def __init__(self, latency):
+        self.latency = latency
+
+    async def async_run(self, ref, input=None, **kwargs):
+        await asyncio.sleep(self.latency)
+
+        async def tokens():
+            for token in ["A cheeseburger ", "with bacon."]:
+                yield token
+
+        return tokens()
+
+
+class FakeWebSocket:
+    def __init__(self, token, supabase):
+        self.state = SimpleNamespace(supabase=supabase)
+        self.incoming = [
+            {"type": "token", "role": "system", "content": token},
+            {"type": "file", "role": "user", "content": IMAGE},
+            {"type": "text", "role": "user", "content": "Order this on Doordash"},
+        ]
+
+    async def receive_json(self):
+        if not self.incoming:
+            raise WebSocketDisconnect()
+        return self.incoming.pop(0)
+
+    async def send_json(self, data):
+        pass
+
+
+async def monitor(interval, lags, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def run_session(token, supabase, chat_id):
+    messages = Conversation()
+    writer = ChatWriter(supabase, chat_id, messages)
+    try:
+        await chat.run_chat(
+            FakeWebSocket(token, supabase),
+            supabase,
+            chat_id,
+            "llava-13b",
+            messages,
+            None,
+            f"user-{chat_id}",
+            writer,
+            ContextWindow(),
+        )
+    except WebSocketDisconnect:
+        pass
+    while job := get_job(chat_id):
+        await job.task
+    await writer.close()
+
+
+async def main(args):
+    clients.clients["groq"] = FakeGroq(args.latency)
+    clients.clients["multion"] = FakeMultiOn(args.latency, args.steps)
+    clients.clients["replicate"] = FakeReplicate(args.latency)
+
+    token = jwt.encode(
+        {
+            "sub": "user",
+            "aud": "authenticated",
+            "iss": os.environ["SUPABASE_JWT_ISSUER"],
+            "exp": int(time.time()) + 3600,
+        },
+        os.environ["SUPABASE_JWT_SECRET"],
+        algorithm="HS256",
+    )
+    supabase = FakeSupabase(args.latency)
+
+    lags = []
+    stop = asyncio.Event()
+    monitor_task = asyncio.create_task(monitor(args.interval, lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(run_session(token, supabase, f"chat-{i}") for i in range(args.sessions))
+    )
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await monitor_task
+
+    lags.sort()
+    print(f"sessions:        {args.sessions}")
+    print(f"steps/session:   {args.steps}")
+    print(f"backend latency: {args.latency * 1000:.0f} ms")
+    print(f"wall time:       {elapsed:.2f} s")
+    print(f"loop lag mean:   {statistics.mean(lags) * 1000:.2f} ms")
+    print(f"loop lag p99:    {lags[int(len(lags) * 0.99)] * 1000:.2f} ms")
+    print(f"loop lag max:    {lags[-1] * 1000:.2f} ms")
+    print(f"total stall:     {sum(lags) * 1000:.0f} ms")
+    print(f"db round trips:  {supabase.round_trips / args.sessions:.1f} per session")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure event loop stall time of run_chat with stubbed backends"
+    )
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--steps", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--interval", type=float, default=0.01)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,104 @@
+import argparse
+import base64
+import io
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+from PIL import Image
+
+import models.chat as chat
+import utils.images as images
+
+
+class FakeBucket:
+    def upload(self, file, path, file_options):
+        if isinstance(file, bytes):
+            return len(file)
+        size = 0
+        while chunk := file.read(65536):
+            size += len(chunk)
+        return size
+
+    def get_public_url(self, path):
+        return f"https://storage.local/{path}"
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.storage = SimpleNamespace(from_=lambda bucket: FakeBucket())
+
+
+def tempfile_upload(supabase, data_url, image_path):
+    image_data = base64.b64decode(data_url.split(",")[1])
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp:
+        tmp.write(image_data)
+        tmp.flush()
+    with open(tmp.name, "rb") as f:
+        supabase.storage.from_("images").upload(
+            file=f,
+            path=image_path,
+            file_options={
+                "content-type": "image/jpg",
+                "cache-control": "3600",
+                "upsert": "true",
+            },
+        )
+    os.remove(tmp.name)
+    return supabase.storage.from_("images").get_public_url(image_path)
+
+
+def in_memory_upload(supabase, data_url, image_path):
+    image_data, content_type, _ = chat.decode_image(data_url)
+    image_data, content_type = chat.prepare_image(image_data, content_type)
+    return chat.upload_image(supabase, image_data, content_type, image_path)
+
+
+def make_data_url(width, height):
+    image = Image.effect_noise((width, height), 64).convert("RGB")
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=95)
+    return "data:image/jpeg;base64," + base64.b64encode(output.getvalue()).decode()
+
+
+def measure(upload, supabase, data_url, runs):
+    latencies = []
+    peaks = []
+    for _ in range(runs):
+        tracemalloc.start()
+        start = time.perf_counter()
+        upload(supabase, data_url, "user/chat/0")
+        latencies.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return statistics.median(latencies), max(peaks)
+
+
+def main(args):
+    supabase = FakeSupabase()
+    data_url = make_data_url(args.width, args.height)
+    print(f"image:        {args.width}x{args.height}, {len(data_url) / 1e6:.1f} MB")
+    print(f"{'path':<22}{'median ms':>12}{'peak MB':>12}")
+    results = [("tempfile", tempfile_upload)]
+    images.image_max_dimension = 0
+    results.append(("in-memory", in_memory_upload))
+    for name, upload in results:
+        latency, peak = measure(upload, supabase, data_url, args.runs)
+        print(f"{name:<22}{latency * 1000:>12.1f}{peak / 1e6:>12.1f}")
+    images.image_max_dimension = args.max_dimension
+    latency, peak = measure(in_memory_upload, supabase, data_url, args.runs)
+    name = f"in-memory + {args.max_dimension}px"
+    print(f"{name:<22}{latency * 1000:>12.1f}{peak / 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare memory peak and latency of image upload paths"
+    )
+    parser.add_argument("--width", type=int, default=3024)
+    parser.add_argument("--height", type=int, default=4032)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--max-dimension", type=int, default=1536)
+    main(parser.parse_args())
@@ -0,0 +1,60 @@
+import argparse
+import os
+import time
+import timeit
+
+os.environ.setdefault("SUPABASE_JWT_SECRET", "benchmark-secret")
+os.environ.setdefault("SUPABASE_JWT_ISSUER", "benchmark")
+
+import jwt
+
+import auth.auth_handler as auth_handler
+
+
+def make_token(sub):
+    return jwt.encode(
+        {
+            "sub": sub,
+            "aud": "authenticated",
+            "iss": os.environ["SUPABASE_JWT_ISSUER"],
+            "exp": int(time.time()) + 3600,
+            "email": f"{sub}@example.com",
+            "role": "authenticated",
+        },
+        os.environ["SUPABASE_JWT_SECRET"],
+        algorithm="HS256",
+    )
+
+
+def double_decode(token):
+    if not auth_handler.verify_jwt(token):
+        return {}
+    return auth_handler.verify_jwt(token)
+
+
+def main(args):
+    tokens = [make_token(f"user-{i}") for i in range(args.users)]
+    auth_handler.jwt_cache_size = args.users
+    print(f"users:   {args.users}")
+    print(f"{'path':<22}{'us per check':>14}")
+    for name, check in [
+        ("double decode", double_decode),
+        ("single decode", auth_handler.verify_jwt),
+        ("cached decode", auth_handler.decode_jwt),
+    ]:
+        auth_handler.verified_tokens.clear()
+        for token in tokens:
+            check(token)
+        elapsed = timeit.timeit(
+            lambda: [check(token) for token in tokens], number=args.runs
+        )
+        print(f"{name:<22}{elapsed / args.runs / args.users * 1e6:>14.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure per-message JWT verification cost with and without the claims cache"
+    )
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=200)
+    main(parser.parse_args())
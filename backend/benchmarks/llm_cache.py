@@ -0,0 +1,69 @@
+import argparse
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+import models.chat as chat
+import models.llm_cache as llm_cache
+import utils.clients as clients
+
+COMMANDS = [
+    "Order this on Doordash",
+    "order this on doordash.",
+    "Order this on DoorDash!",
+    "Schedule meeting based on my texts on Google Calendar.",
+    "schedule meeting based on my texts on google calendar",
+    "Order this outfit on Amazon",
+    "Order this outfit on Amazon.",
+    "Find this book on Goodreads",
+]
+
+
+class FakeGroq:
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        message = SimpleNamespace(content="What type of food is in the image?")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+async def replay(mode, commands, latency):
+    groq = FakeGroq(latency)
+    clients.clients["groq"] = groq
+    cache = llm_cache.LLMCache(mode, 3600, 1024)
+    llm_cache.llm_cache.__dict__.update(cache.__dict__)
+    start = time.perf_counter()
+    for command in commands:
+        await chat.image_prompt_generator_model.run(
+            [{"role": "user", "content": f"User: {command}\nPrompt:"}]
+        )
+    elapsed = time.perf_counter() - start
+    stats = llm_cache.llm_cache.stats()
+    print(
+        f"{mode:<12}{groq.calls:>8}{stats['hit_rate']:>10.0%}"
+        f"{stats['saved_ms']:>12}{elapsed:>10.2f}"
+    )
+
+
+async def main(args):
+    random.seed(0)
+    commands = random.choices(COMMANDS, k=args.requests)
+    print(f"requests:  {args.requests}, model latency {args.latency * 1000:.0f} ms")
+    print(f"{'mode':<12}{'calls':>8}{'hit rate':>10}{'saved ms':>12}{'wall s':>10}")
+    for mode in ["off", "exact", "normalized"]:
+        await replay(mode, commands, args.latency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Replay repeated user commands through the image prompt generator with each LLM cache mode"
+    )
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,69 @@
+import argparse
+import base64
+import os
+import sys
+import time
+
+import utils.log as log
+from utils.timing import span
+
+
+def per_call_us(function, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main(args):
+    screenshot = base64.b64encode(os.urandom(args.screenshot_bytes)).decode()
+    stdout = sys.stdout
+    results = []
+    with open(os.devnull, "w") as devnull:
+        sys.stdout = devnull
+        try:
+            results.append(
+                (
+                    "print full screenshot",
+                    per_call_us(lambda: print(screenshot), args.calls),
+                )
+            )
+            log.log_level = log.levels["debug"]
+            results.append(
+                (
+                    "debug, LOG_LEVEL=debug",
+                    per_call_us(
+                        lambda: log.debug("Screenshot", screenshot), args.calls
+                    ),
+                )
+            )
+            log.log_level = log.levels["info"]
+            results.append(
+                (
+                    "debug, LOG_LEVEL=info",
+                    per_call_us(
+                        lambda: log.debug("Screenshot", screenshot), args.calls
+                    ),
+                )
+            )
+        finally:
+            sys.stdout = stdout
+
+    def timed():
+        with span("benchmark"):
+            pass
+
+    results.append(("span", per_call_us(timed, args.calls)))
+    print(f"screenshot:      {len(screenshot)} base64 chars, stdout to /dev/null")
+    print(f"{'call':<26}{'us/call':>10}")
+    for name, us in results:
+        print(f"{name:<26}{us:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Per-call cost of payload logging and timing spans on the agent step path"
+    )
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--screenshot-bytes", type=int, default=750_000)
+    main(parser.parse_args())
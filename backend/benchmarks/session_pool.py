@@ -0,0 +1,69 @@
+import argparse
+import asyncio
+import random
+import time
+
+import models.session_pool as session_pool
+import utils.clients as clients
+from utils.fake_multion import FakeMultiOn
+
+
+async def run_chat(pool, multion, delay, steps):
+    await asyncio.sleep(delay)
+    start = time.perf_counter()
+    session = await pool.acquire()
+    first_step = time.perf_counter() - start
+    for _ in range(steps):
+        await multion.sessions.step(session_id=session.session_id, cmd="Order")
+    pool.release(session.session_id)
+    return first_step
+
+
+async def replay(size, args):
+    multion = FakeMultiOn(args.create_latency, args.step_latency, 0, args.steps)
+    clients.clients["multion"] = multion
+    pool = session_pool.SessionPool(size, args.max_sessions, 240)
+    pool.refill()
+    await asyncio.sleep(args.create_latency * 1.5)
+    random.seed(0)
+    delays = sorted(random.uniform(0, args.duration) for _ in range(args.chats))
+    waits = sorted(
+        await asyncio.gather(
+            *(run_chat(pool, multion, delay, args.steps) for delay in delays)
+        )
+    )
+    stats = pool.stats()
+    await pool.close()
+    print(
+        f"{size:>6}{sum(waits) / len(waits) * 1000:>12.0f}"
+        f"{waits[int(len(waits) * 0.95)] * 1000:>10.0f}{stats['hit_rate']:>10.0%}"
+        f"{multion.created:>10}{len(multion.open):>8}"
+    )
+
+
+async def main(args):
+    print(f"chats:           {args.chats} over {args.duration:.0f} s")
+    print(
+        f"latency (ms):    create {args.create_latency * 1000:.0f}, "
+        f"step {args.step_latency * 1000:.0f}"
+    )
+    print(
+        f"{'pool':>6}{'wait ms':>12}{'p95 ms':>10}{'hit rate':>10}"
+        f"{'created':>10}{'open':>8}"
+    )
+    for size in args.sizes:
+        await replay(size, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure time to a ready MultiOn session with and without warm pooled sessions"
+    )
+    parser.add_argument("--chats", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--steps", type=int, default=3)
+    parser.add_argument("--create-latency", type=float, default=1.0)
+    parser.add_argument("--step-latency", type=float, default=0.2)
+    parser.add_argument("--max-sessions", type=int, default=64)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 4, 16])
+    asyncio.run(main(parser.parse_args()))
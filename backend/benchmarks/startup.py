@@ -0,0 +1,117 @@
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import httpx
+
+modules = [
+    "groq",
+    "multion.client",
+    "replicate",
+    "fastapi",
+    "utils.supabase",
+    "utils.clients",
+    "models.agent",
+    "models.chat",
+    "routes.router",
+    "main",
+]
+providers = "import groq, multion.client, replicate; "
+# clients are only constructed, never called, so placeholder keys are enough
+dummy_keys = {
+    "GROQ_API_KEY": "benchmark",
+    "MULTION_API_KEY": "benchmark",
+    "REPLICATE_API_TOKEN": "benchmark",
+}
+
+
+def import_times(preload):
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"{preload}import main"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    times = {"total": 0.0}
+    for line in output.splitlines()[1:]:
+        _, cumulative, name = line.split("|")
+        if not name.startswith("  "):
+            times["total"] += int(cumulative) / 1000
+        name = name.strip()
+        if name in modules and name not in times:
+            times[name] = int(cumulative) / 1000
+    return times
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve(preload):
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            f"{preload}import uvicorn; "
+            f"uvicorn.run('main:app', port={port}, log_level='error')",
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        env={**dummy_keys, **os.environ},
+    )
+    first_request = ready = None
+    try:
+        while ready is None and time.perf_counter() - start < 60:
+            try:
+                response = httpx.get(f"http://127.0.0.1:{port}/ready", timeout=1)
+            except httpx.TransportError:
+                time.sleep(0.005)
+                continue
+            first_request = first_request or time.perf_counter() - start
+            if response.status_code == 200:
+                ready = time.perf_counter() - start
+            else:
+                time.sleep(0.005)
+    finally:
+        server.terminate()
+        server.wait()
+    return first_request, ready
+
+
+def median_ms(values):
+    values = [value for value in values if value is not None]
+    if not values:
+        return "n/a"
+    return f"{statistics.median(values) * 1000:.0f}"
+
+
+def main(args):
+    print(f"{'module':<18}{'eager ms':>12}{'lazy ms':>12}")
+    eager = [import_times(providers) for _ in range(args.runs)]
+    lazy = [import_times("") for _ in range(args.runs)]
+    for module in modules + ["total"]:
+        eager_ms = statistics.median(run.get(module, 0) for run in eager)
+        lazy_ms = statistics.median(run.get(module, 0) for run in lazy)
+        print(f"{module:<18}{eager_ms:>12.1f}{lazy_ms:>12.1f}")
+    print()
+    print(f"{'server':<18}{'first req ms':>14}{'ready ms':>12}")
+    for name, preload in [("eager", providers), ("lazy", "")]:
+        runs = [serve(preload) for _ in range(args.runs)]
+        first_request = median_ms(run[0] for run in runs)
+        ready = median_ms(run[1] for run in runs)
+        print(f"{name:<18}{first_request:>14}{ready:>12}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure import time per module and time to the first request and to readiness"
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,124 @@
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault("SUPABASE_JWT_SECRET", "benchmark-secret")
+
+import jwt
+from supabase import ClientOptions, create_client
+
+import utils.supabase as supabase_clients
+from utils.executor import run_sync
+
+
+class StandIn(BaseHTTPRequestHandler):
+    latency = 0.01
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.latency)
+        token = self.headers["Authorization"].removeprefix("Bearer ")
+        sub = jwt.decode(token, options={"verify_signature": False})["sub"]
+        if self.path.startswith("/auth/v1/user"):
+            body = {
+                "id": sub,
+                "aud": "authenticated",
+                "app_metadata": {},
+                "user_metadata": {},
+                "created_at": "2024-01-01T00:00:00Z",
+            }
+        else:
+            body = [{"owner": sub}]
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def make_token(sub):
+    return jwt.encode(
+        {"sub": sub, "aud": "authenticated", "exp": int(time.time()) + 3600},
+        os.environ["SUPABASE_JWT_SECRET"],
+        algorithm="HS256",
+    )
+
+
+async def read_twice(supabase, uid):
+    owners = []
+    for _ in range(2):
+        response = await run_sync(supabase.table("chats").select("owner").execute)
+        owners.append(response.data[0]["owner"])
+    return all(owner == uid for owner in owners)
+
+
+async def shared_request(supabase, token, uid):
+    supabase.auth.set_session(token, "lol")
+    return await read_twice(supabase, uid)
+
+
+async def isolated_request(token, uid):
+    return await read_twice(supabase_clients.SupabaseClient(token), uid)
+
+
+async def run(name, request, users, requests):
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(request(token, uid) for uid, token in users for _ in range(requests))
+    )
+    elapsed = time.perf_counter() - start
+    wrong = results.count(False)
+    print(f"{name:<22}{len(results) / elapsed:>12.0f}{wrong:>14}")
+
+
+async def main(args):
+    StandIn.latency = args.latency
+    server = StandInServer(("127.0.0.1", 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    supabase_clients.supabase_url = url
+    supabase_clients.supabase_key = make_token("anon")
+
+    users = [(f"user-{i}", make_token(f"user-{i}")) for i in range(args.users)]
+    shared = create_client(
+        url,
+        supabase_clients.supabase_key,
+        ClientOptions(auto_refresh_token=False),
+    )
+
+    print(f"users:     {args.users} x {args.requests} requests")
+    print(f"latency:   {args.latency * 1000:.0f} ms")
+    print(f"{'client':<22}{'req/s':>12}{'wrong owner':>14}")
+    await run(
+        "shared set_session",
+        lambda token, uid: shared_request(shared, token, uid),
+        users,
+        args.requests,
+    )
+    await run("per-request", isolated_request, users, args.requests)
+    server.shutdown()
+    supabase_clients.close_supabase()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Load a local PostgREST stand-in from many users at once and check each response belongs to its caller"
+    )
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.01)
+    asyncio.run(main(parser.parse_args()))
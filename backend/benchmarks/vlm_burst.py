@@ -0,0 +1,67 @@
+import argparse
+import asyncio
+import statistics
+import time
+
+import models.vlm as vlm
+
+
+class TrackedVLM(vlm.FakeVLM):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.peak = 0
+
+    async def generate(self, image_url, image_prompt):
+        self.peak = max(self.peak, self.in_flight)
+        async for token in super().generate(image_url, image_prompt):
+            yield token
+
+
+async def describe(model):
+    start = time.perf_counter()
+    tokens = [token async for _, token in vlm.stream_vlm(model, "image", "prompt")]
+    return time.perf_counter() - start, bool(tokens)
+
+
+async def main(args):
+    vlm.vlms.clear()
+    vlm.register_vlm(
+        TrackedVLM(
+            "primary",
+            delay=args.slow,
+            fallbacks=["secondary"],
+            concurrency=args.concurrency,
+            first_token_timeout=args.slow * 4,
+        )
+    )
+    vlm.register_vlm(
+        TrackedVLM(
+            "secondary",
+            delay=args.fast,
+            fallbacks=["primary"],
+            concurrency=args.concurrency,
+        )
+    )
+    vlm.vlm_slow_latency = args.slow / 2
+    start = time.perf_counter()
+    results = await asyncio.gather(*(describe("primary") for _ in range(args.burst)))
+    elapsed = time.perf_counter() - start
+    latencies = sorted(latency for latency, _ in results)
+    print(f"burst:           {args.burst} images, concurrency {args.concurrency}")
+    print(f"wall time:       {elapsed:.2f} s")
+    print(f"latency p50:     {statistics.median(latencies) * 1000:.0f} ms")
+    print(f"latency p99:     {latencies[int(len(latencies) * 0.99)] * 1000:.0f} ms")
+    print(f"fallbacks:       {vlm.fallbacks_used}")
+    for name, backend in vlm.vlms.items():
+        print(f"{name:<17}{backend.requests} requests, peak in flight {backend.peak}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Send a burst of image descriptions through the VLM registry with a slow primary backend"
+    )
+    parser.add_argument("--burst", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--slow", type=float, default=0.5)
+    parser.add_argument("--fast", type=float, default=0.1)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,185 @@
+import argparse
+import asyncio
+import io
+import json
+import socket
+import time
+from contextlib import redirect_stdout
+import uvicorn
+import websockets
+from fastapi import FastAPI, WebSocket
+from PIL import Image
+
+from utils.frames import (
+    accept,
+    binary_subprotocol,
+    inline_content,
+    pack_frame,
+    receive_message,
+    send_message,
+)
+from utils.images import make_thumbnail
+
+
+def make_screenshot(width, height):
+    image = Image.effect_noise((width, height), 32).convert("RGB")
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=90)
+    return output.getvalue()
+
+
+def make_description(size):
+    sentence = "The screenshot shows a search results page with a list of flights. "
+    return (sentence * (size // len(sentence) + 1))[:size]
+
+
+def make_app(thumbnails, description):
+    app = FastAPI()
+
+    @app.websocket("/run")
+    async def run(websocket: WebSocket):
+        await accept(websocket)
+        await receive_message(websocket)
+        await receive_message(websocket)
+        await send_message(
+            websocket,
+            {"type": "text", "role": "assistant", "content": description},
+        )
+        for step, thumbnail in enumerate(thumbnails):
+            await send_message(
+                websocket,
+                {
+                    "type": "text",
+                    "role": "assistant",
+                    "content": f"Step {step}: clicked the search box and typed the query",
+                },
+            )
+            await send_message(
+                websocket,
+                {
+                    "type": "file",
+                    "role": "assistant",
+                    "content": thumbnail,
+                    "content_type": "image/jpeg",
+                    "url": f"https://storage.local/{step}.jpg",
+                },
+            )
+        await websocket.close()
+
+    return app
+
+
+class CountingProxy:
+    def __init__(self, port):
+        self.port = port
+        self.sent = 0
+        self.received = 0
+
+    async def pipe(self, reader, writer, upstream):
+        while data := await reader.read(65536):
+            if upstream:
+                self.sent += len(data)
+            else:
+                self.received += len(data)
+            writer.write(data)
+            await writer.drain()
+        writer.close()
+
+    async def handle(self, reader, writer):
+        server_reader, server_writer = await asyncio.open_connection(
+            "127.0.0.1", self.port
+        )
+        await asyncio.gather(
+            self.pipe(reader, server_writer, True),
+            self.pipe(server_reader, writer, False),
+        )
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_client(port, binary, compression, upload, steps):
+    proxy = CountingProxy(port)
+    server = await asyncio.start_server(proxy.handle, "127.0.0.1", 0)
+    proxy_port = server.sockets[0].getsockname()[1]
+    upload_message = {"type": "file", "role": "user", "content": upload}
+    start = time.perf_counter()
+    async with websockets.connect(
+        f"ws://127.0.0.1:{proxy_port}/run",
+        subprotocols=[binary_subprotocol] if binary else None,
+        compression=compression,
+        max_size=None,
+    ) as ws:
+        if ws.subprotocol == binary_subprotocol:
+            await ws.send(pack_frame({"type": "file", "role": "user"}, upload))
+        else:
+            await ws.send(json.dumps(inline_content(upload_message)))
+        await ws.send(json.dumps({"type": "text", "role": "user", "content": "Hi"}))
+        frames = 0
+        async for _ in ws:
+            frames += 1
+    elapsed = time.perf_counter() - start
+    server.close()
+    await asyncio.sleep(0.05)
+    return elapsed, frames, proxy.sent, proxy.received
+
+
+async def main(args):
+    upload = make_screenshot(args.upload_width, args.upload_height)
+    thumbnails = [
+        make_thumbnail(make_screenshot(args.width, args.height))
+        for _ in range(args.steps)
+    ]
+    port = free_port()
+    config = uvicorn.Config(
+        make_app(thumbnails, make_description(args.description_bytes)),
+        port=port,
+        log_level="error",
+        lifespan="off",
+    )
+    server = uvicorn.Server(config)
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    print(f"upload:       {len(upload) / 1e6:.2f} MB")
+    thumbnail_size = sum(map(len, thumbnails)) / len(thumbnails)
+    print(f"thumbnail:    {thumbnail_size / 1e3:.1f} KB x {args.steps} steps")
+    print(f"{'frames':<18}{'wall ms':>10}{'up KB':>10}{'down KB':>10}{'MB/s':>8}")
+    for name, binary, compression in [
+        ("json", False, None),
+        ("json + deflate", False, "deflate"),
+        ("binary", True, None),
+        ("binary + deflate", True, "deflate"),
+    ]:
+        walls = []
+        for _ in range(args.runs):
+            with redirect_stdout(io.StringIO()):
+                wall, frames, sent, received = await run_client(
+                    port, binary, compression, upload, args.steps
+                )
+            walls.append(wall)
+        wall = sorted(walls)[len(walls) // 2]
+        total = len(upload) + thumbnail_size * args.steps
+        print(
+            f"{name:<18}{wall * 1000:>10.1f}{sent / 1e3:>10.1f}"
+            f"{received / 1e3:>10.1f}{total / wall / 1e6:>8.1f}"
+        )
+    server.should_exit = True
+    await serving
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare JSON data URL and binary websocket frames for an image-heavy agent run"
+    )
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=800)
+    parser.add_argument("--upload-width", type=int, default=2048)
+    parser.add_argument("--upload-height", type=int, default=1536)
+    parser.add_argument("--description-bytes", type=int, default=8192)
+    parser.add_argument("--runs", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -1,10 +1,35 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from models.agent import close_jobs
+from models.chat_writer import close_writers
+from models.events import event_broker
+from models.session_pool import session_pool
 from routes.router import router
-from utils.supabase import init_supabase
+from utils.clients import close_clients, warm_clients
+from utils.supabase import close_supabase
 
 
-app = FastAPI()
+async def warm_up():
+    await warm_clients()
+    session_pool.refill()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warming = asyncio.create_task(warm_up())
+    yield
+    warming.cancel()
+    await close_jobs()
+    await session_pool.close()
+    await close_writers()
+    await event_broker.close()
+    await close_clients()
+    close_supabase()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -14,6 +39,4 @@ app.add_middleware(
     allow_credentials=True,
 )
 
-app.supabase = init_supabase()
-
 app.include_router(router)
@@ -0,0 +1,65 @@
+-- Store chat messages as one row each instead of rewriting chats.messages.
+
+create table if not exists public.chat_messages (
+  id bigint generated by default as identity primary key,
+  chat_id uuid not null references public.chats (id) on delete cascade,
+  seq integer not null,
+  type text not null,
+  role text not null,
+  content text not null,
+  created_at timestamptz not null default now(),
+  unique (chat_id, seq)
+);
+
+alter table public.chat_messages enable row level security;
+
+create policy "Enable all for owners of the chat"
+on public.chat_messages
+to public
+using (
+  exists (
+    select 1 from public.chats
+    where chats.id = chat_messages.chat_id
+    and chats.owner = (select auth.uid())
+  )
+);
+
+create or replace function public.append_chat_messages(
+  chat_id uuid,
+  start_seq integer,
+  messages jsonb,
+  last_chatted timestamptz
+)
+returns void
+language sql
+security invoker
+as $$
+  insert into public.chat_messages (chat_id, seq, type, role, content)
+  select
+    append_chat_messages.chat_id,
+    append_chat_messages.start_seq + message.seq - 1,
+    message.value ->> 'type',
+    message.value ->> 'role',
+    message.value ->> 'content'
+  from jsonb_array_elements(append_chat_messages.messages)
+    with ordinality as message(value, seq)
+  on conflict (chat_id, seq) do update
+    set type = excluded.type, role = excluded.role, content = excluded.content;
+
+  update public.chats
+  set last_chatted = append_chat_messages.last_chatted
+  where id = append_chat_messages.chat_id;
+$$;
+
+insert into public.chat_messages (chat_id, seq, type, role, content)
+select
+  chats.id,
+  message.seq - 1,
+  message.value ->> 'type',
+  message.value ->> 'role',
+  message.value ->> 'content'
+from public.chats,
+  json_array_elements(chats.messages) with ordinality as message(value, seq)
+on conflict (chat_id, seq) do nothing;
+
+alter table public.chats drop column messages;
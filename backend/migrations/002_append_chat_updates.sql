@@ -0,0 +1,38 @@
+-- Let append_chat_messages also apply buffered chats column updates, so a
+-- write-behind flush is a single round trip.
+
+drop function if exists public.append_chat_messages(uuid, integer, jsonb, timestamptz);
+
+create or replace function public.append_chat_messages(
+  chat_id uuid,
+  start_seq integer,
+  messages jsonb,
+  last_chatted timestamptz,
+  updates jsonb default '{}'::jsonb
+)
+returns void
+language sql
+security invoker
+as $$
+  insert into public.chat_messages (chat_id, seq, type, role, content)
+  select
+    append_chat_messages.chat_id,
+    append_chat_messages.start_seq + message.seq - 1,
+    message.value ->> 'type',
+    message.value ->> 'role',
+    message.value ->> 'content'
+  from jsonb_array_elements(append_chat_messages.messages)
+    with ordinality as message(value, seq)
+  on conflict (chat_id, seq) do update
+    set type = excluded.type, role = excluded.role, content = excluded.content;
+
+  update public.chats
+  set
+    last_chatted = append_chat_messages.last_chatted,
+    session_id = case
+      when append_chat_messages.updates ? 'session_id'
+      then append_chat_messages.updates ->> 'session_id'
+      else chats.session_id
+    end
+  where id = append_chat_messages.chat_id;
+$$;
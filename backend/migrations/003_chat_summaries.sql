@@ -0,0 +1,78 @@
+-- Keep a preview and message count on chats so the sidebar can list chats
+-- without reading chat_messages.
+
+alter table public.chats
+  add column if not exists preview text,
+  add column if not exists message_count integer not null default 0;
+
+update public.chats
+set message_count = counts.message_count
+from (
+  select chat_id, count(*) as message_count
+  from public.chat_messages
+  group by chat_id
+) counts
+where chats.id = counts.chat_id;
+
+update public.chats
+set preview = last_text.content
+from (
+  select distinct on (chat_id) chat_id, left(content, 200) as content
+  from public.chat_messages
+  where type = 'text'
+  order by chat_id, seq desc
+) last_text
+where chats.id = last_text.chat_id;
+
+create index if not exists chats_owner_model_last_chatted_idx
+on public.chats (owner, model, last_chatted desc, id desc);
+
+create or replace function public.append_chat_messages(
+  chat_id uuid,
+  start_seq integer,
+  messages jsonb,
+  last_chatted timestamptz,
+  updates jsonb default '{}'::jsonb
+)
+returns void
+language sql
+security invoker
+as $$
+  insert into public.chat_messages (chat_id, seq, type, role, content)
+  select
+    append_chat_messages.chat_id,
+    append_chat_messages.start_seq + message.seq - 1,
+    message.value ->> 'type',
+    message.value ->> 'role',
+    message.value ->> 'content'
+  from jsonb_array_elements(append_chat_messages.messages)
+    with ordinality as message(value, seq)
+  on conflict (chat_id, seq) do update
+    set type = excluded.type, role = excluded.role, content = excluded.content;
+
+  update public.chats
+  set
+    last_chatted = append_chat_messages.last_chatted,
+    session_id = case
+      when append_chat_messages.updates ? 'session_id'
+      then append_chat_messages.updates ->> 'session_id'
+      else chats.session_id
+    end,
+    message_count = greatest(
+      chats.message_count,
+      append_chat_messages.start_seq
+        + jsonb_array_length(append_chat_messages.messages)
+    ),
+    preview = coalesce(
+      (
+        select left(message.value ->> 'content', 200)
+        from jsonb_array_elements(append_chat_messages.messages)
+          with ordinality as message(value, seq)
+        where message.value ->> 'type' = 'text'
+        order by message.seq desc
+        limit 1
+      ),
+      chats.preview
+    )
+  where id = append_chat_messages.chat_id;
+$$;
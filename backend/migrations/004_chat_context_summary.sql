@@ -0,0 +1,67 @@
+-- Keep a rolling summary of older chat turns on chats, so long chats can be
+-- sent to the model as summary + recent turns. context_summary_seq is the seq
+-- of the first message not covered by the summary.
+
+alter table public.chats
+  add column if not exists context_summary text,
+  add column if not exists context_summary_seq integer not null default 0;
+
+create or replace function public.append_chat_messages(
+  chat_id uuid,
+  start_seq integer,
+  messages jsonb,
+  last_chatted timestamptz,
+  updates jsonb default '{}'::jsonb
+)
+returns void
+language sql
+security invoker
+as $$
+  insert into public.chat_messages (chat_id, seq, type, role, content)
+  select
+    append_chat_messages.chat_id,
+    append_chat_messages.start_seq + message.seq - 1,
+    message.value ->> 'type',
+    message.value ->> 'role',
+    message.value ->> 'content'
+  from jsonb_array_elements(append_chat_messages.messages)
+    with ordinality as message(value, seq)
+  on conflict (chat_id, seq) do update
+    set type = excluded.type, role = excluded.role, content = excluded.content;
+
+  update public.chats
+  set
+    last_chatted = append_chat_messages.last_chatted,
+    session_id = case
+      when append_chat_messages.updates ? 'session_id'
+      then append_chat_messages.updates ->> 'session_id'
+      else chats.session_id
+    end,
+    context_summary = case
+      when append_chat_messages.updates ? 'context_summary'
+      then append_chat_messages.updates ->> 'context_summary'
+      else chats.context_summary
+    end,
+    context_summary_seq = case
+      when append_chat_messages.updates ? 'context_summary_seq'
+      then (append_chat_messages.updates ->> 'context_summary_seq')::integer
+      else chats.context_summary_seq
+    end,
+    message_count = greatest(
+      chats.message_count,
+      append_chat_messages.start_seq
+        + jsonb_array_length(append_chat_messages.messages)
+    ),
+    preview = coalesce(
+      (
+        select left(message.value ->> 'content', 200)
+        from jsonb_array_elements(append_chat_messages.messages)
+          with ordinality as message(value, seq)
+        where message.value ->> 'type' = 'text'
+        order by message.seq desc
+        limit 1
+      ),
+      chats.preview
+    )
+  where id = append_chat_messages.chat_id;
+$$;
@@ -0,0 +1,206 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Callable, Deque, Dict, Optional
+from utils.config import load_config
+from utils.timing import StageStats, Timings
+
+load_config()
+
+chat_max_active = int(os.getenv("CHAT_MAX_ACTIVE", "64"))
+chat_max_active_per_user = int(os.getenv("CHAT_MAX_ACTIVE_PER_USER", "2"))
+chat_max_queued = int(os.getenv("CHAT_MAX_QUEUED", "256"))
+admission_max_queued_per_user = int(os.getenv("ADMISSION_MAX_QUEUED_PER_USER", "4"))
+admission_max_wait = float(os.getenv("ADMISSION_MAX_WAIT", "30"))
+admission_retry_after = int(os.getenv("ADMISSION_RETRY_AFTER", "5"))
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Server busy, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+def queued_message(position: int) -> Dict:
+    return {"type": "text", "role": "system", "content": "Queued", "position": position}
+
+
+def busy_message(retry_after: int) -> Dict:
+    return {
+        "type": "text",
+        "role": "system",
+        "content": "Server busy",
+        "retry_after": retry_after,
+    }
+
+
+class Waiter:
+    def __init__(self, on_position: Optional[Callable[[int], None]]):
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.on_position = on_position
+        self.position = 0
+
+
+class Admission:
+    def __init__(
+        self,
+        max_active: int,
+        max_active_per_user: int,
+        max_queued: int,
+        max_queued_per_user: int = admission_max_queued_per_user,
+        max_wait: float = admission_max_wait,
+    ):
+        self.max_active = max_active
+        self.max_active_per_user = max_active_per_user
+        self.max_queued = max_queued
+        self.max_queued_per_user = max_queued_per_user
+        self.max_wait = max_wait
+        self.active: Dict[str, int] = {}
+        self.running = 0
+        self.waiters: Dict[str, Deque[Waiter]] = {}
+        self.turns: Deque[str] = deque()
+        self.queued = 0
+        self.started: Dict[str, Deque[float]] = {}
+        self.hold = 0.0
+        self.admitted = 0
+        self.waited = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.timings = StageStats()
+
+    def can_start(self, uid: str) -> bool:
+        return (
+            self.running < self.max_active
+            and self.active.get(uid, 0) < self.max_active_per_user
+        )
+
+    def start(self, uid: str):
+        self.running += 1
+        self.active[uid] = self.active.get(uid, 0) + 1
+        self.started.setdefault(uid, deque()).append(time.perf_counter())
+        self.admitted += 1
+
+    def retry_after(self) -> int:
+        wait = self.hold * (self.queued + 1) / max(self.max_active, 1)
+        return max(admission_retry_after, math.ceil(wait))
+
+    async def acquire(
+        self, uid: str, on_position: Optional[Callable[[int], None]] = None
+    ):
+        if uid not in self.waiters and self.can_start(uid):
+            self.start(uid)
+            return
+        if (
+            self.queued >= self.max_queued
+            or len(self.waiters.get(uid, ())) >= self.max_queued_per_user
+        ):
+            self.rejected += 1
+            raise Overloaded(self.retry_after())
+        waiter = Waiter(on_position)
+        if uid not in self.waiters:
+            self.waiters[uid] = deque()
+            self.turns.append(uid)
+        self.waiters[uid].append(waiter)
+        self.queued += 1
+        self.waited += 1
+        self.notify()
+        timings = Timings()
+        try:
+            with timings.stage("wait"):
+                await asyncio.wait_for(asyncio.shield(waiter.future), self.max_wait)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            self.remove(uid, waiter)
+            raise Overloaded(self.retry_after())
+        except asyncio.CancelledError:
+            self.remove(uid, waiter)
+            raise
+        finally:
+            self.timings.record(timings.stages)
+
+    @asynccontextmanager
+    async def slot(self, uid: str, on_position: Optional[Callable[[int], None]] = None):
+        await self.acquire(uid, on_position)
+        try:
+            yield
+        finally:
+            self.release(uid)
+
+    def remove(self, uid: str, waiter: Waiter):
+        if waiter.future.done():
+            self.release(uid)
+            return
+        waiter.future.cancel()
+        self.waiters[uid].remove(waiter)
+        self.queued -= 1
+        if not self.waiters[uid]:
+            del self.waiters[uid]
+            self.turns.remove(uid)
+        self.notify()
+
+    def release(self, uid: str):
+        self.running -= 1
+        self.active[uid] -= 1
+        started = self.started[uid].popleft()
+        self.hold = 0.8 * self.hold + 0.2 * (time.perf_counter() - started)
+        if not self.active[uid]:
+            del self.active[uid]
+            del self.started[uid]
+        self.dispatch()
+
+    def dispatch(self):
+        granted = True
+        while granted and self.turns and self.running < self.max_active:
+            granted = False
+            for _ in range(len(self.turns)):
+                uid = self.turns[0]
+                self.turns.rotate(-1)
+                if not self.can_start(uid):
+                    continue
+                waiter = self.waiters[uid].popleft()
+                self.queued -= 1
+                if not self.waiters[uid]:
+                    del self.waiters[uid]
+                    self.turns.remove(uid)
+                self.start(uid)
+                waiter.future.set_result(None)
+                granted = True
+                break
+        self.notify()
+
+    def notify(self):
+        queues = [self.waiters[uid] for uid in self.turns]
+        position = 0
+        for depth in range(max(map(len, queues), default=0)):
+            for queue in queues:
+                if depth >= len(queue):
+                    continue
+                position += 1
+                waiter = queue[depth]
+                if waiter.position != position and waiter.on_position:
+                    if not waiter.position or position <= 5 or position % 10 == 0:
+                        waiter.on_position(position)
+                waiter.position = position
+
+    def stats(self) -> Dict:
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "users": len(self.active),
+            "max_active": self.max_active,
+            "max_active_per_user": self.max_active_per_user,
+            "max_queued": self.max_queued,
+            "admitted": self.admitted,
+            "waited": self.waited,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "hold_s": round(self.hold, 3),
+            "retry_after": self.retry_after(),
+            "timings": self.timings.summary(),
+        }
+
+
+chat_admission = Admission(chat_max_active, chat_max_active_per_user, chat_max_queued)
@@ -0,0 +1,543 @@
+import asyncio
+import os
+import time
+import uuid
+from typing import TYPE_CHECKING, Dict, List, Optional, Set
+from utils.config import load_config
+from fastapi import WebSocket
+from models.admission import Admission, Overloaded, busy_message, queued_message
+from models.chat_writer import ChatWriter
+from models.conversation import Conversation
+from models.events import event_broker
+from models.screenshots import store_screenshot
+from models.session_pool import session_pool
+from utils.clients import get_multion
+from utils.frames import send_message
+from utils.supabase import SupabaseClient
+from utils.log import debug, error, info, warning
+from utils.timing import StageStats, Timings, span
+
+if TYPE_CHECKING:
+    from multion import SessionStepSuccess, SessionsScreenshotResponse
+
+load_config()
+
+agent_max_workers = int(os.getenv("AGENT_MAX_WORKERS", "32"))
+agent_max_workers_per_user = int(os.getenv("AGENT_MAX_WORKERS_PER_USER", "2"))
+agent_max_queued = int(os.getenv("AGENT_MAX_QUEUED", "64"))
+agent_max_pending_frames = int(os.getenv("AGENT_MAX_PENDING_FRAMES", "256"))
+agent_screenshot_every = int(os.getenv("AGENT_SCREENSHOT_EVERY", "1"))
+agent_overlap_screenshots = os.getenv("AGENT_OVERLAP_SCREENSHOTS", "1") == "1"
+agent_idle_timeout = float(os.getenv("AGENT_IDLE_TIMEOUT", "300"))
+agent_remote_timeout = float(os.getenv("AGENT_REMOTE_TIMEOUT", "0.5"))
+
+agent_admission = Admission(
+    agent_max_workers, agent_max_workers_per_user, agent_max_queued
+)
+agent_jobs: Dict[str, "AgentJob"] = {}
+remote_jobs: Dict[str, "RemoteJob"] = {}
+step_stats = StageStats()
+pumps: Set[asyncio.Task] = set()
+
+
+def system_message(content: str) -> Dict:
+    return {"type": "text", "role": "system", "content": content}
+
+
+def events_channel(chat_id: str) -> str:
+    return f"agent:{chat_id}:events"
+
+
+def commands_channel(chat_id: str) -> str:
+    return f"agent:{chat_id}:commands"
+
+
+def replay(messages: List[Dict], status: str, after: Optional[int]) -> List[Dict]:
+    frames = list(messages[after:]) if after is not None else []
+    if status == "awaiting_input":
+        frames.append(system_message("Awaiting input"))
+    else:
+        frames.append(system_message("Agent start"))
+    return frames
+
+
+class Subscriber:
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(agent_max_pending_frames)
+        self.task = asyncio.create_task(self.pump())
+        pumps.add(self.task)
+        self.task.add_done_callback(pumps.discard)
+
+    async def pump(self):
+        while True:
+            frame = await self.queue.get()
+            if frame is None:
+                return
+            await send_message(self.websocket, frame)
+
+    def send(self, frame: Dict) -> bool:
+        if self.task.done():
+            return False
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    def drain(self):
+        try:
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            self.task.cancel()
+
+    def cancel(self):
+        self.task.cancel()
+
+    async def close(self):
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+
+
+class AgentJob:
+    def __init__(
+        self,
+        supabase: SupabaseClient,
+        chat_id: str,
+        uid: str,
+        session_id: str,
+        messages: List[Dict],
+        writer: ChatWriter,
+    ):
+        self.supabase = supabase
+        self.chat_id = chat_id
+        self.uid = uid
+        self.session_id = session_id
+        self.messages = messages
+        self.writer = writer
+        self.subscribers: Dict[WebSocket, Subscriber] = {}
+        self.status = "queued"
+        self.paused = False
+        self.pending: Optional[Dict] = None
+        self.task: Optional[asyncio.Task] = None
+        self.steps = 0
+        self.expiry: Optional[asyncio.TimerHandle] = None
+        self.listener: Optional[asyncio.Task] = None
+
+    def attach(
+        self,
+        websocket: WebSocket,
+        supabase: SupabaseClient,
+        after: Optional[int] = None,
+    ):
+        self.supabase = supabase
+        self.writer.supabase = supabase
+        if self.expiry:
+            self.expiry.cancel()
+            self.expiry = None
+        subscriber = Subscriber(websocket)
+        self.subscribers[websocket] = subscriber
+        for frame in replay(self.messages, self.status, after):
+            subscriber.send(frame)
+        if self.status == "done":
+            subscriber.drain()
+
+    def drop(self, websocket: WebSocket) -> Optional[Subscriber]:
+        subscriber = self.subscribers.pop(websocket, None)
+        if subscriber:
+            subscriber.cancel()
+        self.expire_later()
+        return subscriber
+
+    async def detach(self, websocket: WebSocket):
+        subscriber = self.drop(websocket)
+        if subscriber:
+            await subscriber.close()
+
+    def expire_later(self):
+        if self.subscribers or self.status != "awaiting_input" or self.expiry:
+            return
+        self.expiry = asyncio.get_running_loop().call_later(
+            agent_idle_timeout, lambda: asyncio.create_task(self.expire())
+        )
+
+    async def expire(self):
+        self.expiry = None
+        if self.subscribers or self.status != "awaiting_input":
+            return
+        info(f"Agent {self.session_id} idle without clients, closing session")
+        await self.finish()
+
+    def publish(self, to: Optional[str] = None, **event):
+        event_broker.publish(
+            events_channel(self.chat_id), {"status": self.status, "to": to, **event}
+        )
+
+    def emit(self, frame: Dict):
+        for websocket, subscriber in list(self.subscribers.items()):
+            if not subscriber.send(frame):
+                warning(f"Detaching slow or closed client from agent {self.session_id}")
+                self.drop(websocket)
+        self.publish(frame=frame)
+
+    def append(self, message: Dict):
+        self.messages.append(message)
+        self.publish(message=message, seq=len(self.messages) - 1)
+
+    async def listen(self):
+        subscription = await event_broker.subscribe(commands_channel(self.chat_id))
+        try:
+            while True:
+                command = await subscription.get()
+                if command["type"] == "probe":
+                    for seq in range(command["after"], len(self.messages)):
+                        self.publish(command["id"], message=self.messages[seq], seq=seq)
+                    self.publish(command["id"])
+                    if self.expiry:
+                        self.expiry.cancel()
+                        self.expiry = None
+                        self.expire_later()
+                elif command["type"] == "pause":
+                    self.pause()
+                elif command["type"] == "input":
+                    self.send_input(command["message"])
+        finally:
+            await subscription.close()
+
+    def queued(self, position: int):
+        self.emit(queued_message(position))
+
+    def start(self, prompt: str, response: Optional["SessionStepSuccess"] = None):
+        self.status = "queued"
+        self.task = asyncio.create_task(self.run(prompt, response))
+
+    def pause(self):
+        if self.status in ("queued", "running"):
+            info(f"Agent {self.session_id} paused")
+            self.paused = True
+
+    def send_input(self, message: Dict):
+        if self.status == "awaiting_input":
+            self.append(message)
+            self.paused = False
+            debug(f"Agent {self.session_id} input", message["content"])
+            self.start(message["content"])
+        else:
+            self.pending = message
+            self.pause()
+
+    def wants_screenshot(self, response: "SessionStepSuccess", status: str) -> bool:
+        if response.status != "CONTINUE" or response.status != status or self.paused:
+            return True
+        return bool(agent_screenshot_every) and self.steps % agent_screenshot_every == 0
+
+    async def fetch_screenshot(self) -> "SessionsScreenshotResponse":
+        timings = Timings()
+        with timings.stage("screenshot"), span("multion.screenshot"):
+            screenshot = await get_multion().sessions.screenshot(
+                session_id=self.session_id
+            )
+        step_stats.record(timings.stages)
+        return screenshot
+
+    async def handle_step(
+        self,
+        response: "SessionStepSuccess",
+        screenshot: Optional[asyncio.Task],
+        previous: Optional[asyncio.Task],
+    ):
+        if previous:
+            await asyncio.wait([previous])
+        timings = Timings()
+        debug(f"Agent {self.session_id} {response.status}", response.message.strip())
+        chat_message = {
+            "type": "text",
+            "role": "assistant",
+            "content": response.message.strip(),
+        }
+        self.append(chat_message)
+        self.emit(chat_message)
+        self.writer.schedule()
+        if screenshot:
+            try:
+                screenshot = (await screenshot).screenshot
+            except Exception as e:
+                warning(f"Agent {self.session_id} screenshot failed: {e}")
+                screenshot = None
+            timings.mark("screenshot_wait")
+        stored = None
+        if screenshot and screenshot != "Unable to take screenshot for the session":
+            debug(f"Agent {self.session_id} screenshot", screenshot)
+            try:
+                stored = await store_screenshot(self.supabase, self.uid, screenshot)
+            except Exception as e:
+                warning(f"Agent {self.session_id} screenshot upload failed: {e}")
+        if stored:
+            screenshot_message = {
+                "type": "file",
+                "role": "assistant",
+                "content": stored["url"],
+            }
+            self.append(screenshot_message)
+            if stored["thumbnail"]:
+                self.emit(
+                    {
+                        **screenshot_message,
+                        "content": stored["thumbnail"],
+                        "content_type": "image/jpeg",
+                        "url": stored["url"],
+                    }
+                )
+            else:
+                self.emit(screenshot_message)
+            self.writer.schedule()
+        timings.mark("emit")
+        step_stats.record(timings.stages)
+
+    async def run(self, prompt: str, response: Optional["SessionStepSuccess"]):
+        try:
+            async with agent_admission.slot(self.uid, self.queued):
+                self.status = "running"
+                multion = get_multion()
+                status = None
+                emitting = None
+                stepped = None
+                failed = False
+                try:
+                    while True:
+                        if response is None:
+                            timings = Timings()
+                            if stepped:
+                                timings.mark("gap", stepped)
+                            with timings.stage("step"), span("multion.step"):
+                                response = await multion.sessions.step(
+                                    session_id=self.session_id, cmd=prompt
+                                )
+                            step_stats.record(timings.stages)
+                        stepped = time.perf_counter()
+                        self.steps += 1
+                        screenshot = None
+                        if self.wants_screenshot(response, status):
+                            screenshot = asyncio.create_task(self.fetch_screenshot())
+                        emitting = asyncio.create_task(
+                            self.handle_step(response, screenshot, emitting)
+                        )
+                        if not agent_overlap_screenshots:
+                            await emitting
+                        if response.status == "DONE":
+                            try:
+                                await emitting
+                            finally:
+                                await self.finish()
+                            return
+                        if response.status == "NOT SURE" or self.paused:
+                            break
+                        status = response.status
+                        response = None
+                except Exception as e:
+                    error(f"Agent {self.session_id} failed: {e}")
+                    failed = True
+                if emitting:
+                    await asyncio.gather(emitting, return_exceptions=True)
+                if failed:
+                    self.emit(system_message("Agent error"))
+        except Overloaded as e:
+            self.emit(busy_message(e.retry_after))
+        self.status = "awaiting_input"
+        await self.writer.flush()
+        if self.pending:
+            message, self.pending = self.pending, None
+            self.send_input(message)
+            return
+        self.emit(system_message("Awaiting input"))
+        self.expire_later()
+
+    async def finish(self):
+        self.status = "done"
+        self.emit(system_message("Agent done"))
+        agent_jobs.pop(self.session_id, None)
+        if self.listener:
+            self.listener.cancel()
+        session_pool.release(self.session_id)
+        self.writer.update(session_id=None)
+        await self.writer.flush()
+        for subscriber in self.subscribers.values():
+            subscriber.drain()
+        if not self.subscribers:
+            await self.writer.close()
+
+
+class RemoteJob:
+    def __init__(
+        self,
+        supabase: SupabaseClient,
+        chat_id: str,
+        session_id: str,
+        messages: Conversation,
+        writer: ChatWriter,
+    ):
+        self.id = uuid.uuid4().hex
+        self.supabase = supabase
+        self.chat_id = chat_id
+        self.session_id = session_id
+        self.messages = messages
+        self.writer = writer
+        self.subscribers: Dict[WebSocket, Subscriber] = {}
+        self.status = "queued"
+        self.owner = asyncio.Event()
+        self.subscription = None
+        self.task: Optional[asyncio.Task] = None
+
+    async def connect(self) -> bool:
+        self.subscription = await event_broker.subscribe(events_channel(self.chat_id))
+        self.task = asyncio.create_task(self.pump())
+        self.command(type="probe", id=self.id, after=len(self.messages))
+        try:
+            await asyncio.wait_for(self.owner.wait(), agent_remote_timeout)
+        except asyncio.TimeoutError:
+            self.task.cancel()
+            await self.subscription.close()
+            return False
+        remote_jobs[self.chat_id] = self
+        return True
+
+    def command(self, **command):
+        event_broker.publish(commands_channel(self.chat_id), command)
+
+    async def pump(self):
+        try:
+            while self.status != "done":
+                event = await self.subscription.get()
+                if event["to"] not in (None, self.id):
+                    continue
+                self.status = event["status"]
+                if "message" in event and event["seq"] == len(self.messages):
+                    self.messages.append(event["message"])
+                    self.writer.persisted = len(self.messages)
+                if "frame" in event:
+                    self.emit(event["frame"])
+                elif "message" not in event:
+                    self.owner.set()
+        except Exception as e:
+            error(f"Agent stream of chat {self.chat_id} failed: {e}")
+            for websocket in self.subscribers:
+                asyncio.create_task(
+                    websocket.close(code=1011, reason="Agent stream lost")
+                )
+        finally:
+            if remote_jobs.get(self.chat_id) is self:
+                del remote_jobs[self.chat_id]
+            for subscriber in self.subscribers.values():
+                subscriber.drain()
+            await self.subscription.close()
+
+    def emit(self, frame: Dict):
+        for websocket, subscriber in list(self.subscribers.items()):
+            if not subscriber.send(frame):
+                warning(f"Detaching slow or closed client from chat {self.chat_id}")
+                self.drop(websocket)
+
+    def attach(
+        self,
+        websocket: WebSocket,
+        supabase: SupabaseClient,
+        after: Optional[int] = None,
+    ):
+        self.supabase = supabase
+        self.writer.supabase = supabase
+        subscriber = Subscriber(websocket)
+        self.subscribers[websocket] = subscriber
+        for frame in replay(self.messages, self.status, after):
+            subscriber.send(frame)
+
+    def drop(self, websocket: WebSocket) -> Optional[Subscriber]:
+        subscriber = self.subscribers.pop(websocket, None)
+        if subscriber:
+            subscriber.cancel()
+        if not self.subscribers and self.task:
+            self.task.cancel()
+            asyncio.create_task(self.writer.close())
+        return subscriber
+
+    async def detach(self, websocket: WebSocket):
+        subscriber = self.drop(websocket)
+        if subscriber:
+            await subscriber.close()
+
+    def pause(self):
+        self.command(type="pause")
+
+    def send_input(self, message: Dict):
+        self.command(type="input", message=message)
+
+
+async def find_remote_job(
+    supabase: SupabaseClient,
+    chat_id: str,
+    session_id: str,
+    messages: Conversation,
+    writer: ChatWriter,
+) -> Optional[RemoteJob]:
+    if event_broker.local:
+        return None
+    job = RemoteJob(supabase, chat_id, session_id, messages, writer)
+    if await job.connect():
+        return job
+    return None
+
+
+def get_job(chat_id: str) -> Optional[AgentJob | RemoteJob]:
+    for job in agent_jobs.values():
+        if job.chat_id == chat_id:
+            return job
+    return remote_jobs.get(chat_id)
+
+
+def start_job(
+    websocket: WebSocket,
+    supabase: SupabaseClient,
+    chat_id: str,
+    uid: str,
+    session_id: str,
+    messages: List[Dict],
+    writer: ChatWriter,
+    prompt: str,
+    response: Optional["SessionStepSuccess"] = None,
+) -> AgentJob:
+    job = AgentJob(supabase, chat_id, uid, session_id, messages, writer)
+    agent_jobs[session_id] = job
+    job.subscribers[websocket] = Subscriber(websocket)
+    job.listener = asyncio.create_task(job.listen())
+    job.start(prompt, response)
+    return job
+
+
+def agent_stats() -> Dict:
+    statuses = [job.status for job in agent_jobs.values()]
+    return {
+        "jobs": len(statuses),
+        "running": statuses.count("running"),
+        "queued": statuses.count("queued"),
+        "awaiting_input": statuses.count("awaiting_input"),
+        "remote": len(remote_jobs),
+        "max_workers": agent_max_workers,
+        "steps": step_stats.summary(),
+    }
+
+
+async def close_jobs():
+    for job in list(agent_jobs.values()):
+        if job.task:
+            job.task.cancel()
+        if job.listener:
+            job.listener.cancel()
+        await job.writer.close()
+    agent_jobs.clear()
+    for job in list(remote_jobs.values()):
+        if job.task:
+            job.task.cancel()
+    remote_jobs.clear()
+    pending = list(pumps)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
@@ -1,17 +1,35 @@
-import base64
-import os
-import tempfile
-from multion import SessionStepSuccess, SessionsScreenshotResponse
-import replicate
 import asyncio
+import base64
+import hashlib
+import json
+import uuid
+from datetime import datetime
 from fastapi import WebSocket
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, List, Dict, Optional, Set, Tuple
 from pydantic import BaseModel
-from supabase import Client
-from datetime import datetime, timezone
+from utils.supabase import SupabaseClient
 from auth.auth_bearer import decode_token
+from models.admission import Overloaded, busy_message, chat_admission, queued_message
+from models.agent import get_job, start_job
 from models.llm import LLM
-from multion.client import MultiOn
+from models.chat_cache import chat_cache
+from models.chat_writer import ChatWriter
+from models.context import ContextWindow
+from models.conversation import Conversation
+from models.messages import chat_columns, chat_from_row
+from models.session_pool import session_pool
+from models.vlm import stream_vlm
+from models.vlm_cache import vlm_cache
+from utils.executor import run_sync
+from utils.frames import inline_content, receive_message, send_message
+from utils.images import (
+    decode_data_url,
+    downscale_image,
+    image_extension,
+    sniff_content_type,
+)
+from utils.log import debug, error, warning
+from utils.timing import Timings
 
 image_prompt_generator_prompt = """
 You are a visual language AI model expert.
@@ -58,364 +76,470 @@ chat_prompt = """
 You are a helpful conversational AI assistant. If the user asks you to accomplish some task, ask them to upload an image first so you can take a look. Otherwise, talk to them normally.
 """
 
+image_prompt_generator_model = LLM(
+    model="llama3-70b-8192",
+    max_tokens=1024,
+    temperature=0.2,
+    system=image_prompt_generator_prompt,
+    cache=True,
+)
+
+agent_prompt_generator_model = LLM(
+    model="llama3-70b-8192",
+    max_tokens=1000,
+    temperature=0.2,
+    system=agent_prompt_generator_prompt,
+    cache=True,
+)
+
+chat_model = LLM(
+    model="llama3-70b-8192",
+    max_tokens=1024,
+    temperature=0.2,
+    system=chat_prompt,
+)
+
 
 class Chat(BaseModel):
     id: str
     owner: str
     model: str
-    messages: List[Dict]
+    messages: List[Dict] = []
     last_chatted: Optional[str]
     session_id: Optional[str]
+    context_summary: Optional[str] = None
+    context_summary_seq: int = 0
+
+
+class ChatSummary(BaseModel):
+    id: str
+    model: str
+    last_chatted: Optional[str]
+    preview: Optional[str]
+    message_count: int
+
+
+class ChatSummaryPage(BaseModel):
+    chats: List[ChatSummary]
+    next_cursor: Optional[str]
+
+
+def decode_image(content: str | bytes) -> Tuple[bytes, str, str]:
+    if isinstance(content, bytes):
+        image_data, content_type = content, sniff_content_type(content)
+    else:
+        image_data, content_type = decode_data_url(content)
+    return image_data, content_type, hashlib.sha256(image_data).hexdigest()
+
+
+def prepare_image(image_data: bytes, content_type: str) -> Tuple[bytes, str]:
+    return downscale_image(image_data, content_type)
+
+
+def upload_image(
+    supabase: SupabaseClient, image_data: bytes, content_type: str, image_path: str
+) -> str:
+    image_path += image_extension(content_type)
+    supabase.storage.from_("images").upload(
+        file=image_data,
+        path=image_path,
+        file_options={
+            "content-type": content_type,
+            "cache-control": "3600",
+            "upsert": "true",
+        },
+    )
+    return supabase.storage.from_("images").get_public_url(image_path)
+
+
+background_tasks: Set[asyncio.Task] = set()
+
+
+def background_done(task: asyncio.Task):
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        error(f"Background chat task failed: {task.exception()!r}")
+
+
+async def send_position(websocket: WebSocket, position: int):
+    try:
+        await send_message(websocket, queued_message(position))
+    except Exception as e:
+        warning(f"Failed to send queue position: {e}")
+
+
+def queue_notifier(websocket: WebSocket) -> Callable[[int], None]:
+    sending: Set[asyncio.Task] = set()
+
+    def notify(position: int):
+        task = asyncio.create_task(send_position(websocket, position))
+        sending.add(task)
+        task.add_done_callback(sending.discard)
+
+    return notify
 
 
 async def run_chat(
     websocket: WebSocket,
-    supabase: Client,
+    supabase: SupabaseClient,
     id: str,
     model: str,
-    messages: List[Dict],
+    messages: Conversation,
     session_id: Optional[str],
     uid: str,
+    writer: ChatWriter,
+    context: ContextWindow,
 ):
-
-    async def handle_response(
-        response: SessionStepSuccess,
-        get_screenshot: SessionsScreenshotResponse,
-        agent_prompt: str,
-        session_id: str,
-    ) -> Tuple[SessionStepSuccess, SessionsScreenshotResponse]:
-        print(response.message.strip())
-        print(response.status)
-        print(get_screenshot.screenshot)
-        chat_message = {
-            "type": "text",
-            "role": "assistant",
-            "content": response.message.strip(),
-        }
-        messages.append(chat_message)
-        await websocket.send_json(chat_message)
-        if get_screenshot.screenshot != "Unable to take screenshot for the session":
-            screenshot_message = {
-                "type": "file",
-                "role": "assistant",
-                "content": get_screenshot.screenshot,
-            }
-            messages.append(screenshot_message)
-            await websocket.send_json(screenshot_message)
-
-        date = datetime.now(timezone.utc)
-        supabase.table("chats").update(
-            {"messages": messages, "last_chatted": date.isoformat()}
-        ).eq("id", id).execute()
-
-        token_message = await websocket.receive_json()
+    if messages.blobs:
+        task = asyncio.create_task(messages.externalize_blobs(supabase, uid, writer))
+        background_tasks.add(task)
+        task.add_done_callback(background_done)
+    job = get_job(id)
+    notify = queue_notifier(websocket)
+    while True:
+        token_message = await receive_message(websocket)
         await decode_token(websocket, token_message["content"])
-        continue_message = await websocket.receive_json()
+        message = await receive_message(websocket)
 
-        if response.status == "DONE":
-            await websocket.send_json(
-                {
-                    "type": "text",
-                    "role": "system",
-                    "content": "Agent done",
-                }
-            )
-            supabase.table("chats").update({"session_id": None}).eq("id", id).execute()
-
-        if response.status == "NOT SURE":
-            await websocket.send_json(
-                {
-                    "type": "text",
-                    "role": "system",
-                    "content": "Awaiting input",
-                }
-            )
-            token_message = await websocket.receive_json()
-            await decode_token(websocket, token_message["content"])
-            new_user_message = await websocket.receive_json()
-            messages.append(new_user_message)
-            agent_prompt = new_user_message["content"]
-            print(agent_prompt)
-            await asyncio.sleep(0)
-            response = multion.sessions.step(
-                session_id=session_id,
-                cmd=agent_prompt,
-            )
-            get_screenshot = multion.sessions.screenshot(session_id=session_id)
+        if job and job.status == "done":
+            session_id = None
+            job = None
+        job = job or get_job(id)
 
-        if response.status == "CONTINUE":
-            if continue_message["content"] == "Agent pause":
-                print("Agent paused")
-                await websocket.send_json(
-                    {
-                        "type": "text",
-                        "role": "system",
-                        "content": "Awaiting input",
-                    }
-                )
-                token_message = await websocket.receive_json()
-                await decode_token(websocket, token_message["content"])
-                new_user_message = await websocket.receive_json()
-                messages.append(new_user_message)
-                agent_prompt = new_user_message["content"]
-                print(agent_prompt)
-            await asyncio.sleep(0)
-            response = multion.sessions.step(
-                session_id=session_id,
-                cmd=agent_prompt,
-            )
-            get_screenshot = multion.sessions.screenshot(session_id=session_id)
+        if message["type"] == "file" and (job or session_id):
+            message = inline_content(message)
 
-        return response, get_screenshot
+        if message["role"] == "system":
+            if job and message["content"] == "Agent pause":
+                job.pause()
+            continue
 
-    while True:
-        token_message = await websocket.receive_json()
-        await decode_token(websocket, token_message["content"])
-        message = await websocket.receive_json()
+        if job:
+            job.send_input(message)
+            continue
 
         if session_id:
-            print(message["content"])
+            debug("Agent input", message["content"])
             messages.append(message)
 
-            await websocket.send_json(
+            await send_message(
+                websocket,
                 {
                     "type": "text",
                     "role": "system",
                     "content": "Agent start",
-                }
+                },
             )
-            multion = MultiOn(api_key=os.getenv("MULTION_API_KEY"))
-            agent_prompt = message["content"]
-            response = multion.sessions.step(
-                session_id=session_id,
-                cmd=agent_prompt,
-            )
-            get_screenshot = multion.sessions.screenshot(session_id=session_id)
-
-            while response:
-                response, get_screenshot = await handle_response(
-                    response, get_screenshot, agent_prompt, session_id
-                )
-                if response.status == "DONE":
-                    session_id = None
-                    break
-
-        if message["type"] == "file":
-            messages.append(message)
-            user_message = await websocket.receive_json()
-            print(user_message["content"])
-            messages.append(user_message)
-            image_prompt_generator_model = LLM(
-                model="llama3-70b-8192",
-                max_tokens=1024,
-                temperature=0.2,
-                system=image_prompt_generator_prompt,
+            job = start_job(
+                websocket,
+                supabase,
+                id,
+                uid,
+                session_id,
+                messages,
+                writer,
+                message["content"],
             )
-            image_prompt = image_prompt_generator_model.run(
-                [
-                    {
-                        "role": "user",
-                        "content": f"User: {user_message['content']}\nPrompt:",
+            continue
+
+        try:
+            if message["type"] == "file":
+                user_message = await receive_message(websocket)
+                debug("Image command", user_message["content"])
+                timings = Timings()
+
+                async def store_image():
+                    image_data, content_type, digest = await run_sync(
+                        decode_image, message["content"]
+                    )
+                    image_url = await vlm_cache.get_image(uid, digest)
+                    if not image_url:
+                        image_data, content_type = await run_sync(
+                            prepare_image, image_data, content_type
+                        )
+                        # keyed by the original bytes so re-sent images land on one object
+                        image_url = await run_sync(
+                            upload_image,
+                            supabase,
+                            image_data,
+                            content_type,
+                            f"{uid}/images/{digest}",
+                        )
+                        await vlm_cache.set_image(uid, digest, image_url)
+                    return image_url, digest
+
+                async with chat_admission.slot(uid, notify):
+                    image_prompt, (image_url, digest) = await asyncio.gather(
+                        timings.measure(
+                            "image_prompt",
+                            image_prompt_generator_model.run(
+                                [
+                                    {
+                                        "role": "user",
+                                        "content": f"User: {user_message['content']}\nPrompt:",
+                                    }
+                                ]
+                            ),
+                        ),
+                        timings.measure("upload", store_image()),
+                    )
+                    debug("Image prompt", image_prompt)
+                    debug("Public image URL", image_url)
+                    message["content"] = image_url
+                    message.pop("content_type", None)
+                    messages.append(message)
+                    messages.append(user_message)
+
+                    image_output = await vlm_cache.get(digest, model, image_prompt)
+                    if image_output is None:
+                        image_chunks = []
+                        backend = model
+                        with timings.stage("vlm") as vlm_start:
+                            async for backend, token in stream_vlm(
+                                model, image_url, image_prompt
+                            ):
+                                if not image_chunks:
+                                    timings.mark("vlm_first_token", vlm_start)
+                                image_chunks.append(token)
+                                await send_message(
+                                    websocket,
+                                    {
+                                        "type": "text",
+                                        "role": "assistant",
+                                        "content": token,
+                                        "partial": True,
+                                    },
+                                )
+                        image_output = "".join(image_chunks)
+                        await vlm_cache.set(digest, backend, image_prompt, image_output)
+                    debug("Image output", image_output)
+                    image_message = {
+                        "type": "text",
+                        "role": "assistant",
+                        "content": image_output,
                     }
-                ]
-            )
-            print(f"Image prompt: {image_prompt}")
-
-            image_data = base64.b64decode(message["content"].split(",")[1])
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp:
-                tmp.write(image_data)
-                tmp.flush()
-                print(f"Temporary image path: {tmp.name}")
-                image_path = f"{uid}/{id}/{len(messages)}.jpg"
-            with open(tmp.name, "rb") as f:
-                supabase.storage.from_("images").upload(
-                    file=f,
-                    path=image_path,
-                    file_options={
-                        "content-type": "image/jpg",
-                        "cache-control": "3600",
-                        "upsert": "true",
-                    },
-                )
-            os.remove(tmp.name)
-            image_url = supabase.storage.from_("images").get_public_url(image_path)
-            print(f"Public image URL: {image_url}")
-            if model == "llava-13b":
-                stream_output = replicate.run(
-                    "yorickvp/llava-13b:b5f6212d032508382d61ff00469ddda3e32fd8a0e75dc39d8a4191bb742157fb",
-                    input={
-                        "image": image_url,
-                        "prompt": image_prompt,
-                        "top_p": 1,
-                        "max_tokens": 1024,
-                        "temperature": 0.2,
-                    },
-                )
-                image_output = ""
-                for token in stream_output:
-                    image_output += token
-            if model == "llava-v1.6-34b":
-                stream_output = replicate.run(
-                    "yorickvp/llava-v1.6-34b:41ecfbfb261e6c1adf3ad896c9066ca98346996d7c4045c5bc944a79d430f174",
-                    input={
-                        "image": image_url,
-                        "prompt": image_prompt,
-                        "top_p": 1,
-                        "max_tokens": 1024,
-                        "temperature": 0.2,
-                    },
-                )
-                image_output = ""
-                for token in stream_output:
-                    image_output += token
-            if model == "qwen-vl-chat":
-                image_output = replicate.run(
-                    "lucataco/qwen-vl-chat:50881b153b4d5f72b3db697e2bbad23bb1277ab741c5b52d80cd6ee17ea660e9",
-                    input={
-                        "image": image_url,
-                        "prompt": image_prompt,
-                    },
-                )
-            print(f"Image output: {image_output}")
-
-            agent_prompt_generator_model = LLM(
-                model="llama3-70b-8192",
-                max_tokens=1000,
-                temperature=0.2,
-                system=agent_prompt_generator_prompt,
-            )
-            agent_prompt = agent_prompt_generator_model.run(
-                [
-                    {
-                        "role": "user",
-                        "content": f"User: {user_message['content']}\nImage: {image_output}\nPrompt:",
+                    messages.append(image_message)
+                    await send_message(websocket, image_message)
+
+                    with timings.stage("agent_prompt"):
+                        agent_prompt = await agent_prompt_generator_model.run(
+                            [
+                                {
+                                    "role": "user",
+                                    "content": f"User: {user_message['content']}\nImage: {image_output}\nPrompt:",
+                                }
+                            ]
+                        )
+                    debug("Agent prompt", agent_prompt)
+                if agent_prompt.startswith("[BAD IMAGE OUTPUT] "):
+                    clarification_message = {
+                        "type": "text",
+                        "role": "assistant",
+                        "content": agent_prompt.lstrip("[BAD IMAGE OUTPUT] "),
                     }
-                ]
-            )
-            print(f"Agent prompt: {agent_prompt}")
-            if agent_prompt.startswith("[BAD IMAGE OUTPUT] "):
-                clarification_message = {
+                    messages.append(clarification_message)
+                    await send_message(websocket, clarification_message)
+                    with timings.stage("clarification"):
+                        token_message = await receive_message(websocket)
+                        await decode_token(websocket, token_message["content"])
+                        user_clarification_message = await receive_message(websocket)
+                    messages.append(user_clarification_message)
+                    agent_prompt = user_clarification_message["content"]
+                agent_message = {
                     "type": "text",
                     "role": "assistant",
-                    "content": agent_prompt.lstrip("[BAD IMAGE OUTPUT] "),
+                    "content": f"Creating agent: {agent_prompt}",
                 }
-                messages.append(clarification_message)
-                await websocket.send_json(clarification_message)
-                token_message = await websocket.receive_json()
-                await decode_token(websocket, token_message["content"])
-                user_clarification_message = await websocket.receive_json()
-                messages.append(user_clarification_message)
-                agent_prompt = user_clarification_message["content"]
-            agent_message = {
-                "type": "text",
-                "role": "assistant",
-                "content": f"Creating agent: {agent_prompt}",
-            }
-            messages.append(agent_message)
-            await websocket.send_json(agent_message)
+                messages.append(agent_message)
+                await send_message(websocket, agent_message)
 
-            await websocket.send_json(
-                {
-                    "type": "text",
-                    "role": "system",
-                    "content": "Agent start",
-                }
-            )
-            multion = MultiOn(api_key=os.getenv("MULTION_API_KEY"))
-            response = multion.sessions.create(url="https://google.com", local=False)
-            session_id = response.session_id
-            get_screenshot = multion.sessions.screenshot(session_id=session_id)
-            supabase.table("chats").update({"session_id": session_id}).eq(
-                "id", id
-            ).execute()
-
-            while response:
-                response, get_screenshot = await handle_response(
-                    response, get_screenshot, agent_prompt, session_id
+                await send_message(
+                    websocket,
+                    {
+                        "type": "text",
+                        "role": "system",
+                        "content": "Agent start",
+                    },
+                )
+                with timings.stage("session_create"):
+                    response = await session_pool.acquire(notify)
+                session_id = response.session_id
+                timings.mark("total")
+                debug("Image pipeline timings", timings.stages)
+                try:
+                    await send_message(
+                        websocket,
+                        {
+                            "type": "timings",
+                            "role": "system",
+                            "content": timings.stages,
+                        },
+                    )
+                except BaseException:
+                    session_pool.release(session_id)
+                    raise
+                writer.update(session_id=session_id)
+                job = start_job(
+                    websocket,
+                    supabase,
+                    id,
+                    uid,
+                    session_id,
+                    messages,
+                    writer,
+                    agent_prompt,
+                    response,
                 )
-                if response.status == "DONE":
-                    session_id = None
-                    break
-
-        if message["type"] == "text":
-            print(message["content"])
-            message["content"] = f"""User: {message["content"]}\nAssistant: """
-            messages.append(message)
 
-            chat_model = LLM(
-                model="llama3-70b-8192",
-                max_tokens=1024,
-                temperature=0.2,
-                system=chat_prompt,
-            )
-            filtered_messages = [m for m in messages if m["type"] == "text"]
-            chat_output = chat_model.run(
-                [
-                    {k: message[k] for k in ("role", "content")}
-                    for message in filtered_messages
-                ]
-            )
-            print(chat_output)
-            chat_message = {"type": "text", "role": "assistant", "content": chat_output}
-            messages.append(chat_message)
-            await websocket.send_json(chat_message)
+            if message["type"] == "text":
+                async with chat_admission.slot(uid, notify):
+                    debug("Chat message", message["content"])
+                    message["content"] = f"""User: {message["content"]}\nAssistant: """
+                    messages.append(message)
+
+                    chat_chunks = []
+                    async for delta in chat_model.stream(context.build(messages)):
+                        chat_chunks.append(delta)
+                        await send_message(
+                            websocket,
+                            {
+                                "type": "text",
+                                "role": "assistant",
+                                "content": delta,
+                                "partial": True,
+                            },
+                        )
+                    chat_output = "".join(chat_chunks)
+                    debug("Chat output", chat_output)
+                    chat_message = {
+                        "type": "text",
+                        "role": "assistant",
+                        "content": chat_output,
+                    }
+                    messages.append(chat_message)
+                    await send_message(websocket, chat_message)
 
-            date = datetime.now(timezone.utc)
-            supabase.table("chats").update(
-                {"messages": messages, "last_chatted": date.isoformat()}
-            ).eq("id", id).execute()
+                writer.schedule()
+                context.compact_later(messages, writer)
+        except Overloaded as e:
+            await send_message(websocket, busy_message(e.retry_after))
 
 
-def create_chat(supabase: Client, model: str, uid: str) -> Chat | None:
-    response = (
+async def create_chat(supabase: SupabaseClient, model: str, uid: str) -> Chat | None:
+    response = await run_sync(
         supabase.table("chats")
         .insert(
             {
                 "owner": uid,
                 "model": model,
-                "messages": [],
             }
         )
-        .execute()
+        .execute
     )
     if response.data:
         chat = Chat(**response.data[0])
+        await chat_cache.set(chat.model_dump())
         return chat
     else:
         return None
 
 
-def delete_chat(
-    supabase: Client,
+async def delete_chat(
+    supabase: SupabaseClient,
     id: str,
 ) -> bool | None:
-    response = supabase.table("chats").delete().eq("id", id).execute()
+    response = await run_sync(supabase.table("chats").delete().eq("id", id).execute)
     if response.data:
+        await chat_cache.delete(id)
         return True
     else:
         return None
 
 
-def get_chats_by_model(
-    supabase: Client, uid: str, model: str
+async def get_chats_by_model(
+    supabase: SupabaseClient, uid: str, model: str
 ) -> List[Chat] | List[None]:
-    response = (
+    response = await run_sync(
         supabase.table("chats")
-        .select("*")
+        .select(chat_columns)
         .eq("owner", uid)
         .eq("model", model)
         .order("last_chatted", desc=True)
-        .execute()
+        .order("seq", foreign_table="chat_messages")
+        .execute
     )
     if response.data:
-        return [Chat(**chat) for chat in response.data]
+        return [Chat(**chat_from_row(chat)) for chat in response.data]
     else:
         return []
 
 
-def get_chat(supabase: Client, id: str) -> Chat | None:
-    response = supabase.table("chats").select("*").eq("id", id).execute()
+def encode_cursor(chat: ChatSummary) -> str:
+    cursor = json.dumps([chat.last_chatted, chat.id]).encode()
+    return base64.urlsafe_b64encode(cursor).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[str], str]:
+    try:
+        last_chatted, id = json.loads(base64.urlsafe_b64decode(cursor))
+        if last_chatted is not None:
+            datetime.fromisoformat(last_chatted)
+        return last_chatted, str(uuid.UUID(id))
+    except (AttributeError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+def order_by(query, *columns: str):
+    # PostgREST reads a single order param, so every key goes in one value
+    query.params = query.params.set("order", ",".join(columns))
+    return query
+
+
+async def get_chat_summaries(
+    supabase: SupabaseClient,
+    uid: str,
+    model: str,
+    limit: int,
+    after: Optional[Tuple[Optional[str], str]] = None,
+) -> ChatSummaryPage:
+    query = (
+        supabase.table("chats")
+        .select("id, model, last_chatted, preview, message_count")
+        .eq("owner", uid)
+        .eq("model", model)
+    )
+    if after:
+        last_chatted, last_id = after
+        if last_chatted:
+            query = query.or_(
+                f'last_chatted.lt."{last_chatted}",'
+                f'and(last_chatted.eq."{last_chatted}",id.lt.{last_id})'
+            )
+        else:
+            query = query.or_(
+                f"and(last_chatted.is.null,id.lt.{last_id}),last_chatted.not.is.null"
+            )
+    query = order_by(query, "last_chatted.desc.nullsfirst", "id.desc")
+    response = await run_sync(query.limit(limit + 1).execute)
+    chats = [ChatSummary(**chat) for chat in response.data]
+    next_cursor = encode_cursor(chats[limit - 1]) if len(chats) > limit else None
+    return ChatSummaryPage(chats=chats[:limit], next_cursor=next_cursor)
+
+
+async def get_chat(supabase: SupabaseClient, id: str) -> Chat | None:
+    cached = await chat_cache.get(id)
+    if cached:
+        return Chat(**cached)
+    response = await run_sync(
+        supabase.table("chats")
+        .select(chat_columns)
+        .eq("id", id)
+        .order("seq", foreign_table="chat_messages")
+        .execute
+    )
     if response.data:
-        return Chat(**response.data[0])
+        chat = Chat(**chat_from_row(response.data[0]))
+        await chat_cache.set(chat.model_dump())
+        return chat
     else:
         return None
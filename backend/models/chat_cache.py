@@ -0,0 +1,254 @@
+import json
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from utils.config import load_config
+from utils.log import warning
+
+load_config()
+
+chat_cache_backend = os.getenv("CHAT_CACHE_BACKEND", "memory")
+chat_cache_max_bytes = int(os.getenv("CHAT_CACHE_MAX_BYTES", str(32 << 20)))
+chat_cache_ttl = int(os.getenv("CHAT_CACHE_TTL", "3600"))
+redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+chat_cache_watch_retries = 3
+
+
+class MemoryBackend:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict[str, Tuple[str, List[str]]] = OrderedDict()
+        self.sizes: Dict[str, int] = {}
+        self.size = 0
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[Tuple[str, List[str]]]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        self.entries.move_to_end(key)
+        return entry[0], list(entry[1])
+
+    async def set(self, key: str, chat: str, messages: List[str]):
+        await self.delete(key)
+        self.entries[key] = (chat, messages)
+        self.resize(key, len(chat) + sum(map(len, messages)))
+
+    async def append(
+        self, key: str, start: int, messages: List[str], updates: Dict
+    ) -> bool:
+        entry = self.entries.get(key)
+        if entry is None:
+            return True
+        chat, cached = entry
+        if len(cached) != start:
+            return False
+        size = self.sizes[key] + sum(map(len, messages))
+        if updates:
+            updated = json.dumps({**json.loads(chat), **updates})
+            size += len(updated) - len(chat)
+            self.entries[key] = (updated, cached)
+        cached.extend(messages)
+        self.entries.move_to_end(key)
+        self.resize(key, size)
+        return True
+
+    async def replace(self, key: str, messages: Dict[int, str]) -> bool:
+        entry = self.entries.get(key)
+        if entry is None:
+            return True
+        cached = entry[1]
+        if any(seq >= len(cached) for seq in messages):
+            return False
+        size = self.sizes[key]
+        for seq, message in messages.items():
+            size += len(message) - len(cached[seq])
+            cached[seq] = message
+        self.resize(key, size)
+        return True
+
+    def resize(self, key: str, size: int):
+        self.size += size - self.sizes.get(key, 0)
+        self.sizes[key] = size
+        if size > self.max_bytes:
+            self.evict(key)
+        while self.size > self.max_bytes:
+            self.evict(next(iter(self.entries)))
+
+    def evict(self, key: str):
+        del self.entries[key]
+        self.size -= self.sizes.pop(key)
+        self.evictions += 1
+
+    async def delete(self, key: str):
+        if self.entries.pop(key, None) is not None:
+            self.size -= self.sizes.pop(key)
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+
+class RedisBackend:
+    def __init__(self, url: str, ttl: int):
+        from redis import asyncio as redis
+
+        self.redis = redis.from_url(url)
+        self.ttl = ttl
+
+    async def get(self, key: str) -> Optional[Tuple[str, List[str]]]:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.get(f"chat:{key}")
+            pipe.lrange(f"chat:{key}:messages", 0, -1)
+            chat, messages = await pipe.execute()
+        if chat is None:
+            return None
+        return chat.decode(), [message.decode() for message in messages]
+
+    async def set(self, key: str, chat: str, messages: List[str]):
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(f"chat:{key}:messages")
+            if messages:
+                pipe.rpush(f"chat:{key}:messages", *messages)
+                pipe.expire(f"chat:{key}:messages", self.ttl)
+            pipe.set(f"chat:{key}", chat, ex=self.ttl)
+            await pipe.execute()
+
+    async def append(
+        self, key: str, start: int, messages: List[str], updates: Dict
+    ) -> bool:
+        from redis.exceptions import WatchError
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for _ in range(chat_cache_watch_retries):
+                try:
+                    await pipe.watch(f"chat:{key}", f"chat:{key}:messages")
+                    chat = await pipe.get(f"chat:{key}")
+                    if chat is None:
+                        return True
+                    if await pipe.llen(f"chat:{key}:messages") != start:
+                        return False
+                    pipe.multi()
+                    if updates:
+                        chat = json.dumps({**json.loads(chat), **updates})
+                        pipe.set(f"chat:{key}", chat)
+                    pipe.expire(f"chat:{key}", self.ttl)
+                    if messages:
+                        pipe.rpush(f"chat:{key}:messages", *messages)
+                    pipe.expire(f"chat:{key}:messages", self.ttl)
+                    await pipe.execute()
+                    return True
+                except WatchError:
+                    continue
+        return False
+
+    async def replace(self, key: str, messages: Dict[int, str]) -> bool:
+        from redis.exceptions import WatchError
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for _ in range(chat_cache_watch_retries):
+                try:
+                    await pipe.watch(f"chat:{key}:messages")
+                    length = await pipe.llen(f"chat:{key}:messages")
+                    if any(seq >= length for seq in messages):
+                        return False
+                    pipe.multi()
+                    for seq, message in messages.items():
+                        pipe.lset(f"chat:{key}:messages", seq, message)
+                    await pipe.execute()
+                    return True
+                except WatchError:
+                    continue
+        return False
+
+    async def delete(self, key: str):
+        await self.redis.delete(f"chat:{key}", f"chat:{key}:messages")
+
+    def stats(self) -> Dict:
+        return {"ttl": self.ttl}
+
+
+class ChatCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def get(self, id: str) -> Optional[Dict]:
+        try:
+            value = await self.backend.get(id)
+        except Exception as e:
+            warning(f"Chat cache get failed: {e}")
+            self.errors += 1
+            value = None
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        chat, messages = value
+        return {**json.loads(chat), "messages": list(map(json.loads, messages))}
+
+    async def set(self, chat: Dict):
+        messages = [json.dumps(message) for message in chat["messages"]]
+        chat = {key: value for key, value in chat.items() if key != "messages"}
+        try:
+            await self.backend.set(chat["id"], json.dumps(chat), messages)
+        except Exception as e:
+            warning(f"Chat cache set failed: {e}")
+            self.errors += 1
+
+    async def delete(self, id: str):
+        try:
+            await self.backend.delete(id)
+        except Exception as e:
+            warning(f"Chat cache delete failed: {e}")
+            self.errors += 1
+
+    async def append(self, id: str, start: int, messages: List[Dict], updates: Dict):
+        try:
+            appended = await self.backend.append(
+                id, start, [json.dumps(message) for message in messages], updates
+            )
+        except Exception as e:
+            warning(f"Chat cache append failed: {e}")
+            self.errors += 1
+            appended = False
+        if not appended:
+            await self.delete(id)
+
+    async def replace(self, id: str, messages: Dict[int, Dict]):
+        try:
+            replaced = await self.backend.replace(
+                id, {seq: json.dumps(message) for seq, message in messages.items()}
+            )
+        except Exception as e:
+            warning(f"Chat cache replace failed: {e}")
+            self.errors += 1
+            replaced = False
+        if not replaced:
+            await self.delete(id)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": chat_cache_backend,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "errors": self.errors,
+            **self.backend.stats(),
+        }
+
+
+def init_chat_cache() -> ChatCache:
+    if chat_cache_backend == "redis":
+        return ChatCache(RedisBackend(redis_url, chat_cache_ttl))
+    return ChatCache(MemoryBackend(chat_cache_max_bytes))
+
+
+chat_cache = init_chat_cache()
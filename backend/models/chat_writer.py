@@ -0,0 +1,104 @@
+import asyncio
+import os
+from typing import Dict, List, Optional, Set
+from utils.config import load_config
+from utils.supabase import SupabaseClient
+from utils.log import error
+from models.chat_cache import chat_cache
+from models.messages import append_messages, replace_messages
+
+load_config()
+
+flush_interval = float(os.getenv("WRITE_BEHIND_INTERVAL", "2"))
+flush_max_messages = int(os.getenv("WRITE_BEHIND_MAX_MESSAGES", "20"))
+
+writers: Set["ChatWriter"] = set()
+
+
+class ChatWriter:
+    def __init__(self, supabase: SupabaseClient, chat_id: str, messages: List[Dict]):
+        self.supabase = supabase
+        self.chat_id = chat_id
+        self.messages = messages
+        self.persisted = len(messages)
+        self.updates: Dict = {}
+        self.lock = asyncio.Lock()
+        self.timer: Optional[asyncio.Task] = None
+        self.flushing: Optional[asyncio.Task] = None
+        writers.add(self)
+
+    def update(self, **updates):
+        self.updates.update(updates)
+        self.schedule()
+
+    @property
+    def dirty(self) -> bool:
+        return len(self.messages) > self.persisted or bool(self.updates)
+
+    def schedule(self):
+        if len(self.messages) - self.persisted >= flush_max_messages:
+            if self.flushing is None or self.flushing.done():
+                self.flushing = asyncio.create_task(self.flush())
+        elif self.timer is None:
+            self.timer = asyncio.create_task(self.flush_later())
+
+    async def flush_later(self):
+        await asyncio.sleep(flush_interval)
+        self.timer = None
+        await self.flush()
+
+    async def flush(self):
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        async with self.lock:
+            pending = self.messages[self.persisted :]
+            updates = self.updates
+            if not pending and not updates:
+                return
+            self.updates = {}
+            try:
+                last_chatted = await append_messages(
+                    self.supabase, self.chat_id, self.persisted, pending, updates
+                )
+            except Exception as e:
+                error(f"Failed to flush chat {self.chat_id}: {e}")
+                self.updates = {**updates, **self.updates}
+                if self.timer is None:
+                    self.timer = asyncio.create_task(self.flush_later())
+                return
+            await chat_cache.append(
+                self.chat_id,
+                self.persisted,
+                pending,
+                {**updates, "last_chatted": last_chatted},
+            )
+            self.persisted += len(pending)
+
+    async def rewrite(self, seqs: List[int]):
+        async with self.lock:
+            persisted = {
+                seq: self.messages[seq] for seq in seqs if seq < self.persisted
+            }
+            if not persisted:
+                return
+            try:
+                await replace_messages(self.supabase, self.chat_id, persisted)
+            except Exception as e:
+                error(f"Failed to rewrite messages of chat {self.chat_id}: {e}")
+                return
+            await chat_cache.replace(self.chat_id, persisted)
+
+    async def close(self, attempts: int = 3):
+        for _ in range(attempts):
+            await self.flush()
+            if not self.dirty:
+                break
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        writers.discard(self)
+
+
+async def close_writers():
+    await asyncio.gather(*(writer.close() for writer in list(writers)))
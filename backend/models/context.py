@@ -0,0 +1,120 @@
+import asyncio
+import os
+from bisect import bisect_left
+from typing import Dict, List, Optional
+from utils.config import load_config
+from models.chat_writer import ChatWriter
+from models.conversation import (
+    Conversation,
+    chars_per_token,
+    estimate_tokens,
+    message_overhead_tokens,
+)
+from models.llm import LLM
+from utils.log import warning
+
+load_config()
+
+context_max_tokens = int(os.getenv("CONTEXT_MAX_TOKENS", "6144"))
+context_summarize_tokens = int(os.getenv("CONTEXT_SUMMARIZE_TOKENS", "4096"))
+context_recent_tokens = int(os.getenv("CONTEXT_RECENT_TOKENS", "2048"))
+context_summary_max_tokens = int(os.getenv("CONTEXT_SUMMARY_MAX_TOKENS", "512"))
+
+summary_prompt = """
+You maintain a running summary of a conversation between a user and an AI assistant.
+You are given the previous summary, which may be empty, and the turns that came after it.
+Write an updated summary that keeps every fact, name, preference, decision and open question needed to continue the conversation.
+Write plain sentences in the third person. Do not add anything that was not said.
+"""
+
+summary_model = LLM(
+    model="llama3-70b-8192",
+    max_tokens=context_summary_max_tokens,
+    temperature=0.2,
+    system=summary_prompt,
+)
+
+
+class ContextWindow:
+    def __init__(self, summary: Optional[str] = None, summary_seq: int = 0):
+        self.summary = summary
+        self.summary_seq = summary_seq
+        self.compacting: Optional[asyncio.Task] = None
+
+    def pending(self, messages: Conversation) -> int:
+        return bisect_left(messages.seqs, self.summary_seq)
+
+    def window_start(self, messages: Conversation, first: int, budget: int) -> int:
+        end = len(messages.prompt)
+        return bisect_left(messages.tokens, messages.tokens[end] - budget, first, end)
+
+    def build(self, messages: Conversation) -> List[Dict]:
+        budget = context_max_tokens
+        prompt = []
+        if self.summary:
+            content = f"Summary of the earlier conversation:\n{self.summary}"
+            prompt.append({"role": "system", "content": content})
+            budget -= estimate_tokens(content)
+        first = self.pending(messages)
+        start = self.window_start(messages, first, budget)
+        end = len(messages.prompt)
+        if start == end and end > first:
+            last = dict(messages.prompt[-1])
+            keep = max(budget - message_overhead_tokens, 1) * chars_per_token
+            last["content"] = last["content"][-keep:]
+            return prompt + [last]
+        if start > first:
+            warning(f"Context window dropped {start - first} unsummarized messages")
+        return prompt + messages.prompt[start:]
+
+    def compact_later(self, messages: Conversation, writer: ChatWriter):
+        if self.compacting and not self.compacting.done():
+            return
+        first = self.pending(messages)
+        end = len(messages.prompt)
+        if messages.tokens[end] - messages.tokens[first] <= context_summarize_tokens:
+            return
+        # the newest message stays verbatim even when it alone is over budget
+        start = min(self.window_start(messages, first, context_recent_tokens), end - 1)
+        if start <= first:
+            return
+        self.compacting = asyncio.create_task(
+            self.compact(messages, first, start, writer)
+        )
+
+    async def compact(
+        self, messages: Conversation, first: int, start: int, writer: ChatWriter
+    ):
+        chunk: List[str] = []
+        tokens = 0
+        for i in range(first, start):
+            message = messages.prompt[i]
+            line = f"{message['role']}: {message['content']}"
+            if chunk and tokens + estimate_tokens(line) > context_max_tokens:
+                if not await self.summarize(chunk, messages.seqs[i], writer):
+                    return
+                chunk, tokens = [], 0
+            chunk.append(line[-context_max_tokens * chars_per_token :])
+            tokens += estimate_tokens(chunk[-1])
+        if chunk:
+            await self.summarize(chunk, messages.seqs[start], writer)
+
+    async def summarize(self, lines: List[str], end: int, writer: ChatWriter) -> bool:
+        transcript = "\n".join(lines)
+        try:
+            summary = await summary_model.run(
+                [
+                    {
+                        "role": "user",
+                        "content": f"Previous summary:\n{self.summary or ''}\n\n"
+                        f"New turns:\n{transcript}\n\nUpdated summary:",
+                    }
+                ]
+            )
+        except Exception as e:
+            warning(f"Context summary failed: {e}")
+            return False
+        self.summary = summary.strip()
+        self.summary_seq = end
+        writer.update(context_summary=self.summary, context_summary_seq=end)
+        return True
@@ -0,0 +1,54 @@
+from typing import Dict, Iterable, List
+from models.chat_writer import ChatWriter
+from models.screenshots import store_screenshot
+from utils.supabase import SupabaseClient
+from utils.log import info, warning
+
+chars_per_token = 4
+message_overhead_tokens = 4
+
+
+def estimate_tokens(content: str) -> int:
+    return -(-len(content) // chars_per_token) + message_overhead_tokens
+
+
+class Conversation(list):
+    def __init__(self, messages: Iterable[Dict] = ()):
+        super().__init__()
+        self.prompt: List[Dict] = []
+        self.seqs: List[int] = []
+        self.tokens: List[int] = [0]
+        self.blobs: List[int] = []
+        self.extend(messages)
+
+    def append(self, message: Dict):
+        if message["type"] == "text":
+            self.prompt.append({"role": message["role"], "content": message["content"]})
+            self.seqs.append(len(self))
+            self.tokens.append(self.tokens[-1] + estimate_tokens(message["content"]))
+        elif message["content"].startswith("data:"):
+            self.blobs.append(len(self))
+        super().append(message)
+
+    def extend(self, messages: Iterable[Dict]):
+        for message in messages:
+            self.append(message)
+
+    async def externalize_blobs(
+        self, supabase: SupabaseClient, uid: str, writer: ChatWriter
+    ):
+        blobs, self.blobs = self.blobs, []
+        stored = []
+        for seq in blobs:
+            try:
+                url = (await store_screenshot(supabase, uid, self[seq]["content"]))[
+                    "url"
+                ]
+            except Exception as e:
+                warning(f"Failed to store inline image {seq} of {writer.chat_id}: {e}")
+                continue
+            self[seq]["content"] = url
+            stored.append(seq)
+        if stored:
+            info(f"Moved {len(stored)} inline images of {writer.chat_id} to storage")
+            await writer.rewrite(stored)
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import os
+from typing import Dict, Optional, Set
+from utils.config import load_config
+from utils.frames import inline_content
+from utils.log import warning
+
+load_config()
+
+event_backend = os.getenv("EVENT_BACKEND", "memory")
+event_max_pending = int(os.getenv("EVENT_MAX_PENDING", "1024"))
+redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+class MemorySubscription:
+    def __init__(self, broker: "MemoryBroker", channel: str):
+        self.broker = broker
+        self.channel = channel
+        self.queue: asyncio.Queue = asyncio.Queue(event_max_pending)
+
+    async def get(self) -> Dict:
+        return await self.queue.get()
+
+    async def close(self):
+        subscriptions = self.broker.channels.get(self.channel)
+        if subscriptions:
+            subscriptions.discard(self)
+            if not subscriptions:
+                del self.broker.channels[self.channel]
+
+
+class MemoryBroker:
+    local = True
+
+    def __init__(self):
+        self.channels: Dict[str, Set[MemorySubscription]] = {}
+        self.published = 0
+        self.dropped = 0
+
+    def publish(self, channel: str, message: Dict):
+        self.published += 1
+        for subscription in self.channels.get(channel, ()):
+            try:
+                subscription.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self.dropped += 1
+
+    async def subscribe(self, channel: str) -> MemorySubscription:
+        subscription = MemorySubscription(self, channel)
+        self.channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    async def close(self):
+        self.channels.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "backend": "memory",
+            "channels": len(self.channels),
+            "subscriptions": sum(map(len, self.channels.values())),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+
+class RedisSubscription:
+    def __init__(self, broker: "RedisBroker", pubsub):
+        self.broker = broker
+        self.pubsub = pubsub
+
+    async def get(self) -> Dict:
+        while True:
+            message = await self.pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=None
+            )
+            if message:
+                return json.loads(message["data"])
+
+    async def close(self):
+        self.broker.subscriptions -= 1
+        await self.pubsub.aclose()
+
+
+class RedisBroker:
+    local = False
+
+    def __init__(self, url: str):
+        from redis import asyncio as redis
+
+        self.redis = redis.from_url(url)
+        self.outgoing: asyncio.Queue = asyncio.Queue(event_max_pending)
+        self.sender: Optional[asyncio.Task] = None
+        self.subscriptions = 0
+        self.published = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def publish(self, channel: str, message: Dict):
+        if not self.sender or self.sender.done():
+            self.sender = asyncio.create_task(self.send())
+        try:
+            self.outgoing.put_nowait((channel, message))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def send(self):
+        while True:
+            channel, message = await self.outgoing.get()
+            if message.get("frame"):
+                message = {**message, "frame": inline_content(message["frame"])}
+            try:
+                await self.redis.publish(channel, json.dumps(message))
+                self.published += 1
+            except Exception as e:
+                warning(f"Event publish to {channel} failed: {e}")
+                self.errors += 1
+            finally:
+                self.outgoing.task_done()
+
+    async def subscribe(self, channel: str) -> RedisSubscription:
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(channel)
+        await pubsub.get_message(timeout=None)
+        self.subscriptions += 1
+        return RedisSubscription(self, pubsub)
+
+    async def close(self):
+        if self.sender:
+            await self.outgoing.join()
+            self.sender.cancel()
+        await self.redis.aclose()
+
+    def stats(self) -> Dict:
+        return {
+            "backend": "redis",
+            "subscriptions": self.subscriptions,
+            "pending": self.outgoing.qsize(),
+            "published": self.published,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+
+def init_event_broker():
+    if event_backend == "redis":
+        return RedisBroker(redis_url)
+    return MemoryBroker()
+
+
+event_broker = init_event_broker()
@@ -1,10 +1,9 @@
-import os
-from typing import List
-from dotenv import load_dotenv
+import time
+from typing import AsyncIterator, List
 from pydantic import BaseModel
-from groq import Groq
-
-load_dotenv(True)
+from models.llm_cache import llm_cache
+from utils.clients import get_groq
+from utils.timing import span
 
 
 class LLM(BaseModel):
@@ -12,21 +11,41 @@ class LLM(BaseModel):
     max_tokens: int
     temperature: float
     system: str
+    cache: bool = False
 
-    def __init__(self, **data):
-        super().__init__(**data)
-        object.__setattr__(
-            self,
-            "client",
-            Groq(api_key=os.getenv("GROQ_API_KEY")),
-        )
+    async def run(self, messages: List[dict]):
+        if not self.cache or not llm_cache.enabled:
+            return await self.complete(messages)
+        key = llm_cache.key(self.model_dump(exclude={"cache"}), messages)
+        output = llm_cache.get(key)
+        if output is not None:
+            return output
+        start = time.perf_counter()
+        output = await self.complete(messages)
+        llm_cache.set(key, output, time.perf_counter() - start)
+        return output
 
-    def run(self, messages: List[dict]):
-        completion = self.client.chat.completions.create(
-            model=self.model,
-            max_tokens=self.max_tokens,
-            temperature=self.temperature,
-            messages=[{"role": "system", "content": self.system}] + messages,
-        )
+    async def complete(self, messages: List[dict]):
+        with span("groq.complete"):
+            completion = await get_groq().chat.completions.create(
+                model=self.model,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                messages=[{"role": "system", "content": self.system}] + messages,
+            )
         output = completion.choices[0].message.content
         return output
+
+    async def stream(self, messages: List[dict]) -> AsyncIterator[str]:
+        with span("groq.stream"):
+            completion = await get_groq().chat.completions.create(
+                model=self.model,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                messages=[{"role": "system", "content": self.system}] + messages,
+                stream=True,
+            )
+            async for chunk in completion:
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
@@ -0,0 +1,76 @@
+import hashlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from utils.config import load_config
+
+load_config()
+
+llm_cache_mode = os.getenv("LLM_CACHE_MODE", "normalized")
+llm_cache_ttl = float(os.getenv("LLM_CACHE_TTL", "3600"))
+llm_cache_max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+
+non_word = re.compile(r"[^\w]+")
+
+
+def normalize(content: str) -> str:
+    return non_word.sub(" ", content.casefold()).strip()
+
+
+class LLMCache:
+    def __init__(self, mode: str, ttl: float, max_entries: int):
+        self.mode = mode
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: OrderedDict[str, Tuple[float, str, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.saved = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off" and self.max_entries > 0
+
+    def key(self, params: Dict, messages: List[dict]) -> str:
+        if self.mode == "normalized":
+            messages = [
+                {**message, "content": normalize(message["content"])}
+                for message in messages
+            ]
+        data = json.dumps([params, messages], sort_keys=True)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self.entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            self.entries.move_to_end(key)
+            self.hits += 1
+            self.saved += entry[2]
+            return entry[1]
+        if entry:
+            del self.entries[key]
+        self.misses += 1
+        return None
+
+    def set(self, key: str, output: str, latency: float):
+        self.entries[key] = (time.monotonic() + self.ttl, output, latency)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "mode": self.mode,
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_ms": round(self.saved * 1000),
+        }
+
+
+llm_cache = LLMCache(llm_cache_mode, llm_cache_ttl, llm_cache_max_entries)
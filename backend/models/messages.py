@@ -0,0 +1,59 @@
+from datetime import datetime, timezone
+from typing import Dict, List
+from utils.supabase import SupabaseClient
+from utils.executor import run_sync
+
+chat_columns = (
+    "id, owner, model, last_chatted, session_id, context_summary, "
+    "context_summary_seq, chat_messages(type, role, content)"
+)
+
+
+def chat_from_row(row: Dict) -> Dict:
+    row["messages"] = row.pop("chat_messages", None) or []
+    return row
+
+
+async def append_messages(
+    supabase: SupabaseClient,
+    chat_id: str,
+    start: int,
+    messages: List[Dict],
+    updates: Dict = {},
+) -> str:
+    date = datetime.now(timezone.utc)
+    await run_sync(
+        supabase.rpc(
+            "append_chat_messages",
+            {
+                "chat_id": chat_id,
+                "start_seq": start,
+                "messages": messages,
+                "last_chatted": date.isoformat(),
+                "updates": updates,
+            },
+        ).execute
+    )
+    return date.isoformat()
+
+
+async def replace_messages(
+    supabase: SupabaseClient, chat_id: str, messages: Dict[int, Dict]
+):
+    await run_sync(
+        supabase.table("chat_messages")
+        .upsert(
+            [
+                {
+                    "chat_id": chat_id,
+                    "seq": seq,
+                    "type": message["type"],
+                    "role": message["role"],
+                    "content": message["content"],
+                }
+                for seq, message in messages.items()
+            ],
+            on_conflict="chat_id,seq",
+        )
+        .execute
+    )
@@ -0,0 +1,76 @@
+import binascii
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from utils.config import load_config
+from utils.supabase import SupabaseClient
+from utils.clients import get_http
+from utils.executor import run_sync
+from utils.images import (
+    decode_data_url,
+    image_extension,
+    make_thumbnail,
+    sniff_content_type,
+)
+
+load_config()
+
+screenshot_websocket_mode = os.getenv("SCREENSHOT_WEBSOCKET_MODE", "url")
+screenshot_url_cache_size = 4096
+
+screenshot_urls: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+
+
+async def load_screenshot(screenshot: str) -> Tuple[bytes, str]:
+    if screenshot.startswith("http"):
+        response = await get_http().get(screenshot)
+        response.raise_for_status()
+        content_type = response.headers.get("content-type", "").split(";")[0]
+        return response.content, content_type or sniff_content_type(response.content)
+    if screenshot.startswith("data:"):
+        return decode_data_url(screenshot)
+    data = binascii.a2b_base64(screenshot)
+    return data, sniff_content_type(data)
+
+
+def upload_screenshot(
+    supabase: SupabaseClient, path: str, data: bytes, content_type: str
+):
+    supabase.storage.from_("images").upload(
+        file=data,
+        path=path,
+        file_options={
+            "content-type": content_type,
+            "cache-control": "31536000",
+            "upsert": "true",
+        },
+    )
+    return supabase.storage.from_("images").get_public_url(path)
+
+
+async def store_screenshot(
+    supabase: SupabaseClient, uid: str, screenshot: str
+) -> Dict[str, Optional[str | bytes]]:
+    is_url = screenshot.startswith("http")
+    if is_url and screenshot_websocket_mode != "thumbnail":
+        return {"url": screenshot, "thumbnail": None}
+    data, content_type = await load_screenshot(screenshot)
+    if is_url:
+        url = screenshot
+    else:
+        digest = hashlib.sha256(data).hexdigest()
+        key = (uid, digest)
+        if key in screenshot_urls:
+            screenshot_urls.move_to_end(key)
+            url = screenshot_urls[key]
+        else:
+            path = f"{uid}/screenshots/{digest}{image_extension(content_type)}"
+            url = await run_sync(upload_screenshot, supabase, path, data, content_type)
+            screenshot_urls[key] = url
+            if len(screenshot_urls) > screenshot_url_cache_size:
+                screenshot_urls.popitem(last=False)
+    thumbnail = None
+    if screenshot_websocket_mode == "thumbnail":
+        thumbnail = await run_sync(make_thumbnail, data)
+    return {"url": url, "thumbnail": thumbnail}
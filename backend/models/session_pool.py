@@ -0,0 +1,225 @@
+import asyncio
+import itertools
+import math
+import os
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set, Tuple
+from utils.config import load_config
+from utils.clients import get_multion
+from utils.timing import StageStats, Timings, span
+from utils.log import warning
+from models.admission import Overloaded, admission_retry_after
+
+if TYPE_CHECKING:
+    from multion.types.session_created import SessionCreated
+
+load_config()
+
+multion_pool_size = int(os.getenv("MULTION_POOL_SIZE", "0"))
+multion_pool_max_sessions = int(os.getenv("MULTION_POOL_MAX_SESSIONS", "64"))
+multion_pool_idle_ttl = float(os.getenv("MULTION_POOL_IDLE_TTL", "240"))
+multion_pool_max_wait = float(os.getenv("MULTION_POOL_MAX_WAIT", "60"))
+multion_start_url = os.getenv("MULTION_START_URL", "https://google.com")
+
+
+class SessionPool:
+    def __init__(
+        self,
+        size: int,
+        max_sessions: int,
+        idle_ttl: float,
+        max_wait: float = multion_pool_max_wait,
+    ):
+        self.size = size
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_wait = max_wait
+        self.slots = asyncio.Semaphore(max_sessions)
+        self.idle: List[Tuple[float, "SessionCreated"]] = []
+        self.in_use: Dict[str, float] = {}
+        self.creating = 0
+        self.waiting = 0
+        self.queue: Dict[int, Optional[Callable[[int], None]]] = {}
+        self.tickets = itertools.count()
+        self.lease = 0.0
+        self.refill_task: Optional[asyncio.Task] = None
+        self.wake = asyncio.Event()
+        self.warming: Set[asyncio.Task] = set()
+        self.closing: List[asyncio.Task] = []
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.closed = 0
+        self.timed_out = 0
+        self.timings = StageStats()
+
+    async def create(self) -> "SessionCreated":
+        timings = Timings()
+        self.creating += 1
+        try:
+            with timings.stage("create"), span("multion.create"):
+                session = await get_multion().sessions.create(
+                    url=multion_start_url, local=False
+                )
+        finally:
+            self.creating -= 1
+        self.timings.record(timings.stages)
+        return session
+
+    def prune(self):
+        now = time.monotonic()
+        while self.idle and now - self.idle[0][0] >= self.idle_ttl:
+            _, session = self.idle.pop(0)
+            self.expired += 1
+            self.close_later(session.session_id)
+
+    def take_idle(self) -> Optional["SessionCreated"]:
+        self.prune()
+        if self.idle:
+            return self.idle.pop(0)[1]
+        return None
+
+    def retry_after(self) -> int:
+        wait = self.lease * (self.waiting + 1) / max(self.max_sessions, 1)
+        return max(admission_retry_after, math.ceil(wait))
+
+    def notify(self, behind: int):
+        for position, (ticket, on_position) in enumerate(self.queue.items(), 1):
+            if ticket > behind and on_position:
+                on_position(position)
+
+    async def wait_slot(self, on_position: Optional[Callable[[int], None]]):
+        if not self.slots.locked():
+            await self.slots.acquire()
+            return
+        ticket = next(self.tickets)
+        self.queue[ticket] = on_position
+        self.waiting += 1
+        if on_position:
+            on_position(len(self.queue))
+        try:
+            await asyncio.wait_for(self.slots.acquire(), self.max_wait or None)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise Overloaded(self.retry_after())
+        finally:
+            self.waiting -= 1
+            del self.queue[ticket]
+            self.notify(ticket)
+
+    async def acquire(
+        self, on_position: Optional[Callable[[int], None]] = None
+    ) -> "SessionCreated":
+        timings = Timings()
+        with timings.stage("acquire"):
+            session = self.take_idle()
+            if session:
+                self.hits += 1
+            else:
+                self.misses += 1
+                await self.wait_slot(on_position)
+                session = self.take_idle()
+                if session:
+                    self.slots.release()
+                else:
+                    try:
+                        session = await self.create()
+                    except BaseException:
+                        self.slots.release()
+                        raise
+        self.timings.record(timings.stages)
+        self.in_use[session.session_id] = time.perf_counter()
+        self.refill()
+        return session
+
+    def release(self, session_id: str):
+        acquired = self.in_use.pop(session_id, None)
+        if acquired is not None:
+            lease = Timings().elapsed_ms(acquired)
+            self.timings.record({"lease": lease})
+            self.lease = 0.8 * self.lease + 0.2 * lease / 1000
+        self.close_later(session_id, acquired is not None)
+
+    def close_later(self, session_id: str, pooled: bool = True):
+        task = asyncio.create_task(self.close_session(session_id, pooled))
+        self.closing.append(task)
+        task.add_done_callback(self.closing.remove)
+
+    async def close_session(self, session_id: str, pooled: bool):
+        try:
+            with span("multion.close"):
+                await get_multion().sessions.close(session_id=session_id)
+            self.closed += 1
+        except Exception as e:
+            warning(f"MultiOn session {session_id} close failed: {e}")
+        finally:
+            if pooled:
+                self.slots.release()
+                self.refill()
+
+    def refill(self):
+        if self.size <= 0:
+            return
+        self.wake.set()
+        if not self.refill_task or self.refill_task.done():
+            self.refill_task = asyncio.create_task(self.fill())
+
+    async def warm(self):
+        try:
+            session = await self.create()
+        except Exception as e:
+            self.slots.release()
+            warning(f"MultiOn session warmup failed: {e}")
+            return
+        self.idle.append((time.monotonic(), session))
+
+    async def fill(self):
+        while True:
+            self.wake.clear()
+            self.prune()
+            while (
+                len(self.idle) + len(self.warming) < self.size
+                and not self.slots.locked()
+            ):
+                await self.slots.acquire()
+                task = asyncio.create_task(self.warm())
+                self.warming.add(task)
+                task.add_done_callback(self.warming.discard)
+            try:
+                await asyncio.wait_for(self.wake.wait(), self.idle_ttl / 4)
+            except asyncio.TimeoutError:
+                pass
+
+    async def close(self):
+        self.size = 0
+        if self.refill_task:
+            self.refill_task.cancel()
+        await asyncio.gather(*self.warming, return_exceptions=True)
+        for _, session in self.idle:
+            self.close_later(session.session_id)
+        self.idle.clear()
+        await asyncio.gather(*self.closing, return_exceptions=True)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": self.size,
+            "max_sessions": self.max_sessions,
+            "idle": len(self.idle),
+            "in_use": len(self.in_use),
+            "creating": self.creating,
+            "waiting": self.waiting,
+            "timed_out": self.timed_out,
+            "retry_after": self.retry_after(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "expired": self.expired,
+            "closed": self.closed,
+            "timings": self.timings.summary(),
+        }
+
+
+session_pool = SessionPool(
+    multion_pool_size, multion_pool_max_sessions, multion_pool_idle_ttl
+)
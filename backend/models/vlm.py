@@ -0,0 +1,226 @@
+import asyncio
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from utils.config import load_config
+from utils.clients import get_replicate
+from utils.log import info, warning
+from utils.timing import span
+
+load_config()
+
+vlm_concurrency = int(os.getenv("VLM_CONCURRENCY", "8"))
+vlm_timeout = float(os.getenv("VLM_TIMEOUT", "60"))
+vlm_first_token_timeout = float(os.getenv("VLM_FIRST_TOKEN_TIMEOUT", "20"))
+vlm_slow_latency = float(os.getenv("VLM_SLOW_LATENCY", "8"))
+vlm_latency_half_life = float(os.getenv("VLM_LATENCY_HALF_LIFE", "60"))
+vlm_fake_backend = os.getenv("VLM_FAKE_BACKEND", "") == "1"
+
+
+class VLM(ABC):
+    def __init__(
+        self,
+        name: str,
+        fallbacks: List[str] = [],
+        concurrency: int = vlm_concurrency,
+        timeout: float = vlm_timeout,
+        first_token_timeout: float = vlm_first_token_timeout,
+    ):
+        self.name = name
+        self.fallbacks = fallbacks
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.first_token_timeout = first_token_timeout
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.measured_latency: Optional[float] = None
+        self.measured_at = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    @property
+    def saturated(self) -> bool:
+        return self.in_flight + self.waiting >= self.concurrency
+
+    @property
+    def latency(self) -> Optional[float]:
+        if self.measured_latency is None or not vlm_latency_half_life:
+            return self.measured_latency
+        # without new samples the estimate fades, so a slow backend gets retried
+        age = time.monotonic() - self.measured_at
+        return self.measured_latency * 0.5 ** (age / vlm_latency_half_life)
+
+    @property
+    def slow(self) -> bool:
+        return self.latency is not None and self.latency > vlm_slow_latency
+
+    @property
+    def expected_latency(self) -> float:
+        queued = (self.in_flight + self.waiting) // self.concurrency
+        return (self.latency or vlm_slow_latency) * (1 + queued)
+
+    def record_latency(self, latency: float):
+        if self.latency is None:
+            self.measured_latency = latency
+        else:
+            self.measured_latency = 0.8 * self.latency + 0.2 * latency
+        self.measured_at = time.monotonic()
+
+    @abstractmethod
+    def generate(self, image_url: str, image_prompt: str) -> AsyncIterator[str]: ...
+
+    async def stream(self, image_url: str, image_prompt: str) -> AsyncIterator[str]:
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        self.requests += 1
+        start = time.perf_counter()
+        first = True
+        tokens = self.generate(image_url, image_prompt)
+        try:
+            while True:
+                remaining = start + self.timeout - time.perf_counter()
+                if first:
+                    remaining = min(remaining, self.first_token_timeout)
+                try:
+                    token = await asyncio.wait_for(anext(tokens), remaining)
+                except StopAsyncIteration:
+                    break
+                if first:
+                    self.record_latency(time.perf_counter() - start)
+                    first = False
+                yield token
+        except Exception:
+            self.failures += 1
+            if first:
+                self.record_latency(time.perf_counter() - start)
+            raise
+        finally:
+            await tokens.aclose()
+            self.in_flight -= 1
+            self.semaphore.release()
+
+    def stats(self) -> Dict:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "concurrency": self.concurrency,
+            "latency_ms": round(self.latency * 1000) if self.latency else None,
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+
+class ReplicateVLM(VLM):
+    def __init__(self, name: str, ref: str, input: Dict = {}, **kwargs):
+        super().__init__(name, **kwargs)
+        self.ref = ref
+        self.input = input
+
+    async def generate(self, image_url: str, image_prompt: str) -> AsyncIterator[str]:
+        with span("replicate.run"):
+            output = await get_replicate().async_run(
+                self.ref,
+                input={"image": image_url, "prompt": image_prompt, **self.input},
+            )
+            if isinstance(output, str):
+                yield output
+            else:
+                async for token in output:
+                    yield token
+
+
+class FakeVLM(VLM):
+    def __init__(
+        self,
+        name: str = "fake",
+        output: str = "There is a cheeseburger with a slice of bacon.",
+        delay: float = 0.05,
+        **kwargs,
+    ):
+        super().__init__(name, **kwargs)
+        self.output = output
+        self.delay = delay
+
+    async def generate(self, image_url: str, image_prompt: str) -> AsyncIterator[str]:
+        await asyncio.sleep(self.delay)
+        for word in self.output.split(" "):
+            yield word + " "
+
+
+vlms: Dict[str, VLM] = {}
+fallbacks_used = 0
+
+
+def register_vlm(vlm: VLM):
+    vlms[vlm.name] = vlm
+
+
+def choose_vlms(model: str) -> List[VLM]:
+    if model not in vlms:
+        raise ValueError(f"Unknown VLM {model}")
+    primary = vlms[model]
+    candidates = [primary] + [vlms[name] for name in primary.fallbacks if name in vlms]
+    if not primary.saturated and not primary.slow:
+        return candidates
+    return sorted(candidates, key=lambda vlm: vlm.expected_latency)
+
+
+async def stream_vlm(
+    model: str, image_url: str, image_prompt: str
+) -> AsyncIterator[Tuple[str, str]]:
+    global fallbacks_used
+    for vlm in choose_vlms(model):
+        if vlm.name != model:
+            info(f"Falling back from {model} to {vlm.name}")
+            fallbacks_used += 1
+        started = False
+        try:
+            async for token in vlm.stream(image_url, image_prompt):
+                started = True
+                yield vlm.name, token
+            return
+        except Exception as e:
+            if started:
+                raise
+            warning(f"VLM {vlm.name} failed: {e!r}")
+    raise RuntimeError(f"No VLM backend could describe the image for {model}")
+
+
+def vlm_stats() -> Dict:
+    return {
+        "fallbacks": fallbacks_used,
+        "backends": {name: vlm.stats() for name, vlm in vlms.items()},
+    }
+
+
+register_vlm(
+    ReplicateVLM(
+        "llava-13b",
+        "yorickvp/llava-13b:b5f6212d032508382d61ff00469ddda3e32fd8a0e75dc39d8a4191bb742157fb",
+        {"top_p": 1, "max_tokens": 1024, "temperature": 0.2},
+        fallbacks=["llava-v1.6-34b"],
+    )
+)
+register_vlm(
+    ReplicateVLM(
+        "llava-v1.6-34b",
+        "yorickvp/llava-v1.6-34b:41ecfbfb261e6c1adf3ad896c9066ca98346996d7c4045c5bc944a79d430f174",
+        {"top_p": 1, "max_tokens": 1024, "temperature": 0.2},
+        fallbacks=["llava-13b"],
+    )
+)
+register_vlm(
+    ReplicateVLM(
+        "qwen-vl-chat",
+        "lucataco/qwen-vl-chat:50881b153b4d5f72b3db697e2bbad23bb1277ab741c5b52d80cd6ee17ea660e9",
+        fallbacks=["llava-13b"],
+    )
+)
+if vlm_fake_backend:
+    register_vlm(FakeVLM())
@@ -0,0 +1,161 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+from utils.config import load_config
+from utils.executor import run_sync
+from utils.log import warning
+
+load_config()
+
+vlm_cache_path = os.getenv("VLM_CACHE_PATH", ".cache/vlm.sqlite3")
+vlm_cache_max_bytes = int(os.getenv("VLM_CACHE_MAX_BYTES", str(64 << 20)))
+
+schema = """
+create table if not exists vlm_results (
+    key text primary key,
+    output text not null,
+    size integer not null,
+    used real not null
+);
+create index if not exists vlm_results_used on vlm_results (used);
+create table if not exists vlm_images (
+    key text primary key,
+    url text not null,
+    size integer not null,
+    used real not null
+);
+create index if not exists vlm_images_used on vlm_images (used);
+"""
+
+
+def result_key(digest: str, model: str, image_prompt: str) -> str:
+    return hashlib.sha256(f"{digest}\0{model}\0{image_prompt}".encode()).hexdigest()
+
+
+def image_key(uid: str, digest: str) -> str:
+    return f"{uid}/{digest}"
+
+
+class VLMCache:
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.connection: Optional[sqlite3.Connection] = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.uploads_skipped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path) and self.max_bytes > 0
+
+    def connect(self) -> sqlite3.Connection:
+        if self.connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.connection = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None
+            )
+            self.connection.execute("pragma journal_mode=wal")
+            self.connection.executescript(schema)
+        return self.connection
+
+    def read(self, table: str, column: str, key: str) -> Optional[str]:
+        with self.lock:
+            connection = self.connect()
+            row = connection.execute(
+                f"select {column} from {table} where key = ?", (key,)
+            ).fetchone()
+            if row:
+                connection.execute(
+                    f"update {table} set used = ? where key = ?", (time.time(), key)
+                )
+        return row[0] if row else None
+
+    def write(self, table: str, column: str, key: str, value: str):
+        with self.lock:
+            connection = self.connect()
+            connection.execute(
+                f"insert or replace into {table} (key, {column}, size, used) "
+                "values (?, ?, ?, ?)",
+                (key, value, len(value), time.time()),
+            )
+            (size,) = connection.execute(
+                f"select coalesce(sum(size), 0) from {table}"
+            ).fetchone()
+            if size > self.max_bytes:
+                connection.execute(
+                    f"delete from {table} where key in ("
+                    f"select key from {table} order by used limit "
+                    f"(select count(*) / 4 + 1 from {table}))"
+                )
+
+    async def get(self, digest: str, model: str, image_prompt: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        try:
+            output = await run_sync(
+                self.read,
+                "vlm_results",
+                "output",
+                result_key(digest, model, image_prompt),
+            )
+        except Exception as e:
+            warning(f"VLM cache get failed: {e}")
+            output = None
+        if output is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return output
+
+    async def set(self, digest: str, model: str, image_prompt: str, output: str):
+        if not self.enabled or not output:
+            return
+        try:
+            await run_sync(
+                self.write,
+                "vlm_results",
+                "output",
+                result_key(digest, model, image_prompt),
+                output,
+            )
+        except Exception as e:
+            warning(f"VLM cache set failed: {e}")
+
+    async def get_image(self, uid: str, digest: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        try:
+            url = await run_sync(self.read, "vlm_images", "url", image_key(uid, digest))
+        except Exception as e:
+            warning(f"VLM cache get failed: {e}")
+            return None
+        if url:
+            self.uploads_skipped += 1
+        return url
+
+    async def set_image(self, uid: str, digest: str, url: str):
+        if not self.enabled:
+            return
+        try:
+            await run_sync(self.write, "vlm_images", "url", image_key(uid, digest), url)
+        except Exception as e:
+            warning(f"VLM cache set failed: {e}")
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "uploads_skipped": self.uploads_skipped,
+        }
+
+
+vlm_cache = VLMCache(vlm_cache_path, vlm_cache_max_bytes)
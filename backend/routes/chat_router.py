@@ -10,6 +10,7 @@ from fastapi import (
     WebSocketDisconnect,
     WebSocketException,
     Path,
+    Query,
     Depends,
 )
 from models.chat import (
@@ -17,9 +18,17 @@ from models.chat import (
     run_chat,
     create_chat,
     get_chats_by_model,
+    get_chat_summaries,
     get_chat,
+    decode_cursor,
 )
+from models.agent import find_remote_job, get_job
+from models.chat_writer import ChatWriter
+from models.context import ContextWindow
+from models.conversation import Conversation
 from auth.auth_bearer import decode_token, JWTBearer
+from utils.frames import accept
+from utils.log import error, info
 
 chat_router = APIRouter(
     prefix="/chat",
@@ -32,30 +41,53 @@ async def run_chat_handler(
     websocket: WebSocket,
     id: Annotated[str, Path(description="The ID of the chat to run")],
     user: Annotated[str, Depends(decode_token)],
+    after: Annotated[int | None, Query(ge=0)] = None,
 ):
 
-    await websocket.accept()
+    await accept(websocket)
     uid = user["sub"]
-    chat = get_chat(websocket.app.supabase, id)
+    chat = await get_chat(websocket.state.supabase, id)
     if not chat:
         await websocket.close(code=1002, reason="Chat not found")
+        return
     if chat and uid != chat.owner:
         await websocket.close(code=1003, reason="User is not owner of chat")
+        return
+    job = get_job(id)
+    if job:
+        messages, writer = job.messages, job.writer
+    else:
+        messages = Conversation(chat.messages)
+        writer = ChatWriter(websocket.state.supabase, id, messages)
     try:
+        if not job and chat.session_id:
+            job = await find_remote_job(
+                websocket.state.supabase, id, chat.session_id, messages, writer
+            )
+        if job:
+            job.attach(websocket, websocket.state.supabase, after)
         await run_chat(
             websocket,
-            websocket.app.supabase,
+            websocket.state.supabase,
             id,
             chat.model,
-            chat.messages,
-            chat.session_id,
+            messages,
+            job.session_id if job else chat.session_id,
             uid,
+            writer,
+            ContextWindow(chat.context_summary, chat.context_summary_seq),
         )
     except WebSocketDisconnect as w:
-        print(w)
+        info(f"Chat {id} disconnected with code {w.code}")
     except Exception as e:
-        print(e)
+        error(f"Chat {id} failed: {e!r}")
         await websocket.close(code=1011, reason=str(e))
+    finally:
+        job = get_job(id)
+        if job and job.writer is writer:
+            await job.detach(websocket)
+        else:
+            await writer.close()
 
 
 @chat_router.post("/create/{model}")
@@ -65,7 +97,7 @@ async def create_chat_handler(
     user: dict = Depends(JWTBearer()),
 ):
     uid = user["sub"]
-    response = create_chat(request.app.supabase, model, uid)
+    response = await create_chat(request.state.supabase, model, uid)
     return response
 
 
@@ -76,12 +108,12 @@ async def delete_chat_handler(
     user: dict = Depends(JWTBearer()),
 ):
     uid = user["sub"]
-    chat = get_chat(request.app.supabase, id)
+    chat = await get_chat(request.state.supabase, id)
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
     if chat and uid != chat.owner:
         raise HTTPException(status_code=403, detail="User is not owner of chat")
-    response = delete_chat(request.app.supabase, id)
+    response = await delete_chat(request.state.supabase, id)
     return response
 
 
@@ -92,7 +124,26 @@ async def get_chats_by_owner_handler(
     user: dict = Depends(JWTBearer()),
 ):
     uid = user["sub"]
-    response = get_chats_by_model(request.app.supabase, uid, model)
+    response = await get_chats_by_model(request.state.supabase, uid, model)
+    return response
+
+
+@chat_router.get("/list/{model}")
+async def list_chats_handler(
+    request: Request,
+    model: Annotated[str, Path(description="The model of the chats to list")],
+    limit: Annotated[int, Query(ge=1, le=100)] = 50,
+    cursor: Annotated[str | None, Query()] = None,
+    user: dict = Depends(JWTBearer()),
+):
+    uid = user["sub"]
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    response = await get_chat_summaries(
+        request.state.supabase, uid, model, limit, after
+    )
     return response
 
 
@@ -103,7 +154,7 @@ async def get_chat_handler(
     user: dict = Depends(JWTBearer()),
 ):
     uid = user["sub"]
-    response = get_chat(request.app.supabase, id)
+    response = await get_chat(request.state.supabase, id)
     if response and uid != response.owner:
         raise HTTPException(status_code=403, detail="User is not owner of chat")
     return response
@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from utils.clients import clients_ready, providers
+
+health_router = APIRouter(tags=["health"])
+
+
+@health_router.get("/ready")
+async def ready_handler():
+    ready = clients_ready()
+    return JSONResponse(
+        {"ready": ready, "providers": providers}, status_code=200 if ready else 503
+    )
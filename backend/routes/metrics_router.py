@@ -0,0 +1,33 @@
+from fastapi import APIRouter
+from models.admission import chat_admission
+from models.agent import agent_admission, agent_stats
+from models.chat_cache import chat_cache
+from models.events import event_broker
+from models.llm_cache import llm_cache
+from models.session_pool import session_pool
+from models.vlm import vlm_stats
+from models.vlm_cache import vlm_cache
+from utils.timing import span_stats
+
+metrics_router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"],
+)
+
+
+@metrics_router.get("")
+async def metrics_handler():
+    return {
+        "chat_cache": chat_cache.stats(),
+        "llm_cache": llm_cache.stats(),
+        "vlm_cache": vlm_cache.stats(),
+        "vlm": vlm_stats(),
+        "agents": agent_stats(),
+        "admission": {
+            "chat": chat_admission.stats(),
+            "agent": agent_admission.stats(),
+        },
+        "sessions": session_pool.stats(),
+        "events": event_broker.stats(),
+        "spans": span_stats(),
+    }
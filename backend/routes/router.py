@@ -1,7 +1,11 @@
 from fastapi import APIRouter
 from routes.chat_router import chat_router
+from routes.health_router import health_router
+from routes.metrics_router import metrics_router
 
 
 router = APIRouter(responses={404: {"description": "Not found"}})
 
 router.include_router(chat_router)
+router.include_router(metrics_router)
+router.include_router(health_router)
@@ -0,0 +1,36 @@
+import time
+from typing import List
+
+import httpx
+import jwt
+import pytest
+
+import auth.auth_handler as auth_handler
+import utils.supabase as supabase
+
+
+@pytest.fixture
+def postgrest_requests(monkeypatch) -> List[httpx.Request]:
+    requests: List[httpx.Request] = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json=[])
+
+    monkeypatch.setattr(supabase, "supabase_url", "http://supabase.test")
+    monkeypatch.setattr(supabase, "supabase_key", "anon-key")
+    monkeypatch.setitem(supabase.transports, "supabase", httpx.MockTransport(handle))
+    return requests
+
+
+@pytest.fixture
+def token(monkeypatch) -> str:
+    monkeypatch.setattr(auth_handler, "jwt_secret", "test-secret")
+    monkeypatch.setattr(auth_handler, "jwt_issuer", "test")
+    payload = {
+        "sub": "owner",
+        "aud": "authenticated",
+        "iss": "test",
+        "exp": int(time.time()) + 3600,
+    }
+    return jwt.encode(payload, "test-secret", algorithm="HS256")
@@ -0,0 +1,99 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("multion")
+
+import models.agent as agent
+import models.events as events
+import utils.clients as clients
+from utils.fake_multion import FakeMultiOn
+
+
+class FakeWriter:
+    persisted = 0
+
+    def schedule(self):
+        pass
+
+    def update(self, **kwargs):
+        pass
+
+    async def flush(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.state = SimpleNamespace()
+        self.frames = []
+
+    async def send_json(self, frame):
+        self.frames.append(frame)
+
+
+def test_step_failure_reaches_clients_and_broker(monkeypatch):
+    broker = events.MemoryBroker()
+    monkeypatch.setattr(agent, "event_broker", broker)
+    monkeypatch.setitem(clients.clients, "multion", FakeMultiOn(step_latency=0))
+
+    async def run():
+        websocket = FakeWebSocket()
+        subscription = await broker.subscribe(agent.events_channel("chat"))
+        # the fake only steps sessions it created, so this one fails
+        job = agent.start_job(
+            websocket, None, "chat", "owner", "closed", [], FakeWriter(), "Go"
+        )
+        await job.task
+        await asyncio.sleep(0)
+        published = []
+        while not subscription.queue.empty():
+            published.append(subscription.queue.get_nowait())
+        job.listener.cancel()
+        agent.agent_jobs.pop("closed", None)
+        return job, websocket.frames, published
+
+    job, frames, published = asyncio.run(run())
+    contents = [frame["content"] for frame in frames]
+    assert contents == ["Agent error", "Awaiting input"]
+    assert published[0]["frame"]["content"] == "Agent error"
+    assert published[0]["status"] == "running"
+    assert job.status == "awaiting_input"
+
+
+def test_detach_stops_the_subscriber_pump(monkeypatch):
+    monkeypatch.setattr(agent, "event_broker", events.MemoryBroker())
+
+    async def run():
+        job = agent.AgentJob(None, "chat", "owner", "session", [], FakeWriter())
+        job.status = "awaiting_input"
+        websocket = FakeWebSocket()
+        job.attach(websocket, None)
+        subscriber = job.subscribers[websocket]
+        assert subscriber.task in agent.pumps
+        await job.detach(websocket)
+        if job.expiry:
+            job.expiry.cancel()
+        return subscriber
+
+    subscriber = asyncio.run(run())
+    assert subscriber.task.cancelled()
+    assert subscriber.task not in agent.pumps
+
+
+def test_attach_to_finished_job_ends_the_pump(monkeypatch):
+    monkeypatch.setattr(agent, "event_broker", events.MemoryBroker())
+
+    async def run():
+        job = agent.AgentJob(None, "chat", "owner", "session", [], FakeWriter())
+        job.status = "done"
+        websocket = FakeWebSocket()
+        job.attach(websocket, None)
+        await asyncio.wait_for(job.subscribers[websocket].task, 1)
+        return websocket.frames
+
+    assert [frame["content"] for frame in asyncio.run(run())] == ["Agent start"]
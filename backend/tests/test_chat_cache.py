@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from models.chat_cache import ChatCache, MemoryBackend, RedisBackend
+from utils.fake_redis import FakeRedis
+
+
+def chat(messages):
+    return {"id": "chat", "owner": "owner", "last_chatted": None, "messages": messages}
+
+
+def text(content):
+    return {"type": "text", "role": "user", "content": content}
+
+
+async def exercise(cache):
+    await cache.set(chat([text("a")]))
+    await cache.append("chat", 1, [text("b"), text("c")], {"last_chatted": "t"})
+    cached = await cache.get("chat")
+    assert cached["last_chatted"] == "t"
+    assert [m["content"] for m in cached["messages"]] == ["a", "b", "c"]
+    await cache.replace("chat", {0: text("A")})
+    cached = await cache.get("chat")
+    assert [m["content"] for m in cached["messages"]] == ["A", "b", "c"]
+    await cache.append("chat", 5, [text("x")], {})
+    assert await cache.get("chat") is None
+    await cache.append("missing", 0, [text("x")], {})
+    assert await cache.get("missing") is None
+    assert cache.errors == 0
+
+
+def test_memory_backend():
+    asyncio.run(exercise(ChatCache(MemoryBackend(1 << 20))))
+
+
+def test_memory_backend_evicts_entries_grown_past_the_limit():
+    backend = MemoryBackend(200)
+
+    async def grow():
+        cache = ChatCache(backend)
+        await cache.set(chat([]))
+        await cache.append("chat", 0, [text("x" * 300)], {})
+        assert await cache.get("chat") is None
+
+    asyncio.run(grow())
+    assert backend.size == 0
+    assert backend.evictions == 1
+
+
+async def with_redis(test):
+    pytest.importorskip("redis")
+    server = await FakeRedis().serve("127.0.0.1", 0)
+    url = f"redis://127.0.0.1:{server.sockets[0].getsockname()[1]}/0"
+    backends = [RedisBackend(url, 60), RedisBackend(url, 60)]
+    try:
+        await test(*backends)
+    finally:
+        for backend in backends:
+            await backend.redis.aclose()
+        server.close()
+
+
+def test_redis_backend():
+    async def test(backend, _):
+        await exercise(ChatCache(backend))
+
+    asyncio.run(with_redis(test))
+
+
+def test_redis_concurrent_appends_do_not_duplicate():
+    async def test(first, second):
+        worker, other = ChatCache(first), ChatCache(second)
+        await worker.set(chat([text("a")]))
+        await other.get("chat")
+        await asyncio.gather(
+            worker.append("chat", 1, [text("b")], {}),
+            other.append("chat", 1, [text("b")], {}),
+        )
+        cached = await worker.get("chat")
+        if cached is not None:
+            assert [m["content"] for m in cached["messages"]] == ["a", "b"]
+
+    asyncio.run(with_redis(test))
@@ -0,0 +1,81 @@
+import asyncio
+import base64
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from models.chat import ChatSummary, decode_cursor, encode_cursor, get_chat_summaries
+from routes.chat_router import chat_router
+from utils.supabase import SupabaseClient
+
+chat_id = "0b8f3a4e-1111-4222-8333-944455556666"
+
+
+def make_cursor(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+def test_first_page_query(postgrest_requests):
+    asyncio.run(get_chat_summaries(SupabaseClient(), "owner", "llava-13b", 50))
+    (request,) = postgrest_requests
+    assert request.url.path == "/rest/v1/chats"
+    assert request.url.params.get_list("order") == [
+        "last_chatted.desc.nullsfirst,id.desc"
+    ]
+    assert request.url.params["owner"] == "eq.owner"
+    assert request.url.params["model"] == "eq.llava-13b"
+    assert request.url.params["limit"] == "51"
+
+
+def test_next_page_query(postgrest_requests):
+    after = ("2024-05-01T12:00:00+00:00", chat_id)
+    asyncio.run(get_chat_summaries(SupabaseClient(), "owner", "m", 10, after))
+    (request,) = postgrest_requests
+    assert request.url.params["or"] == (
+        '(last_chatted.lt."2024-05-01T12:00:00+00:00",'
+        f'and(last_chatted.eq."2024-05-01T12:00:00+00:00",id.lt.{chat_id}))'
+    )
+    assert request.url.params.get_list("order") == [
+        "last_chatted.desc.nullsfirst,id.desc"
+    ]
+
+
+def test_cursor_round_trip():
+    chat = ChatSummary(
+        id=chat_id,
+        model="m",
+        last_chatted="2024-05-01T12:00:00.12345+00:00",
+        preview=None,
+        message_count=0,
+    )
+    assert decode_cursor(encode_cursor(chat)) == (chat.last_chatted, chat_id)
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "!!!",
+        make_cursor([]),
+        make_cursor([None, "x,id.gt.0"]),
+        make_cursor(['2024-01-01"),x', chat_id]),
+        make_cursor([1, 2]),
+    ],
+)
+def test_malformed_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_list_route_rejects_malformed_cursor(postgrest_requests, token):
+    app = FastAPI()
+    app.include_router(chat_router)
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.get("/chat/list/m?cursor=garbage", headers=headers)
+    assert response.status_code == 400
+    assert not postgrest_requests
+    response = client.get("/chat/list/m", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {"chats": [], "next_cursor": None}
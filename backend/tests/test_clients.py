@@ -0,0 +1,49 @@
+import asyncio
+
+import utils.clients as clients
+
+
+def test_warm_clients_retries_failed_providers(monkeypatch):
+    calls = {name: 0 for name in clients.provider_modules}
+
+    def factory(name, failures):
+        def create():
+            calls[name] += 1
+            if calls[name] <= failures:
+                raise RuntimeError(f"{name} unavailable")
+
+        return create
+
+    monkeypatch.setattr(clients, "providers", {})
+    monkeypatch.setattr(clients, "client_warm_backoff", 0)
+    monkeypatch.setattr(
+        clients,
+        "client_factories",
+        {
+            "groq": factory("groq", 0),
+            "multion": factory("multion", 2),
+            "replicate": factory("replicate", 1),
+        },
+    )
+    asyncio.run(clients.warm_clients())
+    assert clients.clients_ready()
+    assert calls == {"groq": 1, "multion": 3, "replicate": 2}
+
+
+def test_warm_clients_gives_up_after_retries(monkeypatch):
+    def broken():
+        raise RuntimeError("no key")
+
+    monkeypatch.setattr(clients, "providers", {})
+    monkeypatch.setattr(clients, "client_warm_backoff", 0)
+    monkeypatch.setattr(clients, "client_warm_retries", 2)
+    monkeypatch.setitem(clients.client_factories, "groq", broken)
+    monkeypatch.setitem(clients.client_factories, "multion", lambda: None)
+    monkeypatch.setitem(clients.client_factories, "replicate", lambda: None)
+    asyncio.run(clients.warm_clients())
+    assert not clients.clients_ready()
+    assert clients.providers["groq"] == {
+        "ready": False,
+        "attempts": 3,
+        "error": "no key",
+    }
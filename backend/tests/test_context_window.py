@@ -0,0 +1,92 @@
+import asyncio
+
+import models.context as context
+from models.context import ContextWindow
+from models.conversation import Conversation, estimate_tokens
+
+
+class Writer:
+    def __init__(self):
+        self.updates = {}
+
+    def update(self, **updates):
+        self.updates.update(updates)
+
+
+class Summarizer:
+    def __init__(self):
+        self.calls = []
+
+    async def run(self, messages):
+        self.calls.append(messages[0]["content"])
+        return "The user asked about burgers."
+
+
+def text(role, content):
+    return {"type": "text", "role": role, "content": content}
+
+
+def history(turns, words=200):
+    messages = []
+    for i in range(turns):
+        role = "user" if i % 2 == 0 else "assistant"
+        messages.append(text(role, f"turn {i} " + "word " * words))
+    return messages
+
+
+def prompt_tokens(prompt):
+    return sum(estimate_tokens(message["content"]) for message in prompt)
+
+
+def test_window_stays_within_budget():
+    messages = Conversation(history(200))
+    prompt = ContextWindow().build(messages)
+    assert prompt_tokens(prompt) <= context.context_max_tokens
+    assert prompt[-1] == messages.prompt[-1]
+    assert len(prompt) < len(messages.prompt)
+
+
+def test_window_with_summary_stays_within_budget():
+    messages = Conversation(history(200))
+    window = ContextWindow("word " * 400, summary_seq=150)
+    prompt = window.build(messages)
+    assert prompt[0]["role"] == "system"
+    assert prompt_tokens(prompt) <= context.context_max_tokens
+    assert prompt[-1] == messages.prompt[-1]
+
+
+def test_short_history_is_kept_whole():
+    messages = Conversation(history(6, words=10))
+    assert ContextWindow().build(messages) == messages.prompt
+
+
+def test_oversized_newest_message_is_truncated():
+    newest = "start " + "x" * (context.context_max_tokens * 8) + " end"
+    messages = Conversation(history(4) + [text("user", newest)])
+    prompt = ContextWindow().build(messages)
+    assert len(prompt) == 1
+    assert prompt[0]["role"] == "user"
+    assert prompt[0]["content"].endswith(" end")
+    assert prompt_tokens(prompt) <= context.context_max_tokens
+
+
+def test_oversized_newest_message_is_not_compacted(monkeypatch):
+    summarizer = Summarizer()
+    monkeypatch.setattr(context, "summary_model", summarizer)
+    newest = "y" * (context.context_recent_tokens * 6)
+    messages = Conversation(history(10) + [text("user", newest)])
+    window = ContextWindow()
+    writer = Writer()
+
+    async def compact():
+        window.compact_later(messages, writer)
+        await window.compacting
+
+    asyncio.run(compact())
+    assert summarizer.calls
+    assert not any(newest in call for call in summarizer.calls)
+    assert window.summary_seq == messages.seqs[-1]
+    assert writer.updates["context_summary_seq"] == messages.seqs[-1]
+    prompt = window.build(messages)
+    assert prompt[0]["role"] == "system"
+    assert prompt_tokens(prompt) <= context.context_max_tokens
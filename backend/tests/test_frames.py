@@ -0,0 +1,73 @@
+import json
+import zlib
+
+from fastapi import FastAPI, WebSocket
+from fastapi.testclient import TestClient
+
+from utils import frames
+
+image = b"\x89PNG\r\n\x1a\n" + bytes(range(256))
+
+app = FastAPI()
+
+
+@app.websocket("/echo")
+async def echo(websocket: WebSocket):
+    await frames.accept(websocket)
+    message = await frames.receive_message(websocket)
+    await frames.send_message(
+        websocket,
+        {
+            "type": "text",
+            "role": "system",
+            "content": str(frames.uses_binary_frames(websocket)),
+        },
+    )
+    await frames.send_message(websocket, message)
+    await websocket.close()
+
+
+def test_pack_round_trip():
+    header = {"type": "file", "role": "user", "content_type": "image/png"}
+    assert frames.unpack_frame(frames.pack_frame(header, image)) == (header, image)
+
+
+def test_binary_subprotocol_is_negotiated():
+    client = TestClient(app)
+    subprotocols = ["other", frames.binary_subprotocol]
+    with client.websocket_connect("/echo", subprotocols=subprotocols) as websocket:
+        assert websocket.accepted_subprotocol == frames.binary_subprotocol
+        upload = frames.pack_frame({"type": "file", "role": "user"}, image)
+        websocket.send_bytes(upload)
+        assert json.loads(websocket.receive_text())["content"] == "True"
+        header, data = frames.unpack_frame(websocket.receive_bytes())
+    assert header == {"type": "file", "role": "user"}
+    assert data == image
+
+
+def test_text_fallback_without_subprotocol():
+    client = TestClient(app)
+    with client.websocket_connect("/echo", subprotocols=["other"]) as websocket:
+        assert websocket.accepted_subprotocol is None
+        websocket.send_json({"type": "file", "role": "user", "content": "data:x"})
+        assert websocket.receive_json()["content"] == "False"
+        assert websocket.receive_json()["content"] == "data:x"
+
+
+def test_text_fallback_inlines_binary_content():
+    message = {"type": "file", "role": "assistant", "content": image}
+    inlined = frames.inline_content(message)
+    assert inlined["content"].startswith("data:image/png;base64,")
+
+
+def test_large_text_is_deflated_in_binary_mode(monkeypatch):
+    monkeypatch.setattr(frames, "frame_compress_min_bytes", 64)
+    client = TestClient(app)
+    content = "word " * 100
+    subprotocols = [frames.binary_subprotocol]
+    with client.websocket_connect("/echo", subprotocols=subprotocols) as websocket:
+        websocket.send_json({"type": "text", "role": "user", "content": content})
+        websocket.receive_text()
+        header, data = frames.unpack_frame(websocket.receive_bytes())
+    assert header == {"encoding": "deflate"}
+    assert json.loads(zlib.decompress(data))["content"] == content
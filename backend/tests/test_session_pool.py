@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("multion")
+
+import utils.clients as clients
+from models.admission import Overloaded, admission_retry_after
+from models.session_pool import SessionPool
+from utils.fake_multion import FakeMultiOn
+
+
+@pytest.fixture(autouse=True)
+def multion(monkeypatch):
+    monkeypatch.setitem(clients.clients, "multion", FakeMultiOn(create_latency=0))
+
+
+def test_wait_for_a_session_times_out():
+    async def run():
+        pool = SessionPool(0, 1, 240, max_wait=0.05)
+        session = await pool.acquire()
+        positions = []
+        with pytest.raises(Overloaded) as overloaded:
+            await pool.acquire(positions.append)
+        pool.release(session.session_id)
+        await pool.close()
+        return pool, positions, overloaded.value
+
+    pool, positions, overloaded = asyncio.run(run())
+    assert positions == [1]
+    assert overloaded.retry_after >= admission_retry_after
+    assert pool.timed_out == 1
+    assert pool.waiting == 0 and not pool.queue
+
+
+def test_waiters_see_their_queue_position():
+    async def run():
+        pool = SessionPool(0, 1, 240, max_wait=5)
+        session = await pool.acquire()
+        first, second = [], []
+        waiting = [
+            asyncio.create_task(pool.acquire(first.append)),
+            asyncio.create_task(pool.acquire(second.append)),
+        ]
+        await asyncio.sleep(0)
+        pool.release(session.session_id)
+        session = await waiting[0]
+        pool.release(session.session_id)
+        session = await waiting[1]
+        pool.release(session.session_id)
+        await pool.close()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == [1]
+    assert second == [2, 1]
@@ -0,0 +1,43 @@
+import asyncio
+
+from utils.executor import run_sync
+import utils.supabase as supabase
+from utils.supabase import SupabaseClient
+
+
+def test_clients_carry_their_own_token(postgrest_requests):
+    clients = [SupabaseClient(f"token-{i}") for i in range(50)]
+
+    async def query_all():
+        await asyncio.gather(
+            *(
+                run_sync(client.table("chats").select("id").eq("id", i).execute)
+                for i, client in enumerate(clients)
+            )
+        )
+
+    asyncio.run(query_all())
+    assert len(postgrest_requests) == len(clients)
+    for request in postgrest_requests:
+        i = request.url.params["id"].removeprefix("eq.")
+        assert request.headers["authorization"] == f"Bearer token-{i}"
+        assert request.headers["apikey"] == "anon-key"
+
+
+def test_clients_share_one_transport(postgrest_requests):
+    first, second = SupabaseClient("a"), SupabaseClient("b")
+    transport = supabase.transports["supabase"]
+    assert first.postgrest.session._transport is transport
+    assert second.postgrest.session._transport is transport
+    assert first.storage.session._transport is transport
+
+
+def test_set_token_switches_the_header(postgrest_requests):
+    client = SupabaseClient("old")
+    client.table("chats").select("id").execute()
+    client.set_token("new")
+    client.table("chats").select("id").execute()
+    assert [request.headers["authorization"] for request in postgrest_requests] == [
+        "Bearer old",
+        "Bearer new",
+    ]
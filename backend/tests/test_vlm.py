@@ -0,0 +1,43 @@
+import time
+
+import pytest
+
+from models import vlm
+
+
+@pytest.fixture
+def backends(monkeypatch):
+    monkeypatch.setattr(vlm, "vlms", {})
+    monkeypatch.setattr(vlm, "vlm_slow_latency", 8)
+    monkeypatch.setattr(vlm, "vlm_latency_half_life", 60)
+    primary = vlm.FakeVLM("primary", fallbacks=["fallback"])
+    fallback = vlm.FakeVLM("fallback")
+    vlm.register_vlm(primary)
+    vlm.register_vlm(fallback)
+    fallback.record_latency(2)
+    return primary, fallback
+
+
+def test_slow_primary_loses_traffic(backends):
+    primary, fallback = backends
+    primary.record_latency(30)
+    assert primary.slow
+    assert vlm.choose_vlms("primary")[0] is fallback
+
+
+def test_slow_primary_recovers_without_new_samples(backends):
+    primary, fallback = backends
+    primary.record_latency(30)
+    primary.measured_at = time.monotonic() - 180
+    fallback.measured_at = time.monotonic() - 180
+    assert primary.latency == pytest.approx(30 / 8, rel=0.01)
+    assert not primary.slow
+    assert vlm.choose_vlms("primary")[0] is primary
+
+
+def test_new_sample_blends_with_decayed_estimate(backends):
+    primary, _ = backends
+    primary.record_latency(30)
+    primary.measured_at = time.monotonic() - 60
+    primary.record_latency(1)
+    assert primary.latency == pytest.approx(0.8 * 15 + 0.2 * 1, rel=0.01)
@@ -0,0 +1,149 @@
+import asyncio
+import importlib
+import os
+from typing import TYPE_CHECKING, Any, Dict
+import httpx
+from utils.config import load_config
+from utils.executor import run_sync
+from utils.timing import Timings
+from utils.log import warning
+
+if TYPE_CHECKING:
+    import replicate
+    from groq import AsyncGroq
+    from multion.client import AsyncMultiOn
+
+load_config()
+
+http_limits = httpx.Limits(
+    max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20")),
+    keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60")),
+)
+http_timeout = float(os.getenv("HTTP_TIMEOUT", "120"))
+multion_fake_backend = os.getenv("MULTION_FAKE_BACKEND", "") == "1"
+client_warm_retries = int(os.getenv("CLIENT_WARM_RETRIES", "5"))
+client_warm_backoff = float(os.getenv("CLIENT_WARM_BACKOFF", "1"))
+
+provider_modules = {
+    "groq": "groq",
+    "multion": "multion.client",
+    "replicate": "replicate",
+}
+
+clients: Dict[str, Any] = {}
+transports: Dict[str, httpx.AsyncBaseTransport] = {}
+providers: Dict[str, Dict[str, Any]] = {}
+
+
+def get_transport(name: str) -> httpx.AsyncBaseTransport:
+    if name not in transports:
+        transports[name] = httpx.AsyncHTTPTransport(limits=http_limits)
+    return transports[name]
+
+
+def get_http() -> httpx.AsyncClient:
+    if "http" not in clients:
+        clients["http"] = httpx.AsyncClient(
+            transport=get_transport("http"),
+            timeout=http_timeout,
+            follow_redirects=True,
+        )
+    return clients["http"]
+
+
+def get_groq() -> "AsyncGroq":
+    if "groq" not in clients:
+        from groq import AsyncGroq
+
+        clients["groq"] = AsyncGroq(
+            api_key=os.getenv("GROQ_API_KEY"),
+            timeout=http_timeout,
+            http_client=httpx.AsyncClient(
+                transport=get_transport("groq"), timeout=http_timeout
+            ),
+        )
+    return clients["groq"]
+
+
+def get_multion() -> "AsyncMultiOn":
+    if "multion" not in clients and multion_fake_backend:
+        from utils.fake_multion import FakeMultiOn
+
+        clients["multion"] = FakeMultiOn()
+    if "multion" not in clients:
+        from multion.client import AsyncMultiOn
+
+        clients["multion"] = AsyncMultiOn(
+            api_key=os.getenv("MULTION_API_KEY"),
+            timeout=http_timeout,
+            httpx_client=httpx.AsyncClient(
+                transport=get_transport("multion"),
+                timeout=http_timeout,
+                follow_redirects=True,
+            ),
+        )
+    return clients["multion"]
+
+
+def get_replicate() -> "replicate.Client":
+    if "replicate" not in clients:
+        import replicate
+
+        clients["replicate"] = replicate.Client(
+            api_token=os.getenv("REPLICATE_API_TOKEN"),
+            transport=get_transport("replicate"),
+        )
+    return clients["replicate"]
+
+
+client_factories = {
+    "groq": get_groq,
+    "multion": get_multion,
+    "replicate": get_replicate,
+}
+
+
+async def warm_client(name: str, module: str) -> bool:
+    timings = Timings()
+    try:
+        with timings.stage("import"):
+            await run_sync(importlib.import_module, module)
+        with timings.stage("client"):
+            client_factories[name]()
+    except Exception as e:
+        warning(f"Warming {name} client failed: {e}")
+        providers[name] = {**providers[name], "error": str(e)}
+        return False
+    providers[name] = {"ready": True, **timings.stages}
+    return True
+
+
+async def warm_clients():
+    for name in provider_modules:
+        providers[name] = {"ready": False, "attempts": 0}
+    delay = client_warm_backoff
+    for attempt in range(client_warm_retries + 1):
+        if attempt:
+            await asyncio.sleep(delay)
+            delay *= 2
+        for name, module in provider_modules.items():
+            if providers[name]["ready"]:
+                continue
+            providers[name]["attempts"] = attempt + 1
+            await warm_client(name, module)
+        if clients_ready():
+            return
+
+
+def clients_ready() -> bool:
+    return len(providers) == len(provider_modules) and all(
+        provider["ready"] for provider in providers.values()
+    )
+
+
+async def close_clients():
+    for transport in transports.values():
+        await transport.aclose()
+    transports.clear()
+    clients.clear()
@@ -0,0 +1,7 @@
+from functools import lru_cache
+from dotenv import load_dotenv
+
+
+@lru_cache(maxsize=None)
+def load_config() -> bool:
+    return load_dotenv()
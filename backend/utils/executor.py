@@ -0,0 +1,17 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from utils.config import load_config
+
+load_config()
+
+executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("EXECUTOR_MAX_WORKERS", "64")),
+    thread_name_prefix="blocking-io",
+)
+
+
+async def run_sync(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, partial(func, *args, **kwargs))
@@ -0,0 +1,67 @@
+import asyncio
+import itertools
+from types import SimpleNamespace
+from typing import Dict
+from multion import SessionStepSuccess, SessionsCloseResponse
+from multion import SessionsScreenshotResponse
+from multion.types.session_created import SessionCreated
+
+
+class FakeMultiOn:
+    def __init__(
+        self,
+        create_latency: float = 2.0,
+        step_latency: float = 0.5,
+        screenshot_latency: float = 0.2,
+        steps: int = 3,
+    ):
+        self.create_latency = create_latency
+        self.step_latency = step_latency
+        self.screenshot_latency = screenshot_latency
+        self.steps = steps
+        self.ids = itertools.count()
+        self.open: Dict[str, int] = {}
+        self.created = 0
+        self.sessions = SimpleNamespace(
+            create=self.create,
+            step=self.step,
+            screenshot=self.screenshot,
+            close=self.close,
+        )
+
+    async def create(self, url: str, **kwargs) -> SessionCreated:
+        await asyncio.sleep(self.create_latency)
+        session_id = f"fake-{next(self.ids)}"
+        self.open[session_id] = 0
+        self.created += 1
+        return SessionCreated(
+            status="CONTINUE",
+            message=f"Opened {url}",
+            session_id=session_id,
+            url=url,
+            screenshot="",
+        )
+
+    async def step(self, session_id: str, cmd: str, **kwargs) -> SessionStepSuccess:
+        if session_id not in self.open:
+            raise ValueError(f"Session {session_id} is not open")
+        await asyncio.sleep(self.step_latency)
+        self.open[session_id] += 1
+        calls = self.open[session_id]
+        return SessionStepSuccess(
+            status="DONE" if calls >= self.steps else "CONTINUE",
+            message=f"Step {calls}: {cmd}",
+            session_id=session_id,
+            url="https://google.com",
+            screenshot="",
+        )
+
+    async def screenshot(self, session_id: str, **kwargs) -> SessionsScreenshotResponse:
+        await asyncio.sleep(self.screenshot_latency)
+        return SessionsScreenshotResponse(
+            screenshot="Unable to take screenshot for the session"
+        )
+
+    async def close(self, session_id: str, **kwargs) -> SessionsCloseResponse:
+        self.open.pop(session_id, None)
+        return SessionsCloseResponse(status="closed", session_id=session_id)
@@ -0,0 +1,169 @@
+import argparse
+import asyncio
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from utils.log import info
+
+
+def encode(value, protocol: int = 2) -> bytes:
+    if value is None:
+        return b"_\r\n" if protocol == 3 else b"$-1\r\n"
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        return b"+%s\r\n" % value.encode()
+    if isinstance(value, list):
+        items = (encode(item, protocol) for item in value)
+        return b"*%d\r\n" % len(value) + b"".join(items)
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.channels: Dict[bytes, Set[asyncio.StreamWriter]] = {}
+        self.values: Dict[bytes, Tuple[bytes | List[bytes], Optional[float]]] = {}
+        self.versions: Dict[bytes, int] = {}
+        self.published = 0
+
+    async def read_command(self, reader: asyncio.StreamReader) -> List[bytes]:
+        header = await reader.readline()
+        if not header:
+            raise ConnectionResetError
+        command = []
+        for _ in range(int(header[1:])):
+            length = int((await reader.readline())[1:])
+            command.append((await reader.readexactly(length + 2))[:-2])
+        return command
+
+    def get(self, key: bytes) -> Optional[bytes | List[bytes]]:
+        value, expires = self.values.get(key, (None, None))
+        if expires and expires < time.monotonic():
+            del self.values[key]
+            return None
+        return value
+
+    def run(self, writer: asyncio.StreamWriter, subscribed: Set[bytes], command):
+        name = command[0].upper()
+        args = command[1:]
+        if name in (b"SET", b"DEL", b"RPUSH", b"LSET", b"EXPIRE"):
+            for key in args if name == b"DEL" else args[:1]:
+                self.versions[key] = self.versions.get(key, 0) + 1
+        if name == b"PUBLISH":
+            self.published += 1
+            receivers = self.channels.get(args[0], set())
+            frame = encode([b"message", args[0], args[1]])
+            for receiver in receivers:
+                receiver.write(frame)
+            return len(receivers)
+        if name in (b"SUBSCRIBE", b"UNSUBSCRIBE"):
+            replies = []
+            for channel in args or list(subscribed):
+                if name == b"SUBSCRIBE":
+                    subscribed.add(channel)
+                    self.channels.setdefault(channel, set()).add(writer)
+                else:
+                    subscribed.discard(channel)
+                    self.channels.get(channel, set()).discard(writer)
+                replies.append([name.lower(), channel, len(subscribed)])
+            return replies
+        if name == b"GET":
+            return self.get(args[0]) or None
+        if name == b"SET":
+            expires = None
+            if len(args) > 3 and args[2].upper() == b"EX":
+                expires = time.monotonic() + int(args[3])
+            self.values[args[0]] = (args[1], expires)
+            return "OK"
+        if name == b"RPUSH":
+            values = self.get(args[0]) or []
+            values.extend(args[1:])
+            self.values[args[0]] = (values, self.values.get(args[0], (None, None))[1])
+            return len(values)
+        if name == b"LRANGE":
+            values = self.get(args[0]) or []
+            stop = int(args[2])
+            return values[int(args[1]) : stop + 1 if stop != -1 else None]
+        if name == b"LLEN":
+            return len(self.get(args[0]) or [])
+        if name == b"LSET":
+            self.get(args[0])[int(args[1])] = args[2]
+            return "OK"
+        if name == b"EXPIRE":
+            value = self.get(args[0])
+            if value is None:
+                return 0
+            self.values[args[0]] = (value, time.monotonic() + int(args[1]))
+            return 1
+        if name == b"DEL":
+            return sum(self.values.pop(key, None) is not None for key in args)
+        if name == b"PING":
+            return "PONG"
+        return "OK"
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        subscribed: Set[bytes] = set()
+        watched: Dict[bytes, int] = {}
+        queued: Optional[List[List[bytes]]] = None
+        protocol = 2
+        try:
+            while True:
+                command = await self.read_command(reader)
+                name = command[0].upper()
+                if name == b"HELLO" and len(command) > 1:
+                    protocol = int(command[1])
+                if name == b"WATCH":
+                    for key in command[1:]:
+                        watched[key] = self.versions.get(key, 0)
+                    reply = "OK"
+                elif name in (b"UNWATCH", b"DISCARD"):
+                    watched.clear()
+                    queued = None
+                    reply = "OK"
+                elif name == b"MULTI":
+                    queued = []
+                    reply = "OK"
+                elif name == b"EXEC":
+                    commands, queued = queued or [], None
+                    changed = any(
+                        self.versions.get(key, 0) != version
+                        for key, version in watched.items()
+                    )
+                    watched.clear()
+                    reply = None
+                    if not changed:
+                        reply = [self.run(writer, subscribed, c) for c in commands]
+                elif queued is not None:
+                    queued.append(command)
+                    reply = "QUEUED"
+                else:
+                    reply = self.run(writer, subscribed, command)
+                if name in (b"SUBSCRIBE", b"UNSUBSCRIBE"):
+                    writer.write(b"".join(map(encode, reply)))
+                else:
+                    writer.write(encode(reply, protocol))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            for channel in subscribed:
+                self.channels.get(channel, set()).discard(writer)
+            writer.close()
+
+    async def serve(self, host: str, port: int) -> asyncio.Server:
+        return await asyncio.start_server(self.handle, host, port)
+
+
+async def main(args):
+    server = await FakeRedis().serve(args.host, args.port)
+    info(f"Fake Redis listening on {args.host}:{args.port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Local Redis stand-in with pub/sub, GET/SET/DEL, lists and WATCH/MULTI/EXEC"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,78 @@
+import json
+import os
+import struct
+import zlib
+from typing import Dict, Tuple
+from utils.config import load_config
+from fastapi import WebSocket, WebSocketDisconnect
+from utils.images import encode_data_url, sniff_content_type
+
+load_config()
+
+frame_compress_min_bytes = int(os.getenv("FRAME_COMPRESS_MIN_BYTES", "4096"))
+frame_compress_level = int(os.getenv("FRAME_COMPRESS_LEVEL", "6"))
+
+binary_subprotocol = "multiagent.binary.v1"
+header_length = struct.Struct("!I")
+
+
+def pack_frame(header: Dict, data: bytes) -> bytes:
+    encoded = json.dumps(header, separators=(",", ":")).encode()
+    return header_length.pack(len(encoded)) + encoded + data
+
+
+def unpack_frame(frame: bytes) -> Tuple[Dict, bytes]:
+    (length,) = header_length.unpack_from(frame)
+    end = header_length.size + length
+    return json.loads(frame[header_length.size : end]), frame[end:]
+
+
+def uses_binary_frames(websocket: WebSocket) -> bool:
+    return getattr(websocket.state, "binary_frames", False)
+
+
+async def accept(websocket: WebSocket):
+    if binary_subprotocol in websocket.scope.get("subprotocols", []):
+        await websocket.accept(subprotocol=binary_subprotocol)
+        websocket.state.binary_frames = True
+    else:
+        await websocket.accept()
+
+
+async def receive_message(websocket: WebSocket) -> Dict:
+    if not uses_binary_frames(websocket):
+        return await websocket.receive_json()
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+    if message.get("bytes") is not None:
+        header, data = unpack_frame(message["bytes"])
+        return {**header, "content": data}
+    return json.loads(message["text"])
+
+
+def inline_content(message: Dict) -> Dict:
+    content = message["content"]
+    if not isinstance(content, bytes):
+        return message
+    content_type = message.get("content_type") or sniff_content_type(content)
+    inlined = {key: value for key, value in message.items() if key != "content_type"}
+    inlined["content"] = encode_data_url(content, content_type)
+    return inlined
+
+
+async def send_message(websocket: WebSocket, message: Dict):
+    if not uses_binary_frames(websocket):
+        await websocket.send_json(inline_content(message))
+        return
+    content = message["content"]
+    if isinstance(content, bytes):
+        header = {key: value for key, value in message.items() if key != "content"}
+        await websocket.send_bytes(pack_frame(header, content))
+        return
+    text = json.dumps(message, separators=(",", ":"))
+    if frame_compress_min_bytes and len(text) >= frame_compress_min_bytes:
+        data = zlib.compress(text.encode(), frame_compress_level)
+        await websocket.send_bytes(pack_frame({"encoding": "deflate"}, data))
+        return
+    await websocket.send_text(text)
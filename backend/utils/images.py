@@ -0,0 +1,62 @@
+import base64
+import binascii
+import io
+import mimetypes
+import os
+from typing import Tuple
+from utils.config import load_config
+from PIL import Image
+
+load_config()
+
+image_max_dimension = int(os.getenv("IMAGE_MAX_DIMENSION", "1536"))
+image_jpeg_quality = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+thumbnail_size = int(os.getenv("THUMBNAIL_SIZE", "480"))
+base64_chunk_size = 1 << 20
+
+
+def decode_data_url(data_url: str) -> Tuple[bytes, str]:
+    comma = data_url.index(",")
+    content_type = data_url[5:comma].split(";")[0] or "image/jpeg"
+    output = io.BytesIO()
+    for start in range(comma + 1, len(data_url), base64_chunk_size):
+        output.write(binascii.a2b_base64(data_url[start : start + base64_chunk_size]))
+    return output.getvalue(), content_type
+
+
+def downscale_image(data: bytes, content_type: str) -> Tuple[bytes, str]:
+    if not image_max_dimension:
+        return data, content_type
+    with Image.open(io.BytesIO(data)) as image:
+        if max(image.size) <= image_max_dimension:
+            return data, content_type
+        image.thumbnail((image_max_dimension, image_max_dimension))
+        output = io.BytesIO()
+        image.convert("RGB").save(
+            output, format="JPEG", quality=image_jpeg_quality, optimize=True
+        )
+    return output.getvalue(), "image/jpeg"
+
+
+def image_extension(content_type: str) -> str:
+    return mimetypes.guess_extension(content_type) or ".jpg"
+
+
+def encode_data_url(data: bytes, content_type: str) -> str:
+    return f"data:{content_type};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+def sniff_content_type(data: bytes) -> str:
+    if data.startswith(b"\x89PNG"):
+        return "image/png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "image/jpeg"
+
+
+def make_thumbnail(data: bytes) -> bytes:
+    with Image.open(io.BytesIO(data)) as image:
+        image.thumbnail((thumbnail_size, thumbnail_size))
+        output = io.BytesIO()
+        image.convert("RGB").save(output, format="JPEG", quality=70, optimize=True)
+    return output.getvalue()
@@ -0,0 +1,38 @@
+import os
+from typing import Any
+from utils.config import load_config
+
+load_config()
+
+levels = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+log_level = levels.get(os.getenv("LOG_LEVEL", "info").lower(), 20)
+log_payload_chars = int(os.getenv("LOG_PAYLOAD_CHARS", "200"))
+
+
+def truncate(payload: Any, limit: int = log_payload_chars) -> str:
+    text = str(payload)
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... ({len(text)} chars)"
+
+
+def debug(label: str, payload: Any):
+    if log_level <= levels["debug"]:
+        print(f"{label}: {truncate(payload)}")
+
+
+def log(level: str, message: str):
+    if log_level <= levels[level]:
+        print(message)
+
+
+def info(message: str):
+    log("info", message)
+
+
+def warning(message: str):
+    log("warning", message)
+
+
+def error(message: str):
+    log("error", message)
@@ -1,9 +1,119 @@
 import os
-from dotenv import load_dotenv
-from supabase import create_client
+from typing import Dict
+import httpx
+from utils.config import load_config
+from postgrest import (
+    SyncPostgrestClient,
+    SyncRequestBuilder,
+    SyncRPCFilterRequestBuilder,
+)
+from postgrest.utils import SyncClient as PostgrestSession
+from storage3 import SyncStorageClient
+from storage3.utils import SyncClient as StorageSession
+from utils.timing import span
 
-load_dotenv(True)
+load_config()
+
+supabase_url = os.getenv("SUPABASE_URL")
+supabase_key = os.getenv("SUPABASE_KEY")
+supabase_timeout = float(os.getenv("SUPABASE_TIMEOUT", "20"))
+supabase_limits = httpx.Limits(
+    max_connections=int(os.getenv("SUPABASE_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(
+        os.getenv("SUPABASE_MAX_KEEPALIVE_CONNECTIONS", "20")
+    ),
+    keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60")),
+)
+
+transports: Dict[str, httpx.HTTPTransport] = {}
+
+
+class InstrumentedTransport(httpx.HTTPTransport):
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if "/storage/" in path:
+            name = "supabase.storage"
+        elif "/rpc/" in path:
+            name = "supabase.rpc"
+        else:
+            name = "supabase.table"
+        with span(name):
+            return super().handle_request(request)
+
+
+def get_supabase_transport() -> httpx.HTTPTransport:
+    if "supabase" not in transports:
+        transports["supabase"] = InstrumentedTransport(limits=supabase_limits)
+    return transports["supabase"]
+
+
+class PooledPostgrestClient(SyncPostgrestClient):
+    def create_session(self, base_url, headers, timeout) -> PostgrestSession:
+        return PostgrestSession(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            transport=get_supabase_transport(),
+        )
+
+
+class PooledStorageClient(SyncStorageClient):
+    def _create_session(self, base_url, headers, timeout) -> StorageSession:
+        return StorageSession(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            transport=get_supabase_transport(),
+        )
+
+
+class SupabaseClient:
+    def __init__(self, token: str | None = None):
+        self.token = token or supabase_key
+        self._postgrest: PooledPostgrestClient | None = None
+        self._storage: PooledStorageClient | None = None
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"apiKey": supabase_key, "Authorization": f"Bearer {self.token}"}
+
+    @property
+    def postgrest(self) -> PooledPostgrestClient:
+        if self._postgrest is None:
+            self._postgrest = PooledPostgrestClient(
+                f"{supabase_url}/rest/v1",
+                headers=self.headers,
+                timeout=supabase_timeout,
+            )
+        return self._postgrest
+
+    @property
+    def storage(self) -> PooledStorageClient:
+        if self._storage is None:
+            self._storage = PooledStorageClient(
+                f"{supabase_url}/storage/v1", self.headers, supabase_timeout
+            )
+        return self._storage
+
+    def set_token(self, token: str):
+        if token == self.token:
+            return
+        self.token = token
+        self._postgrest = None
+        self._storage = None
+
+    def table(self, name: str) -> SyncRequestBuilder:
+        return self.postgrest.from_(name)
+
+    def rpc(self, name: str, params: Dict) -> SyncRPCFilterRequestBuilder:
+        return self.postgrest.rpc(name, params)
 
 
 def init_supabase():
-    return create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+    return SupabaseClient()
+
+
+def close_supabase():
+    for transport in transports.values():
+        transport.close()
+    transports.clear()
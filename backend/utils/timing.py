@@ -0,0 +1,129 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from typing import Awaitable, Deque, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class Timings:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def elapsed_ms(self, since: float) -> float:
+        return round((time.perf_counter() - since) * 1000, 1)
+
+    def mark(self, name: str, since: Optional[float] = None):
+        self.stages[name] = self.elapsed_ms(since or self.start)
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield start
+        finally:
+            self.stages[name] = self.elapsed_ms(start)
+
+    async def measure(self, name: str, awaitable: Awaitable[T]) -> T:
+        with self.stage(name):
+            return await awaitable
+
+
+class StageStats:
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self.counts: Dict[str, int] = {}
+        self.samples: Dict[str, Deque[float]] = {}
+
+    def record(self, stages: Dict[str, float]):
+        for name, value in stages.items():
+            self.counts[name] = self.counts.get(name, 0) + 1
+            self.samples.setdefault(name, deque(maxlen=self.window)).append(value)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        summary = {}
+        for name, samples in self.samples.items():
+            ordered = sorted(samples)
+            summary[name] = {
+                "count": self.counts[name],
+                "mean_ms": round(sum(ordered) / len(ordered), 1),
+                "p95_ms": ordered[int(len(ordered) * 0.95)],
+            }
+        return summary
+
+
+span_buckets_ms = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class Span:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.buckets = [0] * (len(span_buckets_ms) + 1)
+
+    def start(self):
+        with self.lock:
+            self.in_flight += 1
+
+    def finish(self, elapsed_ms: float, error: bool):
+        with self.lock:
+            self.in_flight -= 1
+            self.count += 1
+            self.errors += error
+            self.total_ms += elapsed_ms
+            self.buckets[bisect_left(span_buckets_ms, elapsed_ms)] += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(span_buckets_ms, self.buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                "in_flight": self.in_flight,
+                "count": self.count,
+                "errors": self.errors,
+                "mean_ms": round(self.total_ms / self.count, 1) if self.count else 0.0,
+                "p50_ms": self.quantile(0.5) if self.count else None,
+                "p95_ms": self.quantile(0.95) if self.count else None,
+                "buckets": {
+                    **{
+                        f"le_{bound}": count
+                        for bound, count in zip(span_buckets_ms, self.buckets)
+                    },
+                    "le_inf": self.buckets[-1],
+                },
+            }
+
+
+spans: Dict[str, Span] = {}
+
+
+@contextmanager
+def span(name: str):
+    current = spans.get(name) or spans.setdefault(name, Span())
+    current.start()
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except Exception:
+        error = True
+        raise
+    finally:
+        current.finish((time.perf_counter() - start) * 1000, error)
+
+
+def span_stats() -> Dict[str, Dict]:
+    return {name: spans[name].stats() for name in sorted(spans)}
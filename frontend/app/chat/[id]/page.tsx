@@ -30,6 +30,7 @@ import {
   useQueryClient,
 } from "@tanstack/react-query";
 import { fetchBearer, postBearer } from "@/utils/bearer";
+import { decodeMessage, encodeMessage, openSocket } from "@/lib/frames";
 import { Chat } from "@/types/chat";
 import { Button } from "@/components/ui/button";
 import { Skeleton } from "@/components/ui/skeleton";
@@ -46,13 +47,11 @@ import { useRouter } from "next/navigation";
 import Image from "next/image";
 import { toast } from "sonner";
 import MessageSkeleton from "@/components/messageSkeleton";
-import usePrevious from "@/utils/usePrevious";
 
 export default function ChatPage({ params }: { params: { id: string } }) {
   const [messages, setMessages] = useState<
-    { type: string; role: string; content: string }[]
+    { type: string; role: string; content: string; partial?: boolean }[]
   >([]);
-  const prevMessagesLength = usePrevious(messages.length);
   const { user } = useContext(UserContext);
   const { open } = useContext(SidebarContext);
   const [textInput, setTextInput] = useState("");
@@ -66,6 +65,9 @@ export default function ChatPage({ params }: { params: { id: string } }) {
   const [paused, setPaused] = useState(false);
   const websocket = useRef<WebSocket>();
   const connected = useRef(false);
+  const streaming = useRef(false);
+  const messageCount = useRef(0);
+  const decoded = useRef<Promise<unknown>>(Promise.resolve());
   const scrollRef = useRef<null | HTMLDivElement>(null);
   const supabase = createClient();
   const router = useRouter();
@@ -106,35 +108,25 @@ export default function ChatPage({ params }: { params: { id: string } }) {
     setAgentMode(chat && !!chat.session_id);
   }, [chat]);
 
-  useEffect(() => {
-    if (
-      prevMessagesLength &&
-      messages.length >= prevMessagesLength + 2 &&
-      messages[messages.length - 1].type === "file" &&
-      messages[messages.length - 1].role === "assistant" &&
-      websocket.current &&
-      agentLoading
-    ) {
-      const handleContinue = async () => {
-        const token = (await supabase.auth.getSession()).data.session
-          ?.access_token;
-        const tokenMessage = {
-          type: "token",
-          role: "system",
-          content: token,
-        };
-        websocket.current!.send(JSON.stringify(tokenMessage));
-        const continueMessage = {
-          type: "text",
-          role: "system",
-          content: paused ? "Agent pause" : "Agent continue",
-        };
-        websocket.current!.send(JSON.stringify(continueMessage));
-      };
-      handleContinue();
-      setPaused(false);
+  async function handlePause() {
+    if (!websocket.current) {
+      return;
     }
-  }, [messages]);
+    const token = (await supabase.auth.getSession()).data.session?.access_token;
+    const tokenMessage = {
+      type: "token",
+      role: "system",
+      content: token,
+    };
+    websocket.current.send(encodeMessage(websocket.current, tokenMessage));
+    const pauseMessage = {
+      type: "text",
+      role: "system",
+      content: "Agent pause",
+    };
+    websocket.current.send(encodeMessage(websocket.current, pauseMessage));
+    setPaused(true);
+  }
 
   function handleKeyDown(e: KeyboardEvent<HTMLTextAreaElement>) {
     if (e.key === "Enter" && !e.shiftKey) {
@@ -146,7 +138,9 @@ export default function ChatPage({ params }: { params: { id: string } }) {
     e.preventDefault();
 
     if (agentLoading) {
-      setPaused(true);
+      if (!paused) {
+        handlePause();
+      }
     } else {
       if (textInput.trim()) {
         let updatedMessages = [...messages];
@@ -210,20 +204,64 @@ export default function ChatPage({ params }: { params: { id: string } }) {
   }
 
   async function handleMessage(e: MessageEvent) {
-    let output = JSON.parse(e.data);
+    const decoding = decoded.current.then(() => decodeMessage(e.data));
+    decoded.current = decoding;
+    let output = await decoding;
+    if (output["content"] !== "Queued") {
+      toast.dismiss("queue");
+    }
     if (output["role"] === "system") {
+      if (output["content"] === "Queued") {
+        toast.info(`Waiting in queue, position ${output["position"]}`, {
+          id: "queue",
+        });
+      }
+      if (output["content"] === "Server busy") {
+        setMessageLoading(false);
+        setImageMode(false);
+        setImageLoading(false);
+        setAgentLoading(false);
+        toast.error(
+          `Server busy, try again in ${output["retry_after"]} seconds`
+        );
+      }
       if (output["content"] === "Awaiting input") {
         setAgentLoading(false);
+        setPaused(false);
       }
       if (output["content"] === "Agent start") {
         setAgentMode(true);
         setAgentLoading(true);
       }
+      if (output["content"] === "Agent error") {
+        toast.error("Agent step failed, send a message to retry");
+      }
       if (output["content"] === "Agent done") {
         setAgentMode(false);
         setAgentLoading(false);
+        setPaused(false);
         toast.success("Request completed");
       }
+    } else if (output["partial"]) {
+      streaming.current = true;
+      setMessageLoading(false);
+      setMessages((latestMessages) => {
+        const lastMessage = latestMessages[latestMessages.length - 1];
+        if (lastMessage && lastMessage.partial) {
+          return [
+            ...latestMessages.slice(0, -1),
+            {
+              ...lastMessage,
+              content: lastMessage.content + output["content"],
+            },
+          ];
+        }
+        return [...latestMessages, output];
+      });
+    } else if (streaming.current) {
+      streaming.current = false;
+      setMessages((latestMessages) => [...latestMessages.slice(0, -1), output]);
+      queryClient.refetchQueries({ queryKey: ["chats", chat.model] });
     } else {
       setTimeout(() => {
         setMessages((latestMessages) => [...latestMessages, output]);
@@ -257,29 +295,15 @@ export default function ChatPage({ params }: { params: { id: string } }) {
               process.env.NODE_ENV === "production"
                 ? `wss://${process.env.NEXT_PUBLIC_PLATFORM_URL}/chat/run/${
                     params.id
-                  }?token=${encodeURIComponent(token!)}`
+                  }?token=${encodeURIComponent(token!)}&after=${
+                    messageCount.current
+                  }`
                 : `ws://127.0.0.1:8000/chat/run/${
                     params.id
-                  }?token=${encodeURIComponent(token!)}`;
-            const ws = new WebSocket(url);
-            ws.onopen = () => {
-              const tokenMessage = {
-                type: "token",
-                role: "system",
-                content: token,
-              };
-              ws.send(JSON.stringify(tokenMessage));
-              const continueMessage = {
-                type: "text",
-                role: "user",
-                content: "Continue with the previous command",
-              };
-              setMessages((latestMessages) => [
-                ...latestMessages,
-                continueMessage,
-              ]);
-              ws.send(JSON.stringify(continueMessage));
-            };
+                  }?token=${encodeURIComponent(token!)}&after=${
+                    messageCount.current
+                  }`;
+            const ws = openSocket(url);
             websocket.current = ws;
             connected.current = true;
             ws.onmessage = handleMessage;
@@ -304,7 +328,7 @@ export default function ChatPage({ params }: { params: { id: string } }) {
           : `ws://127.0.0.1:8000/chat/run/${
               params.id
             }?token=${encodeURIComponent(token!)}`;
-      const ws = new WebSocket(url);
+      const ws = openSocket(url);
 
       ws.onopen = () => {
         const tokenMessage = {
@@ -312,11 +336,15 @@ export default function ChatPage({ params }: { params: { id: string } }) {
           role: "system",
           content: token,
         };
-        ws.send(JSON.stringify(tokenMessage));
+        ws.send(encodeMessage(ws, tokenMessage));
         if (file) {
-          ws.send(JSON.stringify(updatedMessages[updatedMessages.length - 2]));
+          ws.send(
+            encodeMessage(ws, updatedMessages[updatedMessages.length - 2])
+          );
         }
-        ws.send(JSON.stringify(updatedMessages[updatedMessages.length - 1]));
+        ws.send(
+          encodeMessage(ws, updatedMessages[updatedMessages.length - 1])
+        );
       };
       websocket.current = ws;
       connected.current = true;
@@ -326,14 +354,20 @@ export default function ChatPage({ params }: { params: { id: string } }) {
         role: "system",
         content: token,
       };
-      websocket.current!.send(JSON.stringify(tokenMessage));
+      websocket.current!.send(encodeMessage(websocket.current!, tokenMessage));
       if (file) {
         websocket.current!.send(
-          JSON.stringify(updatedMessages[updatedMessages.length - 2])
+          encodeMessage(
+            websocket.current!,
+            updatedMessages[updatedMessages.length - 2]
+          )
         );
       }
       websocket.current!.send(
-        JSON.stringify(updatedMessages[updatedMessages.length - 1])
+        encodeMessage(
+          websocket.current!,
+          updatedMessages[updatedMessages.length - 1]
+        )
       );
     }
     websocket.current!.onmessage = handleMessage;
@@ -341,6 +375,7 @@ export default function ChatPage({ params }: { params: { id: string } }) {
   }
 
   useEffect(() => {
+    messageCount.current = messages.length;
     if (scrollRef.current) {
       scrollRef.current.scrollTop = scrollRef.current.scrollHeight;
     }
@@ -1,6 +1,6 @@
-import { Chat } from "@/types/chat";
+import { Chat, ChatSummaryPage } from "@/types/chat";
 import { fetchBearer, postBearer } from "@/utils/bearer";
-import { useMutation, useQuery } from "@tanstack/react-query";
+import { useInfiniteQuery, useMutation } from "@tanstack/react-query";
 import { useRouter } from "next/navigation";
 import { Button } from "@/components/ui/button";
 import { Skeleton } from "./ui/skeleton";
@@ -9,11 +9,22 @@ import { Plus } from "lucide-react";
 export default function ModelChats({ model }: { model: string }) {
   const router = useRouter();
 
-  const { data: chats, isPending: chatsLoading } = useQuery({
+  const {
+    data: chats,
+    isPending: chatsLoading,
+    hasNextPage,
+    fetchNextPage,
+    isFetchingNextPage,
+  } = useInfiniteQuery({
     queryKey: ["chats", model],
-    queryFn: () =>
-      fetchBearer(`/chat/get_by_model/${model}`).then((res) => res?.json()),
-    select: (data) => data as [Chat],
+    queryFn: ({ pageParam }) =>
+      fetchBearer(
+        `/chat/list/${model}` +
+          (pageParam ? `?cursor=${encodeURIComponent(pageParam)}` : "")
+      ).then((res) => res?.json() as Promise<ChatSummaryPage>),
+    initialPageParam: "",
+    getNextPageParam: (lastPage) => lastPage?.next_cursor ?? undefined,
+    select: (data) => data.pages.flatMap((page) => page?.chats ?? []),
   });
 
   const createChat = useMutation({
@@ -51,12 +62,20 @@ export default function ModelChats({ model }: { model: string }) {
               key={chat.id}
             >
               <div className="truncate">
-                {chat.messages.length > 0
-                  ? chat.messages[chat.messages.length - 1]["content"]
-                  : `New chat: ${chat.id}`}
+                {chat.preview ?? `New chat: ${chat.id}`}
               </div>
             </Button>
           ))}
+          {hasNextPage && (
+            <Button
+              variant="ghost"
+              className="w-full text-xs justify-start p-3"
+              disabled={isFetchingNextPage}
+              onClick={() => fetchNextPage()}
+            >
+              Load more
+            </Button>
+          )}
         </>
       ) : (
         <div className="flex items-center text-xs h-10">Try this model!</div>
@@ -0,0 +1,59 @@
+export const binaryProtocol = "multiagent.binary.v1";
+
+type FrameMessage = {
+  type: string;
+  role: string;
+  content: any;
+  [key: string]: any;
+};
+
+export function openSocket(url: string) {
+  const ws = new WebSocket(url, [binaryProtocol]);
+  ws.binaryType = "arraybuffer";
+  return ws;
+}
+
+export function encodeMessage(ws: WebSocket, message: FrameMessage) {
+  const content = message.content;
+  if (
+    ws.protocol !== binaryProtocol ||
+    typeof content !== "string" ||
+    !content.startsWith("data:")
+  ) {
+    return JSON.stringify(message);
+  }
+  const comma = content.indexOf(",");
+  const binary = atob(content.slice(comma + 1));
+  const data = new Uint8Array(binary.length);
+  for (let i = 0; i < binary.length; i++) {
+    data[i] = binary.charCodeAt(i);
+  }
+  const { content: _, ...header } = message;
+  header.content_type = content.slice(5, comma).split(";")[0];
+  const encodedHeader = new TextEncoder().encode(JSON.stringify(header));
+  const frame = new Uint8Array(4 + encodedHeader.length + data.length);
+  new DataView(frame.buffer).setUint32(0, encodedHeader.length);
+  frame.set(encodedHeader, 4);
+  frame.set(data, 4 + encodedHeader.length);
+  return frame.buffer;
+}
+
+export async function decodeMessage(
+  data: string | ArrayBuffer
+): Promise<FrameMessage> {
+  if (typeof data === "string") {
+    return JSON.parse(data);
+  }
+  const length = new DataView(data).getUint32(0);
+  const header = JSON.parse(
+    new TextDecoder().decode(new Uint8Array(data, 4, length))
+  );
+  const blob = new Blob([new Uint8Array(data, 4 + length)], {
+    type: header.content_type,
+  });
+  if (header.encoding === "deflate") {
+    const stream = blob.stream().pipeThrough(new DecompressionStream("deflate"));
+    return JSON.parse(await new Response(stream).text());
+  }
+  return { ...header, content: URL.createObjectURL(blob) };
+}
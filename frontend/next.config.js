@@ -7,6 +7,10 @@ const nextConfig = {
         protocol: "https",
         hostname: "multion-client-screenshots.s3.us-east-2.amazonaws.com",
       },
+      {
+        protocol: "https",
+        hostname: "*.supabase.co",
+      },
     ],
   },
   reactStrictMode: true,
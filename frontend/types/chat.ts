@@ -6,3 +6,16 @@ export interface Chat {
   last_chatted: string;
   session_id: string;
 }
+
+export interface ChatSummary {
+  id: string;
+  model: string;
+  last_chatted: string | null;
+  preview: string | null;
+  message_count: number;
+}
+
+export interface ChatSummaryPage {
+  chats: ChatSummary[];
+  next_cursor: string | null;
+}